@@ -0,0 +1,249 @@
+import threading
+import time
+from config.settings import (
+    WAKE_PHRASE,
+    END_PHRASE,
+    CONVERSATION_TIMEOUT,
+    WAKE_ACK_PHRASE,
+    GOODBYE_PHRASE,
+    NAP_PHRASE,
+    ERROR_PHRASE,
+    BARGE_IN_ENABLED
+)
+from conversation import ConversationMachine, ConversationState, InputQueue
+from models.gemma_client import GemmaClient
+from utils.audio_handler import AudioHandler
+from utils.cancellation import CancellationToken
+from utils.timer_scheduler import TimerScheduler
+from utils.tts_handler import TTSHandler
+
+class VoiceAssistant:
+    """Wake word, conversation turns and the idle timeout, as an event-driven state machine"""
+
+    def __init__(self, client: GemmaClient, tts_handler: TTSHandler, audio_handler: AudioHandler,
+                 timeout: float = CONVERSATION_TIMEOUT, inputs: InputQueue = None,
+                 scheduler: TimerScheduler = None):
+        self.client = client
+        self.tts_handler = tts_handler
+        self.audio_handler = audio_handler
+        self.timeout = timeout
+        # Called with the kind of reply ("ack", "reply", "goodbye", "nap" or
+        # "error") once it has finished playing, not when it was cut short
+        self.on_spoken = None
+        self.inputs = inputs if inputs is not None else InputQueue()  # An empty one is falsy
+        self.scheduler = scheduler or TimerScheduler()
+        self.machine = ConversationMachine()
+        self.machine.on_change(self._state_changed)
+        self._timeout_timer = None
+        self._reply = None  # (CancellationToken, prompt) of the reply being generated or spoken
+        self._interrupted_prompt = None  # Prompt of a reply cut off before it said anything
+        self._running = False
+        self._worker = None
+        if BARGE_IN_ENABLED:
+            audio_handler.enable_barge_in(self.barge_in, lambda: self.tts_handler.output_level)
+
+    @property
+    def state(self) -> str:
+        return self.machine.state
+
+    @property
+    def in_conversation(self) -> bool:
+        return self.machine.state != ConversationState.IDLE
+
+    def start(self):
+        """Start the turn worker and the timeout scheduler"""
+        if self._running:
+            return
+        self._running = True
+        self.scheduler.start()
+        self._worker = threading.Thread(target=self._run, name="assistant-turns", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._running = False
+        self.inputs.put_event("stop")
+        self.scheduler.stop()
+        if self._worker and self._worker.is_alive():
+            self._worker.join(timeout=1)
+
+    def handle_speech(self, text: str):
+        """Queue a transcript from AudioHandler.listen_continuous; never blocks the audio pipeline
+
+        The worker thread takes transcripts and events (such as the
+        timeout) off the InputQueue one at a time.
+        """
+        if self.machine.state == ConversationState.IDLE and WAKE_PHRASE not in text:
+            return
+        if not self.inputs.put(text):
+            print(f"Still processing, dropping: {text}")
+
+    def end_conversation(self):
+        """Say goodbye and go back to listening for the wake word"""
+        self.inputs.put_event("end")
+
+    def barge_in(self) -> bool:
+        """Cancel the reply in progress (generation, synthesis and playback), if any
+
+        Called from the recognition thread; the words that interrupted
+        the reply start the next turn.
+        """
+        reply = self._reply
+        if reply is None:
+            return False
+        token, prompt = reply
+        was_thinking = self.machine.state == ConversationState.THINKING
+        if not self.machine.transition(ConversationState.LISTENING, turn=token):
+            return False
+        token.cancel("barge-in")
+        if was_thinking and self.inputs.policy == InputQueue.COALESCE:
+            # Nothing was said yet, so the user is most likely adding to the question
+            self._interrupted_prompt = prompt
+        print("\nInterrupted")
+        return True
+
+    def _run(self):
+        while self._running:
+            # Utterances wait until the current turn has finished (or been interrupted)
+            between_turns = self.machine.state in (ConversationState.IDLE, ConversationState.LISTENING)
+            item = self.inputs.get(speech=between_turns)
+            if item is None:
+                continue
+            kind, value = item
+            try:
+                if kind == "event":
+                    self._handle_event(value)
+                else:
+                    self._handle_utterance(value)
+            except Exception as e:
+                print(f"Error handling speech: {e}")
+
+    def _state_changed(self, old: str, new: str):
+        # Runs under the machine's lock: flags and timers only. Listening is
+        # paused while thinking or speaking, and the idle timeout is a single
+        # timer armed on entering listening
+        if new in (ConversationState.THINKING, ConversationState.SPEAKING):
+            self.audio_handler.pause_listening()
+        else:
+            self.audio_handler.resume_listening()
+        if self._timeout_timer is not None:
+            self._timeout_timer.cancel()
+            self._timeout_timer = None
+        if new == ConversationState.LISTENING:
+            self._timeout_timer = self.scheduler.call_later(self.timeout, self.inputs.put_event, "timeout")
+        self.inputs.wake()
+
+    def _handle_event(self, name: str):
+        machine = self.machine
+        if name == "timeout":
+            # A timer that fired just before the state changed is stale
+            if (machine.state == ConversationState.LISTENING
+                    and time.monotonic() - machine.changed_at >= self.timeout):
+                print("\nConversation timed out")
+                self._end(NAP_PHRASE, "nap")
+        elif name == "end":
+            if machine.state != ConversationState.IDLE:
+                self._end(GOODBYE_PHRASE, "goodbye")
+
+    def _handle_utterance(self, text: str):
+        if self.machine.state == ConversationState.IDLE:
+            if WAKE_PHRASE in text:
+                print("\nWake word detected!")
+                self.audio_handler.set_conversation_mode()
+                self._say(WAKE_ACK_PHRASE, "ack", ConversationState.LISTENING,
+                          only_from=(ConversationState.IDLE,))
+            return
+
+        if self._interrupted_prompt:
+            text = f"{self._interrupted_prompt} {text}"
+            self._interrupted_prompt = None
+        if END_PHRASE in text:
+            print("\nEnding conversation...")
+            self._end(GOODBYE_PHRASE, "goodbye")
+        else:
+            self._respond(text)
+
+    def _say(self, text: str, kind: str, then: str, only_from=None):
+        """Speak a canned line as a turn of its own, then move to then"""
+        token = CancellationToken()
+        if not self.machine.start_turn(ConversationState.SPEAKING, token, only_from):
+            return
+
+        def spoken():
+            self.machine.transition(then, turn=token)
+            if not token.cancelled:
+                self._spoken(kind)
+
+        self.tts_handler.speak(text, on_complete=spoken, token=token)
+
+    def _spoken(self, kind: str):
+        if self.on_spoken:
+            self.on_spoken(kind)
+
+    def _end(self, phrase: str, kind: str):
+        """Say phrase and go back to listening for the wake word"""
+        reply, self._reply = self._reply, None
+        if reply is not None:
+            reply[0].cancel("conversation ended")
+        self._interrupted_prompt = None
+        self.inputs.clear()
+        self.audio_handler.set_wake_mode()
+        self.client.reset_history()
+        self._say(phrase, kind, ConversationState.IDLE)
+        # Same voice for the whole conversation; the next may use a faster backend
+        self.tts_handler.release_voice()
+        print("\nListening for wake word 'Hey Gemma'...")
+
+    def _respond(self, text: str):
+        print(f"\nYou: {text}")
+        token = CancellationToken()
+        if not self.machine.start_turn(ConversationState.THINKING, token,
+                                       only_from=(ConversationState.LISTENING,)):
+            return
+        self._reply = (token, text)
+        started = False
+
+        def speaking():
+            nonlocal started
+            started = True
+            self.machine.transition(ConversationState.SPEAKING, turn=token)
+
+        def spoken():
+            if self.machine.transition(ConversationState.LISTENING, turn=token):
+                self._reply = None
+            if started and not token.cancelled:
+                self._spoken("reply")
+
+        planned = []
+        try:
+            # A repeated question replays the chunks its cached reply was spoken as
+            chunks = self.client.cached_chunks(text)
+            if chunks is not None:
+                print("Gemma:", " ".join(chunks))
+            else:
+                # Stream the response so the first sentence plays
+                # while Gemma is still generating the rest
+                def sentences():
+                    for sentence in self.client.stream_sentences(text, token):
+                        print("Gemma:", sentence)
+                        yield sentence
+
+                def recorded():
+                    for chunk in self.tts_handler.plan_chunks(sentences()):
+                        planned.append(chunk)
+                        yield chunk
+
+                chunks = recorded()
+
+            spoke = self.tts_handler.speak_chunks(chunks, on_complete=spoken, token=token, on_start=speaking)
+        except Exception as e:
+            if not token.cancelled:
+                print(f"Error processing response: {e}")
+            spoke = False
+
+        if planned and spoke and not token.cancelled:
+            self.client.cache_chunks(text, planned)
+
+        # Nothing was heard (e.g. every TTS backend failed), so say so
+        if not spoke and not token.cancelled:
+            self._reply = None
+            self._say(ERROR_PHRASE, "error", ConversationState.LISTENING)
@@ -0,0 +1,281 @@
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+import numpy as np
+import soundfile as sf
+from config.settings import (
+    OLLAMA_BASE_URL,
+    BATCH_WORKERS,
+    BATCH_PCM_RATE,
+    BATCH_REPLY_CONCURRENCY
+)
+from models.chat_history import ChatHistory
+from models.gemma_client import GemmaClient
+from models.ollama_transport import OllamaTransport
+from utils.async_runtime import get_runtime
+from utils.audio_handler import AudioHandler
+from utils.audio_postprocess import resample
+
+WAV_SUFFIXES = {".wav"}
+PCM_SUFFIXES = {".pcm", ".raw"}
+SAMPLE_RATE = 16000
+
+# One recognizer per worker process, created by _init_worker
+_worker_handler = None
+
+
+def find_recordings(root: Path) -> list:
+    """WAV and raw PCM files under root (or root itself), in name order"""
+    if root.is_file():
+        return [root]
+    return sorted(path for path in root.rglob("*") if path.suffix.lower() in WAV_SUFFIXES | PCM_SUFFIXES)
+
+
+def read_recording(path: Path, pcm_rate: int = BATCH_PCM_RATE) -> np.ndarray:
+    """16 kHz mono int16 samples of a WAV file or headerless 16-bit PCM file"""
+    if path.suffix.lower() in PCM_SUFFIXES:
+        samples, rate = np.fromfile(path, dtype="<i2"), pcm_rate
+    else:
+        data, rate = sf.read(str(path), dtype="int16", always_2d=True)
+        samples = data[:, 0] if data.shape[1] == 1 else data.mean(axis=1)
+    if rate != SAMPLE_RATE:
+        samples = resample(samples.astype(np.float32), rate, SAMPLE_RATE)
+    return samples.astype(np.int16, copy=False)
+
+
+def word_errors(reference: str, hypothesis: str) -> int:
+    """Word-level edit distance between two transcripts"""
+    ref, hyp = reference.lower().split(), hypothesis.lower().split()
+    row = list(range(len(hyp) + 1))
+    for i, word in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, other in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (word != other))
+    return row[-1]
+
+
+def _init_worker(model_path: str):
+    """Load the Vosk model once per process; every file the process gets reuses it"""
+    global _worker_handler
+    import vosk
+    vosk.SetLogLevel(-1)
+    _worker_handler = AudioHandler(audio=False, model=AudioHandler.load_model(model_path))
+
+
+def transcribe_file(path: str, pcm_rate: int = BATCH_PCM_RATE) -> dict:
+    """Recognize one recording in a worker process"""
+    result = {"file": path, "worker": os.getpid()}
+    try:
+        samples = read_recording(Path(path), pcm_rate)
+        started = time.time()
+        utterances = _worker_handler.transcribe_samples(samples)
+        finished = time.time()
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+    duration = len(samples) / SAMPLE_RATE
+    result.update({
+        "audio_seconds": duration,
+        "transcript": " ".join(utterances),
+        "utterances": utterances,
+        "decode_seconds": finished - started,
+        "rtf": (finished - started) / duration if duration else 0.0,
+        # Wall-clock times, so throughput can be measured across processes
+        "started": started,
+        "finished": finished
+    })
+    return result
+
+
+def summarize(values) -> dict:
+    if not values:
+        return {"n": 0}
+    p50, p95, mean = np.percentile(values, 50), np.percentile(values, 95), float(np.mean(values))
+    return {"n": len(values), "p50": p50, "p95": p95, "mean": mean}
+
+
+class BatchTranscriber:
+    """Runs a directory of recordings through Vosk on a process pool, optionally replaying them to Gemma
+
+    Each worker process loads the Vosk model once and recognizes whole files
+    with the live conversation-mode pipeline (VAD and endpointing included),
+    as fast as it can. Recordings in the same directory are a session: with
+    a client, their transcripts are sent in name order as one conversation,
+    and up to reply_concurrency sessions are in flight at once. Every file
+    becomes one JSON line in the output.
+    """
+
+    def __init__(self, model_path, workers: int = BATCH_WORKERS, pcm_rate: int = BATCH_PCM_RATE,
+                 client_factory=None, reply_concurrency: int = BATCH_REPLY_CONCURRENCY):
+        self.model_path = str(AudioHandler.ensure_model(model_path))
+        self.workers = workers or os.cpu_count() or 1
+        self.pcm_rate = pcm_rate
+        self.client_factory = client_factory  # Returns a GemmaClient per session; None for no replies
+        self.reply_concurrency = max(reply_concurrency, 1)
+        self.pool_size = 0
+        self.results = []
+        self._output = None
+        self._lock = threading.Lock()
+
+    def run(self, root: Path, output) -> dict:
+        files = find_recordings(Path(root))
+        if not files:
+            raise FileNotFoundError(f"No .wav, .pcm or .raw files in {root}")
+        self._output = output
+        self.pool_size = min(self.workers, len(files))
+        start = time.time()
+        # Spawned, as on Windows, so workers never inherit the runtime's threads
+        with ProcessPoolExecutor(max_workers=self.pool_size, initializer=_init_worker,
+                                 initargs=(self.model_path,),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {path: pool.submit(transcribe_file, str(path), self.pcm_rate) for path in files}
+            if self.client_factory is None:
+                for future in as_completed(futures.values()):
+                    self._write(self._with_reference(future.result()))
+            else:
+                self._replay_sessions(futures)
+        return self.report(start, time.time())
+
+    def _replay_sessions(self, futures: dict):
+        sessions = defaultdict(list)
+        for path, future in futures.items():
+            sessions[path.parent].append(future)
+        with ThreadPoolExecutor(max_workers=self.reply_concurrency, thread_name_prefix="batch-reply") as replies:
+            for done in as_completed([replies.submit(self._replay, session)
+                                      for session in sessions.values()]):
+                done.result()
+
+    def _replay(self, futures: list):
+        """Send one session's transcripts in order, as they become available"""
+        client = self.client_factory()
+        for future in futures:
+            result = self._with_reference(future.result())
+            if result.get("transcript"):
+                start = time.perf_counter()
+                first_token = None
+                tokens = []
+                for token in client.stream_response(result["transcript"]):
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    tokens.append(token)
+                reply = "".join(tokens)
+                result.update({
+                    "reply": reply,
+                    "reply_first_token_seconds": first_token,
+                    "reply_seconds": time.perf_counter() - start,
+                    "reply_failed": reply in (client.TIMEOUT_MESSAGE, client.ERROR_MESSAGE)
+                })
+            self._write(result)
+
+    def _with_reference(self, result: dict) -> dict:
+        """Add the word error rate if a .txt transcript sits next to the recording"""
+        reference = Path(result["file"]).with_suffix(".txt")
+        if "transcript" in result and reference.exists():
+            text = reference.read_text(encoding="utf-8").strip()
+            result["reference"] = text
+            result["word_errors"] = word_errors(text, result["transcript"])
+            result["wer"] = result["word_errors"] / max(len(text.split()), 1)
+        return result
+
+    def _write(self, result: dict):
+        with self._lock:
+            self.results.append(result)
+            self._output.write(json.dumps(result) + "\n")
+            self._output.flush()
+            if "error" in result:
+                print(f"{result['file']}: {result['error']}")
+
+    def report(self, start: float, end: float) -> dict:
+        done = [r for r in self.results if "error" not in r]
+        audio = sum(r["audio_seconds"] for r in done)
+        report = {
+            "files": len(self.results),
+            "failed": len(self.results) - len(done),
+            "workers": self.pool_size,
+            "audio_seconds": audio,
+            "wall_seconds": end - start,
+            "files_per_second": len(self.results) / (end - start) if end > start else 0.0,
+            "throughput_rtf": (end - start) / audio if audio else None,
+            "file_rtf": summarize([r["rtf"] for r in done])
+        }
+        if done:
+            # Steady state: from the first file starting to the last one finishing,
+            # so the time the workers spend loading the model is left out
+            first, last = min(r["started"] for r in done), max(r["finished"] for r in done)
+            report["startup_seconds"] = first - start
+            report["decode_wall_seconds"] = last - first
+            report["decode_rtf"] = (last - first) / audio if audio else None
+        scored = [r for r in done if "reference" in r]
+        if scored:
+            report["wer"] = (sum(r["word_errors"] for r in scored)
+                             / max(sum(len(r["reference"].split()) for r in scored), 1))
+            report["references"] = len(scored)
+        replied = [r for r in done if "reply" in r]
+        if replied:
+            report["reply_failed"] = sum(r["reply_failed"] for r in replied)
+            report["reply_first_token_seconds"] = summarize(
+                [r["reply_first_token_seconds"] for r in replied if r["reply_first_token_seconds"] is not None])
+            report["reply_seconds"] = summarize([r["reply_seconds"] for r in replied])
+        return report
+
+
+def print_report(report: dict):
+    print(f"\nfiles: {report['files']} ({report['failed']} failed) on {report['workers']} workers, "
+          f"{report['audio_seconds']:.1f} s of audio in {report['wall_seconds']:.1f} s")
+    print(f"files/s: {report['files_per_second']:.2f}")
+    if report.get("throughput_rtf") is not None:
+        print(f"real-time factor: {report['throughput_rtf']:.3f} overall, "
+              f"{report['decode_rtf']:.3f} after {report['startup_seconds']:.1f} s of model loading")
+    if report["file_rtf"]["n"]:
+        print(f"per-file RTF: p50 {report['file_rtf']['p50']:.3f}, p95 {report['file_rtf']['p95']:.3f}")
+    if "wer" in report:
+        print(f"WER: {report['wer'] * 100:.1f}% over {report['references']} files with a reference")
+    if "reply_seconds" in report:
+        first, total = report["reply_first_token_seconds"], report["reply_seconds"]
+        print(f"replies: {total['n']} ({report['reply_failed']} failed), "
+              f"first token p50 {first.get('p50', 0) * 1000:.0f} ms, total p50 {total['p50'] * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe recorded sessions offline and measure throughput")
+    parser.add_argument("input", help="directory of .wav/.pcm/.raw recordings (searched recursively), or one file")
+    parser.add_argument("-o", "--output", required=True, help="JSON lines file: one line per recording")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="recognition processes (0 = one per core)")
+    parser.add_argument("--pcm-rate", type=int, default=BATCH_PCM_RATE, help="sample rate of .pcm/.raw files")
+    parser.add_argument("--vosk-model", default=None, help="Vosk model directory (downloaded if missing)")
+    parser.add_argument("--reply", action="store_true",
+                        help="send each session's transcripts to Gemma and record the replies")
+    parser.add_argument("--reply-concurrency", type=int, default=BATCH_REPLY_CONCURRENCY)
+    parser.add_argument("--ollama-url", default=OLLAMA_BASE_URL)
+    parser.add_argument("--json", help="also write the summary to this file")
+    args = parser.parse_args()
+
+    transport = runtime = None
+    client_factory = None
+    if args.reply:
+        transport = OllamaTransport(base_url=args.ollama_url, pool_size=max(args.reply_concurrency, 1) + 1)
+        runtime = get_runtime()
+        # One history per session, one connection pool for all of them
+        client_factory = lambda: GemmaClient(transport=transport, runtime=runtime, history=ChatHistory())
+
+    transcriber = BatchTranscriber(args.vosk_model, args.workers, args.pcm_rate,
+                                   client_factory, args.reply_concurrency)
+    try:
+        with open(args.output, "w", encoding="utf-8") as output:
+            report = transcriber.run(Path(args.input), output)
+    finally:
+        if transport is not None:
+            transport.close()
+            runtime.stop()
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Local stand-ins for Ollama and audio devices used by benchmarks.
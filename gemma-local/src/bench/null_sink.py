@@ -0,0 +1,85 @@
+import bisect
+import threading
+import time
+import numpy as np
+
+
+class NullSink:
+    """Stand-in for sounddevice.OutputStream that discards audio in real time
+
+    Pass an instance as AudioPlayer(stream_factory=...). The stream pulls
+    blocks from the player callback at the device rate and records when each
+    stretch of non-silent audio started, so benchmarks can ask when the first
+    sound after a given moment was played.
+    """
+
+    def __init__(self):
+        self.onsets = []  # time.monotonic() at which audible output began
+        self.stream = None
+        self._lock = threading.Lock()
+
+    def __call__(self, samplerate: int, blocksize: int, channels: int, dtype: str, callback) -> "NullOutputStream":
+        self.stream = NullOutputStream(self, samplerate, blocksize, channels, callback)
+        return self.stream
+
+    def first_audio_after(self, since: float):
+        """Time the first audible block at or after since was played, or None"""
+        with self._lock:
+            index = bisect.bisect_left(self.onsets, since)
+            return self.onsets[index] if index < len(self.onsets) else None
+
+    def _record_onset(self, when: float):
+        with self._lock:
+            self.onsets.append(when)
+
+
+class _TimeInfo:
+    def __init__(self, dac_time: float):
+        self.outputBufferDacTime = dac_time
+
+
+class NullOutputStream:
+    latency = 0.0
+
+    def __init__(self, sink: NullSink, samplerate: int, blocksize: int, channels: int, callback):
+        self._sink = sink
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = channels
+        self._callback = callback
+        self._running = False
+        self._thread = None
+
+    @property
+    def time(self) -> float:
+        # Stream time is time.monotonic(), so the player's clock offset is ~0
+        return time.monotonic()
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="null-sink", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def close(self):
+        self.stop()
+
+    def _run(self):
+        period = self.blocksize / self.samplerate
+        outdata = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+        audible = False
+        due = time.monotonic()
+        while self._running:
+            self._callback(outdata, self.blocksize, _TimeInfo(due), None)
+            block_audible = bool(np.any(outdata))
+            if block_audible and not audible:
+                self._sink._record_onset(due)
+            audible = block_audible
+            due += period
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
@@ -0,0 +1,146 @@
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = ("Sure, I can help with that. Here is a short answer to your question. "
+                 "Let me know if you want more detail!")
+
+
+class StubOllamaServer:
+    """Local stand-in for the Ollama HTTP API with a controllable token rate
+
+    Serves /api/chat and /api/generate (streaming and non-streaming) by
+    replaying a canned reply word by word, after first_token_delay seconds
+    and at tokens_per_second.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, first_token_delay: float = 0.2,
+                 tokens_per_second: float = 30.0, reply: str = DEFAULT_REPLY):
+        self.first_token_delay = first_token_delay
+        self.tokens_per_second = tokens_per_second
+        self.reply = reply
+        self.requests = 0
+        self.payloads = []  # (path, JSON body) of every POST, in arrival order
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve on the calling thread until interrupted"""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def tokens(self):
+        # Words with their trailing whitespace, so joining them restores the reply
+        return re.findall(r"\S+\s*", self.reply)
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": [{"name": "stub"}]})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if self.path not in ("/api/chat", "/api/generate"):
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with stub._lock:
+                    stub.requests += 1
+                    stub.payloads.append((self.path, payload))
+
+                chat = self.path == "/api/chat"
+                tokens = stub.tokens()
+                limit = payload.get("options", {}).get("num_predict")
+                if limit is not None and limit >= 0:
+                    tokens = tokens[:limit]
+
+                time.sleep(stub.first_token_delay)
+                if not payload.get("stream", True):
+                    for _ in tokens[1:]:
+                        time.sleep(1 / stub.tokens_per_second)
+                    self._send_json(self._message("".join(tokens), chat, done=True))
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for i, token in enumerate(tokens):
+                        if i:
+                            time.sleep(1 / stub.tokens_per_second)
+                        self._send_chunk(self._message(token, chat, done=False))
+                    self._send_chunk(self._message("", chat, done=True))
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _message(self, text, chat, done):
+                if chat:
+                    return {"message": {"role": "assistant", "content": text}, "done": done}
+                return {"response": text, "done": done}
+
+            def _send_chunk(self, data):
+                body = (json.dumps(data) + "\n").encode()
+                self.wfile.write(f"{len(body):X}\r\n".encode() + body + b"\r\n")
+                self.wfile.flush()
+
+            def _send_json(self, data):
+                body = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Ollama server for local testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=30.0)
+    args = parser.parse_args()
+
+    stub = StubOllamaServer(args.host, args.port, args.first_token_delay, args.tokens_per_second)
+    print(f"Stub Ollama listening on {stub.url}")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
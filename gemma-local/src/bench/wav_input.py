@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+import soundfile as sf
+
+
+class WavInput:
+    """Stand-in for pyaudio.PyAudio that replays WAV files as microphone input
+
+    Pass an instance as AudioHandler(audio=...). The stream it opens delivers
+    16-bit mono audio at real-time pace, from read() or to a stream_callback: silence by default, and the samples
+    of each clip handed to play(), which returns the time.monotonic() at which
+    the clip's last sample was read (the end of speech as the pipeline saw it).
+    """
+
+    def __init__(self, sample_rate: int = 16000):
+        self.sample_rate = sample_rate
+        self._clips = deque()  # [samples, offset, done event, end time]
+        self._lock = threading.Lock()
+
+    def load(self, path) -> np.ndarray:
+        """Read a WAV file as 16-bit mono at the input sample rate"""
+        data, rate = sf.read(str(path), dtype="int16", always_2d=True)
+        samples = data.mean(axis=1)
+        if rate != self.sample_rate:
+            target = np.arange(int(len(samples) * self.sample_rate / rate)) / self.sample_rate
+            samples = np.interp(target, np.arange(len(samples)) / rate, samples)
+        return samples.astype(np.int16)
+
+    def play(self, clip, timeout: float = None) -> float:
+        """Queue a clip (path or int16 samples) and wait until it has been read"""
+        samples = self.load(clip) if not isinstance(clip, np.ndarray) else clip.astype(np.int16)
+        entry = [samples, 0, threading.Event(), None]
+        with self._lock:
+            self._clips.append(entry)
+        if not entry[2].wait(timeout):
+            raise TimeoutError("input stream is not being read")
+        return entry[3]
+
+    def open(self, rate: int = 16000, frames_per_buffer: int = 1024, stream_callback=None,
+             **kwargs) -> "WavInputStream":
+        if rate != self.sample_rate:
+            raise ValueError(f"WavInput was created for {self.sample_rate} Hz, not {rate} Hz")
+        stream = WavInputStream(self)
+        if stream_callback is not None:
+            stream.start_callback(stream_callback, frames_per_buffer)
+        return stream
+
+    def terminate(self):
+        pass
+
+    def _fill(self, out: np.ndarray) -> list:
+        """Copy queued clip samples into out; return the clips that finished"""
+        finished = []
+        position = 0
+        with self._lock:
+            while self._clips and position < len(out):
+                entry = self._clips[0]
+                samples, offset = entry[0], entry[1]
+                count = min(len(samples) - offset, len(out) - position)
+                out[position:position + count] = samples[offset:offset + count]
+                position += count
+                entry[1] += count
+                if entry[1] >= len(samples):
+                    finished.append(self._clips.popleft())
+        return finished
+
+
+class WavInputStream:
+    """Input stream paced like a real microphone, read blocking or through a callback"""
+
+    def __init__(self, source: WavInput):
+        self._source = source
+        self._start = None
+        self._delivered = 0
+        self._thread = None
+        self._running = False
+
+    def start_callback(self, callback, frames_per_buffer: int):
+        """Hand each buffer to callback(in_data, frame_count, time_info, status) like PortAudio"""
+        def run():
+            while self._running:
+                callback(self.read(frames_per_buffer), frames_per_buffer, {}, 0)
+
+        self._running = True
+        self._thread = threading.Thread(target=run, name="wav-input", daemon=True)
+        self._thread.start()
+
+    def read(self, num_frames: int, exception_on_overflow: bool = True) -> bytes:
+        if self._start is None:
+            self._start = time.monotonic()
+        out = np.zeros(num_frames, dtype=np.int16)
+        finished = self._source._fill(out)
+
+        # A real read returns once the last frame has been captured
+        self._delivered += num_frames
+        delay = self._start + self._delivered / self._source.sample_rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        now = time.monotonic()
+        for entry in finished:
+            entry[3] = now
+            entry[2].set()
+        return out.tobytes()
+
+    def stop_stream(self):
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+
+    def close(self):
+        pass
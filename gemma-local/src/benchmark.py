@@ -0,0 +1,198 @@
+import argparse
+import json
+import queue
+import tempfile
+import threading
+import time
+import numpy as np
+from pathlib import Path
+from config.settings import FIXED_PHRASES, BENCH_TTS_LATENCY, BENCH_TURN_TIMEOUT
+from assistant import VoiceAssistant
+from bench.null_sink import NullSink
+from bench.stub_ollama import StubOllamaServer
+from bench.wav_input import WavInput
+from models.gemma_client import GemmaClient
+from models.ollama_transport import OllamaTransport
+from utils.async_runtime import get_runtime
+from utils.audio_handler import AudioHandler
+from utils.audio_player import AudioPlayer
+from utils.metrics import enable_metrics, get_metrics
+from utils.tts_backends import FakeTTSBackend
+from utils.tts_cache import TTSCache
+from utils.tts_handler import TTSHandler
+
+VOSK_MODEL_PATH = Path(__file__).parent / "models" / "vosk-model-small-en-us-0.15"
+METRICS = ["wake_to_ack", "speech_end_to_first_audio", "turn_total"]
+
+
+def percentiles(values) -> dict:
+    if not values:
+        return {"n": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"n": len(values), "p50_ms": p50 * 1000, "p95_ms": p95 * 1000, "p99_ms": p99 * 1000}
+
+
+class CannedLineCache(TTSCache):
+    """Keeps only the canned lines, so every reply is synthesized"""
+
+    def put(self, text, voice, fmt, data, samplerate, encoded=None):
+        if any(text in phrase for phrase in FIXED_PHRASES):
+            super().put(text, voice, fmt, data, samplerate, encoded)
+
+
+class LatencyBenchmark:
+    """Replays recorded speech through the full voice pipeline and times each turn
+
+    Everything after the microphone is the production code path (VAD, Vosk,
+    VoiceAssistant.handle_speech, GemmaClient, TTSHandler, AudioPlayer);
+    only Ollama, edge-tts and the audio devices are local stand-ins. Each
+    iteration says the wake clip, then the question clip, then ends the
+    conversation.
+    """
+
+    def __init__(self, wake_clip, question_clip, first_token_delay: float, tokens_per_second: float,
+                 tts_latency: float = BENCH_TTS_LATENCY, tts_cache: bool = False, vosk_model=VOSK_MODEL_PATH):
+        self.stub = StubOllamaServer(first_token_delay=first_token_delay,
+                                     tokens_per_second=tokens_per_second).start()
+        self.runtime = get_runtime()
+        self.client = GemmaClient(transport=OllamaTransport(base_url=self.stub.url), runtime=self.runtime)
+
+        self.sink = NullSink()
+        player = AudioPlayer(stream_factory=self.sink)
+        player.start()
+        self._cache_dir = tempfile.TemporaryDirectory(prefix="gemma-bench-")
+        # The canned lines are prefilled below, as in main.py
+        cache = (TTSCache(self._cache_dir.name) if tts_cache
+                 else CannedLineCache(self._cache_dir.name, max_disk_bytes=0))
+        self.tts = TTSHandler(cache=cache, runtime=self.runtime, player=player,
+                              backends=[FakeTTSBackend(latency=tts_latency)])
+        self.tts.prefill(FIXED_PHRASES).result()
+
+        self.mic = WavInput()
+        self.wake_clip = self.mic.load(wake_clip)
+        self.question_clip = self.mic.load(question_clip)
+        self.audio = AudioHandler(audio=self.mic, model_path=vosk_model)
+
+        self.assistant = VoiceAssistant(self.client, self.tts, self.audio)
+        self._spoken = queue.Queue()
+        self.assistant.on_spoken = lambda kind: self._spoken.put((kind, time.monotonic()))
+        self.samples = {metric: [] for metric in METRICS}
+        self.failures = 0
+
+    def _wait_spoken(self, kinds, timeout: float = BENCH_TURN_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                kind, done = self._spoken.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return None, None
+            if kind in kinds:
+                return kind, done
+
+    def _silence(self, seconds: float):
+        self.mic.play(np.zeros(int(seconds * self.mic.sample_rate), dtype=np.int16))
+
+    def run_turn(self) -> bool:
+        wake_end = self.mic.play(self.wake_clip)
+        kind, _ = self._wait_spoken({"ack"})
+        if kind is None:
+            print("Wake word was not recognized")
+            return False
+        # Wake detection fires on partial results, so the ack may start
+        # before the clip has ended
+        ack_start = self.sink.first_audio_after(wake_end - len(self.wake_clip) / self.mic.sample_rate)
+
+        speech_end = self.mic.play(self.question_clip)
+        kind, reply_done = self._wait_spoken({"reply", "error"})
+        try:
+            if kind != "reply":
+                print("Question did not produce a reply")
+                return False
+            reply_start = self.sink.first_audio_after(speech_end)
+            self.samples["wake_to_ack"].append(ack_start - wake_end)
+            self.samples["speech_end_to_first_audio"].append(reply_start - speech_end)
+            self.samples["turn_total"].append(reply_done - speech_end)
+            return True
+        finally:
+            self.assistant.end_conversation()
+            self._wait_spoken({"goodbye"})
+
+    def run(self, turns: int, gap: float = 0.5) -> dict:
+        self.assistant.start()
+        listener = threading.Thread(target=self.audio.listen_continuous,
+                                    args=(self.assistant.handle_speech,), daemon=True)
+        listener.start()
+        try:
+            # Let the noise floor settle before the first clip
+            self._silence(1.0)
+            for turn in range(turns):
+                if not self.run_turn():
+                    self.failures += 1
+                print(f"Turn {turn + 1}/{turns} done")
+                self._silence(gap)
+        finally:
+            self.audio.stop_listening()
+            listener.join(timeout=2)
+            self.assistant.stop()
+        return self.report()
+
+    def report(self) -> dict:
+        return {
+            "metrics": {metric: percentiles(values) for metric, values in self.samples.items()},
+            "failures": self.failures,
+            "ollama_requests": self.stub.requests,
+            "tts_cache_hits": self.tts.cache.hits,
+            "audio": self.audio.audio_stats(),
+            "stages": get_metrics().snapshot()
+        }
+
+    def close(self):
+        self.client.shutdown()
+        self.tts.close()
+        self.stub.stop()
+        self.runtime.stop()
+        self._cache_dir.cleanup()
+
+
+def print_report(report: dict):
+    print(f"\n{'metric':<28}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for metric, stats in report["metrics"].items():
+        if not stats["n"]:
+            print(f"{metric:<28}{0:>5}")
+            continue
+        print(f"{metric:<28}{stats['n']:>5}{stats['p50_ms']:>10.0f}{stats['p95_ms']:>10.0f}{stats['p99_ms']:>10.0f}")
+    print(f"failed turns: {report['failures']}, Ollama requests: {report['ollama_requests']}, "
+          f"TTS cache hits: {report['tts_cache_hits']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure wake, first-audio and turn latency from recorded speech")
+    parser.add_argument("--wake", required=True, help="WAV clip of the wake phrase, trimmed at the end")
+    parser.add_argument("--question", required=True, help="WAV clip of a question, trimmed at the end")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--gap", type=float, default=0.5, help="seconds of silence between turns")
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=30.0)
+    parser.add_argument("--tts-latency", type=float, default=BENCH_TTS_LATENCY)
+    parser.add_argument("--tts-cache", action="store_true",
+                        help="cache replies too (by default only the canned lines are cached)")
+    parser.add_argument("--vosk-model", default=str(VOSK_MODEL_PATH))
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--metrics", action="store_true", help="include per-stage metrics in the JSON report")
+    args = parser.parse_args()
+
+    if args.metrics:
+        enable_metrics()
+
+    benchmark = LatencyBenchmark(args.wake, args.question, args.first_token_delay, args.tokens_per_second,
+                                 args.tts_latency, args.tts_cache, args.vosk_model)
+    try:
+        report = benchmark.run(args.turns, args.gap)
+    finally:
+        benchmark.close()
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import os
+
 OLLAMA_BASE_URL = "http://localhost:11434"
 GEMMA_MODEL_NAME = "gemma:2b"
 MAX_TOKENS = 2000
@@ -5,6 +7,136 @@ TEMPERATURE = 0.85
 
 # TTS Settings
 MAX_CHUNK_LENGTH = 150  # Maximum characters per TTS chunk
-CHUNK_OVERLAP = 20  # Characters of overlap between chunks to maintain flow
+CHUNK_OVERLAP = 20  # Characters a chunk may run past its limit to end at a clause boundary
+TTS_MIN_CHUNK_LENGTH = 40  # Shorter sentences are merged into the next chunk (except the first)
+TTS_FIRST_AUDIO_TARGET = 0.4  # Seconds the first chunk of a streamed reply should take to synthesize
+TTS_DEFAULT_CHARS_PER_SECOND = 100  # Assumed synthesis speed of a backend until measured
+TTS_TRIM_THRESHOLD = 0.01  # Peak level (of full scale) below which a chunk's ends count as silence
+TTS_TRIM_KEEP_MS = 60  # Silence kept at each end of a chunk, so sentences do not run together
+TTS_TRIM_FRAME_MS = 10  # Resolution of the silence trimming
+TTS_MAX_CONCURRENCY = 3  # edge-tts requests in flight at once
+TTS_CACHE_DIR = os.path.expanduser("~/.cache/gemma-local/tts")  # On-disk tier of the TTS cache
+TTS_CACHE_MEMORY_ENTRIES = 64  # Decoded clips kept in memory
+TTS_CACHE_DISK_BYTES = 50 * 1024 * 1024  # Size bound of the on-disk tier
+TTS_BACKENDS = ("piper", "edge")  # Engines to use; picked by measured latency (also: "fake")
+PIPER_VOICE = "en_US-amy-low"  # Local Piper voice, fetched by utils/voice_downloader.py
+TTS_BACKEND_LATENCY_ALPHA = 0.3  # Weight of the newest sample in each backend's latency average
+TTS_BACKEND_COOLDOWN = 30  # Seconds a failing backend is skipped
+TTS_BACKEND_PROBE_EVERY = 20  # Time the runner-up backend (never played) every this many utterances
 
 SYSTEM_PROMPT = """System Prompt"""
+
+# Conversation memory
+CHAT_HISTORY_TOKEN_BUDGET = 1024  # Estimated tokens of past turns sent with each request
+CHAT_HISTORY_MAX_MESSAGES = 32  # Hard cap on remembered messages
+CHAT_HISTORY_SUMMARIZE = False  # Fold evicted turns into a rolling summary (one extra Ollama call each)
+
+# Conversation phrases
+WAKE_PHRASE = "hey gemma"
+END_PHRASE = "thanks and goodbye"
+CONVERSATION_TIMEOUT = 20  # Seconds of silence before going back to wake-word mode
+INPUT_QUEUE_SIZE = 4  # Utterances that can wait while a turn is running
+# What happens to utterances that arrive mid-turn: "coalesce" joins them into
+# one prompt (and with a reply cut off before it said anything), "latest"
+# keeps only the newest, "queue" answers each in turn and drops any beyond
+# INPUT_QUEUE_SIZE
+INPUT_QUEUE_POLICY = "coalesce"
+
+# Canned responses, pre-synthesized at startup
+WAKE_ACK_PHRASE = "Hi! How can I help you?"
+GOODBYE_PHRASE = "Goodbye! Let me know if you need anything else."
+NAP_PHRASE = "Shush! I'm going to take a nap now. Let me know if you need anything."
+ERROR_PHRASE = "I'm sorry, I had trouble processing that. Could you try again?"
+FIXED_PHRASES = [WAKE_ACK_PHRASE, GOODBYE_PHRASE, NAP_PHRASE, ERROR_PHRASE]
+
+# Response cache for repeated questions (opt-in, e.g. for kiosks)
+RESPONSE_CACHE_ENABLED = False
+RESPONSE_CACHE_MAX_ENTRIES = 128
+RESPONSE_CACHE_TTL = 3600  # Seconds a cached reply stays valid
+# Prompts containing these pronouns, or opening like a follow-up, refer back
+# to the conversation and always go to the model; other words such as "why"
+# or "more" also start ordinary standalone questions
+RESPONSE_CACHE_FOLLOWUP_WORDS = ("it", "that", "they", "them", "their", "he", "she", "him", "her", "his",
+                                 "those", "these")
+RESPONSE_CACHE_FOLLOWUP_PREFIXES = ("and ", "but ", "so ", "then ", "what about ", "how about ",
+                                    "tell me more", "what else", "say again")
+
+# Model downloads (Vosk, Piper voices)
+ASSET_CACHE_DIR = os.path.expanduser("~/.cache/gemma-local/assets")  # Downloads and default install location
+ASSET_CHUNK_SIZE = 1024 * 1024  # Bytes per read/write while downloading
+ASSET_DOWNLOAD_WORKERS = 4  # Assets fetched at once
+ASSET_RETRIES = 3  # Resumed attempts after an interrupted transfer
+ASSET_CONNECT_TIMEOUT = 10.0
+ASSET_READ_TIMEOUT = 60.0
+VOSK_MODEL_SHA256 = None  # Pin the Vosk zip's SHA-256 to verify it
+PIPER_VOICES_URL = "https://huggingface.co/rhasspy/piper-voices/resolve/main"
+
+# Ollama transport
+OLLAMA_KEEP_ALIVE = "30m"  # How long Ollama keeps the model loaded between turns (-1 = never unload)
+OLLAMA_POOL_SIZE = 4  # Pooled HTTP connections to Ollama
+OLLAMA_CONNECT_TIMEOUT = 3.0  # Seconds to establish a connection
+OLLAMA_FIRST_TOKEN_TIMEOUT = 60.0  # Seconds to wait for the first token (covers cold model loads)
+OLLAMA_TOTAL_TIMEOUT = 120.0  # Seconds allowed for a whole response
+
+# Playback
+PLAYBACK_SAMPLERATE = 24000  # Output rate if the device's own cannot be queried, and for null sinks
+PLAYBACK_BLOCK_MS = 20  # Audio per output callback
+PLAYBACK_BUFFER_SECONDS = 30  # Audio that can be queued ahead of the device
+PLAYBACK_CROSSFADE_MS = 10  # Overlap between consecutive chunks, to avoid clicks at the joins
+
+# Voice activity detection in front of Vosk
+VAD_ENABLED = True
+VAD_FRAME_MS = 20  # Analysis frame length
+VAD_ENERGY_THRESHOLD = 300  # Minimum RMS (int16 scale) for a frame to count as speech
+VAD_NOISE_RATIO = 3.0  # Speech must also be this many times louder than the tracked noise floor
+VAD_MAX_ZCR = 0.35  # Zero-crossing rate above which quiet frames are treated as noise
+VAD_HANGOVER_MS = 300  # Audio still passed after the last speech frame
+VAD_PREROLL_MS = 200  # Audio before speech onset that is passed along with it
+
+# Audio capture
+AUDIO_BUFFER_SECONDS = 10  # Microphone audio buffered ahead of the recognizer
+TRANSCRIPT_QUEUE_SIZE = 4  # Transcripts waiting for handle_speech before new ones are dropped
+
+# Endpointing (finalizing utterances from partial results)
+RECOGNITION_BLOCK_MS = 100  # Audio fed to Vosk per step; also the endpointing resolution
+ENDPOINT_TRAILING_SILENCE_MS = 400  # Silence after speech before a stable partial is finalized
+ENDPOINT_STABLE_PARTIAL_MS = 300  # How long the partial result must stay unchanged
+ENDPOINT_MAX_SILENCE_MS = 900  # Finalize after this much silence even if the partial still changes
+ENDPOINT_BASELINE_SILENCE_MS = 1000  # Assumed recognizer endpoint delay until one has been measured
+
+# Barge-in (talking over the assistant cancels its turn)
+BARGE_IN_ENABLED = True
+BARGE_IN_ENERGY_THRESHOLD = 800  # Minimum microphone RMS (int16 scale) to count as the user talking
+BARGE_IN_ECHO_RATIO = 0.5  # ...and at least this times the playback RMS, so our own voice does not count
+BARGE_IN_MIN_SPEECH_MS = 200  # Speech needed before the turn is cancelled
+BARGE_IN_PREROLL_MS = 500  # Audio before the cancel that is handed to the recognizer
+
+# Server mode
+SERVER_HOST = "0.0.0.0"
+SERVER_PORT = 8765
+SERVER_MAX_SESSIONS = 64
+SERVER_SESSION_TTL = 600  # Seconds before an idle session is dropped
+SERVER_MAX_PENDING = 16  # Turns admitted (queued or generating) before new ones are refused
+SERVER_GENERATION_WORKERS = 1  # Generations sent to Ollama at once (match OLLAMA_NUM_PARALLEL)
+SERVER_MAX_BODY_BYTES = 4 * 1024 * 1024  # Larger requests get 413 (about two minutes of 16 kHz PCM)
+SERVER_AUDIO_RATES = (8000, 48000)  # Accepted sample rates of uploaded PCM, in Hz
+SERVER_TRANSCRIPTION_WORKERS = 2  # Uploads transcribed at once
+SERVER_TRANSCRIPTION_WAIT = 2.0  # Seconds an upload waits for a transcription slot before 503
+
+# Metrics (set GEMMA_METRICS=1 to collect; near-zero cost when off)
+METRICS_ENABLED = os.environ.get("GEMMA_METRICS") == "1"
+METRICS_EXPORT_PATH = os.environ.get("GEMMA_METRICS_FILE")  # JSON lines snapshots, if set
+METRICS_EXPORT_INTERVAL = 10  # Seconds between snapshots
+METRICS_PREFIX = "gemma_"
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+METRICS_RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# Latency benchmark (src/benchmark.py)
+BENCH_TTS_LATENCY = 0.15  # Seconds before the fake TTS returns audio
+BENCH_SPEECH_CHARS_PER_SECOND = 15  # Length of the fake speech per character of text
+BENCH_TURN_TIMEOUT = 30  # Give up on a benchmark turn after this many seconds
+
+# Batch transcription (src/batch_transcribe.py)
+BATCH_WORKERS = 0  # Recognition processes, each with its own Vosk model (0 = one per CPU core)
+BATCH_PCM_RATE = 16000  # Sample rate of headerless .pcm/.raw files (16-bit mono)
+BATCH_REPLY_CONCURRENCY = 1  # Sessions sent to Ollama at once with --reply (match OLLAMA_NUM_PARALLEL)
@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import deque
+from typing import Optional, Tuple
+from config.settings import INPUT_QUEUE_SIZE, INPUT_QUEUE_POLICY
+
+class ConversationState:
+    IDLE = "idle"  # Waiting for the wake phrase
+    LISTENING = "listening"  # In a conversation, waiting for the user
+    THINKING = "thinking"  # Generating a reply, nothing spoken yet
+    SPEAKING = "speaking"  # A reply or canned line is playing
+
+
+class ConversationMachine:
+    """The conversation's state and the transitions allowed between states
+
+    Each reply or canned line is a turn, identified by any object (the
+    assistant uses its CancellationToken). Events that belong to a turn,
+    such as "finished playing", pass it as turn and are ignored once a
+    newer turn has started, so a late callback cannot undo a newer state.
+    Listeners run inside the (short) critical section, in transition
+    order, so they must be quick and must not call back into the machine.
+    """
+
+    TRANSITIONS = {
+        ConversationState.IDLE: {ConversationState.SPEAKING},
+        ConversationState.LISTENING: {ConversationState.THINKING, ConversationState.SPEAKING},
+        ConversationState.THINKING: {ConversationState.SPEAKING, ConversationState.LISTENING},
+        ConversationState.SPEAKING: {ConversationState.LISTENING, ConversationState.IDLE,
+                                     ConversationState.SPEAKING}
+    }
+
+    def __init__(self):
+        self.state = ConversationState.IDLE
+        self.turn = None
+        self.changed_at = time.monotonic()
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def on_change(self, listener):
+        """Call listener(old, new) on every transition"""
+        self._listeners.append(listener)
+
+    def start_turn(self, new: str, turn, only_from=None) -> bool:
+        """Move to new as the start of turn"""
+        with self._lock:
+            if not self._allowed(new, only_from):
+                return False
+            self.turn = turn
+            self._enter(new)
+            return True
+
+    def transition(self, new: str, turn=None, only_from=None) -> bool:
+        """Move to new if allowed (and, if given, turn is still the current one)"""
+        with self._lock:
+            if turn is not None and turn is not self.turn:
+                return False
+            if not self._allowed(new, only_from):
+                return False
+            self._enter(new)
+            return True
+
+    def _allowed(self, new: str, only_from) -> bool:
+        if only_from is not None and self.state not in only_from:
+            return False
+        return new in self.TRANSITIONS[self.state]
+
+    def _enter(self, new: str):
+        old, self.state = self.state, new
+        self.changed_at = time.monotonic()
+        for listener in self._listeners:
+            try:
+                listener(old, new)
+            except Exception as e:
+                print(f"Error in state listener: {e}")
+
+
+class InputQueue:
+    """Bounded queue of utterances and events waiting for the assistant
+
+    Utterances pile up while a turn is running, as the consumer only takes
+    them between turns; policy decides what happens to them (see
+    INPUT_QUEUE_POLICY). Events such as a timeout are never dropped and
+    are handled before waiting utterances.
+    """
+
+    QUEUE = "queue"
+    LATEST = "latest"
+    COALESCE = "coalesce"
+
+    def __init__(self, maxsize: int = INPUT_QUEUE_SIZE, policy: str = INPUT_QUEUE_POLICY):
+        if policy not in (self.QUEUE, self.LATEST, self.COALESCE):
+            raise ValueError(f"Unknown input queue policy: {policy}")
+        self.maxsize = max(maxsize, 1)
+        self.policy = policy
+        self._utterances = deque()  # [text, number of utterances joined into it]
+        self._events = deque()
+        self._condition = threading.Condition()
+        self._woken = False
+        self.dropped = 0
+        self.coalesced = 0
+
+    def put(self, text: str) -> bool:
+        """Add an utterance; False if the policy dropped it"""
+        with self._condition:
+            if self.policy == self.COALESCE and self._utterances:
+                entry = self._utterances[-1]
+                if entry[1] >= self.maxsize:
+                    self.dropped += 1
+                    return False
+                entry[0] = f"{entry[0]} {text}"
+                entry[1] += 1
+                self.coalesced += 1
+            elif self.policy == self.LATEST and self._utterances:
+                self.dropped += len(self._utterances)
+                self._utterances.clear()
+                self._utterances.append([text, 1])
+            elif len(self._utterances) >= self.maxsize:
+                self.dropped += 1
+                return False
+            else:
+                self._utterances.append([text, 1])
+            self._condition.notify()
+            return True
+
+    def put_event(self, name: str):
+        with self._condition:
+            self._events.append(name)
+            self._condition.notify()
+
+    def get(self, timeout: float = None, speech: bool = True) -> Optional[Tuple[str, str]]:
+        """Next ("event", name) or, if speech, ("speech", text)
+
+        Returns None on timeout or when woken by wake(), so the caller can
+        check whether it takes utterances now.
+        """
+        with self._condition:
+            ready = lambda: self._events or (speech and self._utterances) or self._woken
+            if not self._condition.wait_for(ready, timeout):
+                return None
+            self._woken = False
+            if self._events:
+                return "event", self._events.popleft()
+            if speech and self._utterances:
+                return "speech", self._utterances.popleft()[0]
+            return None
+
+    def wake(self):
+        """Make a waiting get() return (e.g. because the consumer's state changed)"""
+        with self._condition:
+            self._woken = True
+            self._condition.notify()
+
+    def clear(self) -> int:
+        """Drop waiting utterances (not events); returns how many"""
+        with self._condition:
+            count = len(self._utterances)
+            self._utterances.clear()
+            return count
+
+    def __len__(self):
+        return len(self._utterances)
+
+    def stats(self) -> dict:
+        return {
+            "input_queue_depth": len(self._utterances),
+            "input_dropped": self.dropped,
+            "input_coalesced": self.coalesced
+        }
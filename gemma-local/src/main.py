@@ -1,22 +1,37 @@
 import signal
 import sys
+from config.settings import (
+    FIXED_PHRASES,
+    METRICS_EXPORT_PATH,
+    METRICS_EXPORT_INTERVAL,
+    RESPONSE_CACHE_ENABLED
+)
+from assistant import VoiceAssistant
 from models.gemma_client import GemmaClient
-from utils.audio_handler import AudioHandler
+from models.response_cache import ResponseCache
+from utils.async_runtime import get_runtime
+from utils.audio_handler import AudioHandler, open_audio
+from utils.metrics import get_metrics
+from utils.startup import StartupOrchestrator
 from utils.tts_handler import TTSHandler
 import time
 import threading
-import asyncio
 import os
-import sounddevice as sd  # Add this import
 
 def main():
     print("Starting Gemma service...")
-    client = GemmaClient()
-    
+    # One event loop thread shared by generation and synthesis
+    runtime = get_runtime()
+    metrics = get_metrics()
+    if METRICS_EXPORT_PATH:
+        metrics.start_export(METRICS_EXPORT_PATH, METRICS_EXPORT_INTERVAL)
+    client = GemmaClient(runtime=runtime,
+                         response_cache=ResponseCache() if RESPONSE_CACHE_ENABLED else None)
+
     # Initialize components and flags
     audio_handler = None
     tts_handler = None
-    timeout_thread = None
+    assistant = None
     running = True
     cleanup_in_progress = False
 
@@ -42,7 +57,7 @@ def main():
         if client:
             client.shutdown()
         if audio_handler:
-            audio_handler.pause_listening()
+            audio_handler.stop_listening()
             
         # Set a timeout for cleanup
         threading.Timer(5.0, force_exit).start()
@@ -52,129 +67,40 @@ def main():
     signal.signal(signal.SIGTERM, signal_handler)
     
     try:
-        audio_handler = AudioHandler()
-        tts_handler = TTSHandler()
+        # Independent phases run in parallel; listening starts once the
+        # audio path is up while the LLM and TTS engines finish warming
+        startup = StartupOrchestrator()
+        startup.add("pyaudio", open_audio)
+        startup.add("vosk model", AudioHandler.load_model)
+        startup.add("tts", lambda: TTSHandler(runtime=runtime))
+        startup.add("audio handler",
+                    lambda: AudioHandler(audio=startup.result("pyaudio"), model=startup.result("vosk model")),
+                    after=["pyaudio", "vosk model"])
+        startup.add("ollama warmup", client.warmup, background=True)
+        startup.add("tts engines", lambda: startup.result("tts").wait_until_loaded(), after=["tts"],
+                    background=True)
+        # Pre-synthesize canned lines so the wake-word reply plays instantly
+        startup.add("tts prefill",
+                    lambda: startup.result("tts").prefill(
+                        FIXED_PHRASES + [GemmaClient.TIMEOUT_MESSAGE, GemmaClient.ERROR_MESSAGE]
+                    ).result(),
+                    after=["tts engines"], background=True)
+        try:
+            phases = startup.run()
+        finally:
+            print(startup.report())
+        tts_handler = phases["tts"]
+        audio_handler = phases["audio handler"]
         
         if not audio_handler.is_ready or not tts_handler.is_ready:
             raise Exception("Audio systems not initialized properly")
         
-        # Use a threading event for cleaner shutdown
-        shutdown_event = threading.Event()
-        state_lock = threading.Lock()
-        conversation_state = {
-            'in_conversation': False,
-            'last_interaction': time.time(),
-            'processing': False
-        }
+        assistant = VoiceAssistant(client, tts_handler, audio_handler)
         
         print("\nReady! Listening for wake word 'Hey Gemma'...")
         
-        def update_last_interaction():
-            with state_lock:
-                conversation_state['last_interaction'] = time.time()
-        
-        def handle_speech(text):
-            with state_lock:
-                if conversation_state.get('processing', False):
-                    print("Still processing previous request...")
-                    return
-
-                conversation_state['processing'] = True
-                try:
-                    if not conversation_state['in_conversation']:
-                        if "hey gemma" in text:
-                            print("\nWake word detected!")
-                            audio_handler.pause_listening()
-                            conversation_state['in_conversation'] = True
-                            conversation_state['last_interaction'] = time.time()
-                            
-                            tts_handler.speak(
-                                "Hi! How can I help you?",
-                                on_complete=lambda: audio_handler.resume_listening()
-                            )
-                    else:
-                        if "thanks and goodbye" in text:
-                            print("\nEnding conversation...")
-                            audio_handler.pause_listening()
-                            conversation_state['in_conversation'] = False
-                            tts_handler.speak(
-                                "Goodbye! Let me know if you need anything else.",
-                                on_complete=lambda: audio_handler.resume_listening()
-                            )
-                            print("\nListening for wake word 'Hey Gemma'...")
-                        elif time.time() - conversation_state['last_interaction'] > 20:
-                            print("\nConversation timed out")
-                            audio_handler.pause_listening()
-                            conversation_state['in_conversation'] = False
-                            tts_handler.speak(
-                                "Goodbye! Let me know if you need anything else.",
-                                on_complete=lambda: audio_handler.resume_listening()
-                            )
-                            print("\nListening for wake word 'Hey Gemma'...")
-                        else:
-                            print(f"\nYou: {text}")
-                            audio_handler.pause_listening()
-                            try:
-                                # Generate response
-                                response = client.generate_response(text)
-                                print("Gemma:", response)
-                                
-                                # Update interaction time before TTS starts
-                                conversation_state['last_interaction'] = time.time()
-                                
-                                # Use async TTS
-                                loop = asyncio.new_event_loop()
-                                asyncio.set_event_loop(loop)
-                                _, audio_data, samplerate = loop.run_until_complete(
-                                    tts_handler.prepare_speech(response)
-                                )
-                                loop.close()
-                                
-                                # Calculate speech duration
-                                duration = len(audio_data) / samplerate
-                                
-                                # Update interaction time to account for speech duration
-                                conversation_state['last_interaction'] = time.time() + duration + 1
-                                
-                                # Play the prepared audio using TTS handler
-                                tts_handler.play_audio(audio_data, samplerate, 
-                                    on_complete=lambda: audio_handler.resume_listening()
-                                )
-                                
-                            except Exception as e:
-                                print(f"Error processing response: {e}")
-                                tts_handler.speak(
-                                    "I'm sorry, I had trouble processing that. Could you try again?",
-                                    on_complete=lambda: audio_handler.resume_listening()
-                                )
-                finally:
-                    conversation_state['processing'] = False
-        
-        # Start monitoring thread for conversation timeout
-        def check_timeout():
-            while not shutdown_event.is_set():
-                try:
-                    time.sleep(1)
-                    with state_lock:
-                        current_time = time.time()
-                        if (conversation_state['in_conversation'] and 
-                            not conversation_state.get('processing', False) and
-                            current_time - conversation_state['last_interaction'] > 20):
-                                print("\nDebug: Time since last interaction:", 
-                                      current_time - conversation_state['last_interaction'])
-                                # Reset conversation state before handling timeout
-                                conversation_state['in_conversation'] = False
-                                audio_handler.pause_listening()
-                                tts_handler.speak(
-                                    "Shush! I'm going to take a nap now. Let me know if you need anything.",
-                                    on_complete=lambda: audio_handler.resume_listening()
-                                )
-                                print("\nListening for wake word 'Hey Gemma'...")
-                except Exception as e:
-                    print(f"Error in timeout thread: {e}")
-
-        timeout_thread = threading.Thread(target=check_timeout, daemon=True)
-        timeout_thread.start()
+        # Start the turn worker and the conversation timeout timer
+        assistant.start()
         
         # Start main listening loop
         while running:
@@ -184,7 +110,7 @@ def main():
                     time.sleep(1)
                     continue
                     
-                audio_handler.listen_continuous(handle_speech)
+                audio_handler.listen_continuous(assistant.handle_speech)
             except Exception as e:
                 if running:  # Only show error if not shutting down
                     print(f"\nError in main loop: {e}")
@@ -205,14 +131,15 @@ def main():
                 # Shutdown all components in order
                 client.shutdown()
                 if audio_handler:
-                    audio_handler.pause_listening()
-                if timeout_thread and timeout_thread.is_alive():
-                    shutdown_event.set()
-                    timeout_thread.join(timeout=1)
+                    audio_handler.stop_listening()
+                if tts_handler:
+                    tts_handler.close()
+                if assistant:
+                    assistant.stop()
                     
-                # Close executor in GemmaClient
-                if hasattr(client, 'executor'):
-                    client.executor.shutdown(wait=False)
+                # Stop the shared event loop and its worker pool
+                runtime.stop()
+                metrics.stop_export(METRICS_EXPORT_PATH)
                     
             except Exception as e:
                 print(f"Error during cleanup: {e}")
@@ -0,0 +1,86 @@
+import threading
+from collections import deque
+from typing import List
+from config.settings import (
+    SYSTEM_PROMPT,
+    CHAT_HISTORY_TOKEN_BUDGET,
+    CHAT_HISTORY_MAX_MESSAGES
+)
+
+class ChatHistory:
+    """Role-tagged message ring for /api/chat with a token budget
+
+    The system prompt is pinned and never evicted. Past turns (a question
+    and its answer) are dropped oldest-first, whole, once they exceed the
+    token budget, so every request carries a bounded amount of history and
+    never an answer without its question. Evicted messages are returned to
+    the caller, which may fold them into a rolling summary that is sent
+    with the system prompt.
+    """
+
+    def __init__(self, system_prompt: str = SYSTEM_PROMPT, token_budget: int = CHAT_HISTORY_TOKEN_BUDGET,
+                 max_messages: int = CHAT_HISTORY_MAX_MESSAGES):
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.summary = ""
+        self._turns = deque()  # ([(role, content), ...], tokens)
+        self._message_count = 0
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        # Roughly four characters per token, plus per-message template overhead
+        return len(text) // 4 + 4
+
+    @property
+    def token_count(self) -> int:
+        return self._tokens
+
+    def __len__(self):
+        return self._message_count
+
+    def messages(self, prompt: str = None) -> List[dict]:
+        """Messages for the next request, optionally ending with a new user prompt"""
+        system = self.system_prompt
+        if self.summary:
+            system = f"{system}\n\nSummary of the earlier conversation: {self.summary}"
+        with self._lock:
+            messages = [{"role": "system", "content": system}]
+            for turn, _ in self._turns:
+                messages.extend({"role": role, "content": content} for role, content in turn)
+        if prompt is not None:
+            messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def add(self, role: str, content: str) -> List[dict]:
+        """Append a message and return any messages evicted to stay within budget"""
+        return self._append([(role, content)])
+
+    def add_exchange(self, prompt: str, reply: str) -> List[dict]:
+        """Record one user/assistant turn, which is kept or evicted as a whole"""
+        return self._append([("user", prompt), ("assistant", reply)])
+
+    def _append(self, turn: list) -> List[dict]:
+        tokens = sum(self.estimate_tokens(content) for _, content in turn)
+        evicted = []
+        with self._lock:
+            self._turns.append((turn, tokens))
+            self._tokens += tokens
+            self._message_count += len(turn)
+            # Always keep the newest turn, even if it alone is over budget
+            while len(self._turns) > 1 and (self._tokens > self.token_budget or
+                                            self._message_count > self.max_messages):
+                old_turn, old_tokens = self._turns.popleft()
+                self._tokens -= old_tokens
+                self._message_count -= len(old_turn)
+                evicted.extend({"role": role, "content": content} for role, content in old_turn)
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._turns.clear()
+            self._message_count = 0
+            self._tokens = 0
+            self.summary = ""
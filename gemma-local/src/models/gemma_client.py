@@ -1,54 +1,218 @@
-import requests
+import time
 from requests.exceptions import Timeout
+from typing import Iterator, List, Optional
 from config.settings import (
-    OLLAMA_BASE_URL, 
-    GEMMA_MODEL_NAME, 
-    MAX_TOKENS, 
+    GEMMA_MODEL_NAME,
+    MAX_TOKENS,
     TEMPERATURE,
-    SYSTEM_PROMPT
+    CHAT_HISTORY_SUMMARIZE,
+    METRICS_RATE_BUCKETS
 )
+from models.chat_history import ChatHistory
+from models.ollama_transport import OllamaTransport
+from models.response_cache import ResponseCache
+from utils.async_runtime import AsyncRuntime, get_runtime
+from utils.cancellation import CancellationToken, OperationCancelled
+from utils.metrics import get_metrics
+from utils.sentence_stream import iter_sentences
 
 class GemmaClient:
-    def __init__(self):
-        self.base_url = OLLAMA_BASE_URL
+    TIMEOUT_MESSAGE = "I'm sorry, I'm taking too long to respond. Could you try again?"
+    ERROR_MESSAGE = "I apologize, but I had trouble generating a response."
+    SUMMARY_TOKENS = 96
+
+    def __init__(self, transport: OllamaTransport = None, runtime: AsyncRuntime = None,
+                 history: ChatHistory = None, response_cache: ResponseCache = None):
+        self.transport = transport or OllamaTransport()
+        self.runtime = runtime or get_runtime()
+        self.history = history if history is not None else ChatHistory()  # An empty one is falsy
         self.model = GEMMA_MODEL_NAME
-        self.context = []
-        self.timeout = 10  # 10 seconds timeout for requests
+        self.response_cache = response_cache  # Opt-in; may be shared between clients
         self._shutdown = False
 
+        metrics = get_metrics()
+        self._response_timer = metrics.histogram("llm_response_seconds", "Time to a complete Ollama reply")
+        self._first_token_timer = metrics.histogram("llm_first_token_seconds", "Time to the first streamed token")
+        self._token_rate = metrics.histogram("llm_tokens_per_second", "Streaming generation rate",
+                                             METRICS_RATE_BUCKETS)
+        self._tokens = metrics.counter("llm_tokens_total", "Streamed tokens received")
+        self._errors = metrics.counter("llm_errors_total", "Failed or timed out generations")
+        self._cache_hits = metrics.counter("llm_cache_hits_total", "Replies served from the response cache")
+        self._cancelled = metrics.counter("llm_cancelled_total", "Generations abandoned by a barge-in")
+
     def shutdown(self):
         """Clean shutdown of client resources"""
         self._shutdown = True
+        self.transport.close()
+
+    def warmup(self) -> bool:
+        """Load the model and prime it with the pinned system prompt"""
+        if self._shutdown:
+            return False
+        return self.transport.warmup(self.model, self.history.messages())
+
+    def reset_history(self):
+        """Forget the conversation, keeping the system prompt"""
+        self.history.clear()
+
+    def _build_payload(self, prompt: str, stream: bool) -> dict:
+        return {
+            "model": self.model,
+            "messages": self.history.messages(prompt),
+            "stream": stream,
+            # Ollama only applies sampling settings passed inside options
+            "options": {
+                "num_predict": MAX_TOKENS,
+                "temperature": TEMPERATURE
+            }
+        }
+
+    def _remember(self, prompt: str, reply: str):
+        evicted = self.history.add_exchange(prompt, reply)
+        if evicted and CHAT_HISTORY_SUMMARIZE:
+            self.runtime.submit_blocking(self._summarize, evicted)
+
+    def _cached_reply(self, prompt: str):
+        """A cached reply for prompt, already added to the history, or None"""
+        if self.response_cache is None:
+            return None
+        reply = self.response_cache.get(prompt, self.model, self.history.system_prompt)
+        if reply is not None:
+            self._cache_hits.inc()
+            self._remember(prompt, reply)
+        return reply
+
+    def cached_chunks(self, prompt: str) -> Optional[List[str]]:
+        """The TTS chunks of a cached reply to prompt, already added to the history, or None
+
+        A hit replays exactly what was spoken the first time, so every chunk
+        is still in the TTS cache; replies without recorded chunks go
+        through stream_response as usual.
+        """
+        if self._shutdown or self.response_cache is None:
+            return None
+        chunks = self.response_cache.chunks(prompt, self.model, self.history.system_prompt)
+        if chunks is None or self._cached_reply(prompt) is None:
+            return None
+        return chunks
+
+    def cache_chunks(self, prompt: str, chunks: List[str]):
+        """Record the TTS chunks the reply to prompt was spoken as (kept only if that reply is cached)"""
+        if self.response_cache is not None:
+            self.response_cache.put_chunks(prompt, self.model, self.history.system_prompt, chunks)
+
+    def _cache_reply(self, prompt: str, reply: str):
+        if self.response_cache is not None:
+            self.response_cache.put(prompt, self.model, self.history.system_prompt, reply)
+
+    def _summarize(self, evicted: List[dict]):
+        """Fold evicted turns into the rolling summary"""
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in evicted)
+        prompt = ("Update the summary of a conversation with the new lines below. "
+                  "Reply with the summary only, in at most three sentences.\n\n"
+                  f"Summary so far: {self.history.summary or '(none)'}\n\nNew lines:\n{transcript}")
+        try:
+            response_data = self.transport.post("/api/generate", {
+                "model": self.model,
+                "prompt": prompt,
+                "stream": False,
+                "options": {"num_predict": self.SUMMARY_TOKENS, "temperature": 0.2}
+            })
+            self.history.summary = response_data.get('response', '').strip()
+        except Exception as e:
+            print(f"Error summarizing conversation: {e}")
 
     def generate_response(self, prompt: str) -> str:
         """Generate a single response"""
         if self._shutdown:
             return ""
-            
-        url = f"{self.base_url}/api/generate"
-        full_prompt = f"{SYSTEM_PROMPT}\n\nUser: {prompt}\nAssistant:"
-        
-        payload = {
-            "model": self.model,
-            "prompt": full_prompt,
-            "stream": False,
-            "max_tokens": MAX_TOKENS,
-            "temperature": TEMPERATURE,
-            "context": self.context
-        }
+
+        cached = self._cached_reply(prompt)
+        if cached is not None:
+            return cached
+
+        payload = self._build_payload(prompt, stream=False)
+
+        try:
+            with self._response_timer.time():
+                response_data = self.transport.post("/api/chat", payload)
+            reply = response_data['message']['content']
+            self._remember(prompt, reply)
+            self._cache_reply(prompt, reply)
+            return reply
+        except Timeout:
+            print("Response generation timed out")
+            self._errors.inc()
+            return self.TIMEOUT_MESSAGE
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            self._errors.inc()
+            return self.ERROR_MESSAGE
+
+    def stream_response(self, prompt: str, token: CancellationToken = None) -> Iterator[str]:
+        """Generate a response, yielding tokens as Ollama produces them
+
+        Cancelling token aborts the request and ends the stream quietly.
+        """
+        if self._shutdown or (token is not None and token.cancelled):
+            return
+
+        # A repeated question is answered in one piece (cached_chunks also
+        # replays the speech it was given the first time)
+        cached = self._cached_reply(prompt)
+        if cached is not None:
+            yield cached
+            return
+
+        payload = self._build_payload(prompt, stream=True)
+        tokens = []
+        start = time.perf_counter()
+        first_token_at = None
+        complete = False
 
         try:
-            response = requests.post(url, json=payload, timeout=self.timeout)
-            response.raise_for_status()
-            response_data = response.json()
-            
-            if 'context' in response_data:
-                self.context = response_data['context']
-                
-            return response_data['response']
+            for chunk in self.transport.stream("/api/chat", payload, token):
+                if self._shutdown:
+                    break
+                piece = chunk.get('message', {}).get('content', '')
+                if piece:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        self._first_token_timer.observe(first_token_at - start)
+                    tokens.append(piece)
+                    yield piece
+                if chunk.get('done'):
+                    complete = True
+                    break
+        except OperationCancelled:
+            self._cancelled.inc()
         except Timeout:
             print("Response generation timed out")
-            return "I'm sorry, I'm taking too long to respond. Could you try again?"
+            self._errors.inc()
+            if not tokens:
+                yield self.TIMEOUT_MESSAGE
         except Exception as e:
             print(f"Error generating response: {e}")
-            return "I apologize, but I had trouble generating a response."
+            self._errors.inc()
+            if not tokens:
+                yield self.ERROR_MESSAGE
+        finally:
+            # Whatever was said, even if cut short, is part of the conversation
+            if tokens:
+                reply = "".join(tokens)
+                self._remember(prompt, reply)
+                self._record_stream(start, first_token_at, len(tokens))
+                # Only replies that were not cut short are worth repeating
+                if complete:
+                    self._cache_reply(prompt, reply)
+
+    def _record_stream(self, start: float, first_token_at: float, token_count: int):
+        end = time.perf_counter()
+        self._response_timer.observe(end - start)
+        self._tokens.inc(token_count)
+        if token_count > 1 and end > first_token_at:
+            self._token_rate.observe((token_count - 1) / (end - first_token_at))
+
+    def stream_sentences(self, prompt: str, token: CancellationToken = None) -> Iterator[str]:
+        """Generate a response, yielding complete sentences for TTS as they arrive"""
+        return iter_sentences(self.stream_response(prompt, token))
@@ -0,0 +1,119 @@
+import json
+import socket
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import Timeout
+from typing import Iterator, List
+from config.settings import (
+    OLLAMA_BASE_URL,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_POOL_SIZE,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_FIRST_TOKEN_TIMEOUT,
+    OLLAMA_TOTAL_TIMEOUT
+)
+from utils.cancellation import CancellationToken, OperationCancelled
+
+class OllamaTransport:
+    """Pooled HTTP transport to Ollama that keeps the model resident between turns"""
+
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, keep_alive=OLLAMA_KEEP_ALIVE,
+                 pool_size: int = OLLAMA_POOL_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.keep_alive = keep_alive
+        self.connect_timeout = OLLAMA_CONNECT_TIMEOUT
+        self.first_token_timeout = OLLAMA_FIRST_TOKEN_TIMEOUT
+        self.total_timeout = OLLAMA_TOTAL_TIMEOUT
+
+        # One session so every request reuses the same keep-alive connections
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _prepare(self, payload: dict) -> dict:
+        payload = dict(payload)
+        payload.setdefault("keep_alive", self.keep_alive)
+        return payload
+
+    def post(self, path: str, payload: dict) -> dict:
+        """Send a non-streaming request and return the decoded JSON body"""
+        response = self.session.post(
+            f"{self.base_url}{path}",
+            json=self._prepare(payload),
+            timeout=(self.connect_timeout, self.total_timeout)
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def stream(self, path: str, payload: dict, token: CancellationToken = None) -> Iterator[dict]:
+        """Send a streaming request and yield each NDJSON message as it arrives
+
+        Cancelling token closes the response, which ends a read blocked on
+        the socket, and raises OperationCancelled.
+        """
+        if token is not None:
+            token.raise_if_cancelled()
+        deadline = time.monotonic() + self.total_timeout
+        # The read timeout bounds every socket read, so it has to allow for a
+        # cold model load before the first token; the deadline bounds the total.
+        with self.session.post(
+            f"{self.base_url}{path}",
+            json=self._prepare(payload),
+            timeout=(self.connect_timeout, self.first_token_timeout),
+            stream=True
+        ) as response:
+            unregister = token.on_cancel(lambda: self._abort(response)) if token is not None else None
+            try:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if token is not None:
+                        token.raise_if_cancelled()
+                    if time.monotonic() > deadline:
+                        raise Timeout(f"Response exceeded {self.total_timeout}s")
+                    if line:
+                        yield json.loads(line)
+            except OperationCancelled:
+                raise
+            except Exception:
+                # Reads fail in all sorts of ways once the response is closed
+                if token is not None:
+                    token.raise_if_cancelled()
+                raise
+            finally:
+                if unregister is not None:
+                    unregister()
+            if token is not None:
+                token.raise_if_cancelled()
+
+    @staticmethod
+    def _abort(response: requests.Response):
+        """Close response from another thread, waking a read blocked on its socket"""
+        # Closing alone leaves a blocked recv waiting for the next token
+        sock = getattr(getattr(response.raw, "_connection", None), "sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        response.close()
+
+    def warmup(self, model: str, messages: List[dict]) -> bool:
+        """Load the model and evaluate the pinned prompt so the first turn starts warm"""
+        start = time.monotonic()
+        try:
+            self.post("/api/chat", {
+                "model": model,
+                "messages": messages,
+                "stream": False,
+                "options": {"num_predict": 1}
+            })
+            print(f"Ollama model {model} warmed up in {time.monotonic() - start:.1f}s")
+            return True
+        except Exception as e:
+            print(f"Error warming up Ollama: {e}")
+            return False
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,114 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+from config.settings import (
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_FOLLOWUP_WORDS,
+    RESPONSE_CACHE_FOLLOWUP_PREFIXES
+)
+
+class ResponseCache:
+    """LRU cache of complete replies for repeated questions, with a TTL
+
+    Keys combine the model, the system prompt and the normalized
+    transcript. Prompts that look like follow-ups ("what about it",
+    "tell me more") depend on the conversation so far and are never cached
+    or served from the cache. A reply can also record the TTS chunks it was
+    spoken as, so a hit replays exactly the audio already synthesized.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl: float = RESPONSE_CACHE_TTL,
+                 followup_words=RESPONSE_CACHE_FOLLOWUP_WORDS,
+                 followup_prefixes=RESPONSE_CACHE_FOLLOWUP_PREFIXES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.followup_words = frozenset(followup_words)
+        self.followup_prefixes = tuple(followup_prefixes)
+        self._entries = OrderedDict()  # key -> [expires at, reply, TTS chunks or None]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Lowercase, drop punctuation and collapse whitespace"""
+        return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+    def is_followup(self, text: str) -> bool:
+        normalized = self.normalize(text)
+        return (f"{normalized} ".startswith(self.followup_prefixes)
+                or any(word in self.followup_words for word in normalized.split()))
+
+    def make_key(self, prompt: str, model: str, system_prompt: str) -> Optional[str]:
+        """Cache key for prompt, or None if it must bypass the cache"""
+        normalized = self.normalize(prompt)
+        if not normalized or self.is_followup(normalized):
+            return None
+        return hashlib.sha256(f"{model}\0{system_prompt}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str, model: str, system_prompt: str) -> Optional[str]:
+        key = self.make_key(prompt, model, system_prompt)
+        with self._lock:
+            if key is None:
+                self.bypassed += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def chunks(self, prompt: str, model: str, system_prompt: str) -> Optional[List[str]]:
+        """The TTS chunks the cached reply to prompt was spoken as, if recorded (not counted as a hit)"""
+        key = self.make_key(prompt, model, system_prompt)
+        with self._lock:
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None or entry[0] < time.monotonic() or entry[2] is None:
+                return None
+            return list(entry[2])
+
+    def put(self, prompt: str, model: str, system_prompt: str, reply: str):
+        key = self.make_key(prompt, model, system_prompt)
+        if key is None or not reply.strip():
+            return
+        with self._lock:
+            self._entries[key] = [time.monotonic() + self.ttl, reply, None]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put_chunks(self, prompt: str, model: str, system_prompt: str, chunks: List[str]):
+        """Record how the cached reply to prompt was split for speech
+
+        Ignored unless the chunks hold the whole reply, e.g. when it was cut
+        short, or when it was not cached at all.
+        """
+        key = self.make_key(prompt, model, system_prompt)
+        with self._lock:
+            entry = self._entries.get(key) if key is not None else None
+            if entry is not None and " ".join(chunks).split() == entry[1].split():
+                entry[2] = list(chunks)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "response_cache_entries": len(self._entries),
+            "response_cache_hits": self.hits,
+            "response_cache_misses": self.misses,
+            "response_cache_bypassed": self.bypassed
+        }
@@ -0,0 +1,433 @@
+import argparse
+import base64
+import itertools
+import json
+import queue
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+from config.settings import (
+    OLLAMA_BASE_URL,
+    RESPONSE_CACHE_ENABLED,
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_MAX_SESSIONS,
+    SERVER_SESSION_TTL,
+    SERVER_MAX_PENDING,
+    SERVER_GENERATION_WORKERS,
+    SERVER_MAX_BODY_BYTES,
+    SERVER_AUDIO_RATES,
+    SERVER_TRANSCRIPTION_WORKERS,
+    SERVER_TRANSCRIPTION_WAIT
+)
+from models.gemma_client import GemmaClient
+from models.ollama_transport import OllamaTransport
+from models.response_cache import ResponseCache
+from utils.async_runtime import get_runtime
+from utils.cancellation import CancellationToken
+from utils.fair_scheduler import FairScheduler, QueueFullError
+from utils.metrics import enable_metrics, get_metrics
+
+VOSK_MODEL_PATH = Path(__file__).parent / "models" / "vosk-model-small-en-us-0.15"
+
+
+class ServerBusy(Exception):
+    """Raised when a turn's audio cannot be transcribed yet because every slot is taken"""
+
+
+class Session:
+    """Conversation state for one satellite device"""
+
+    def __init__(self, session_id: str, client: GemmaClient):
+        self.id = session_id
+        self.client = client
+        self.last_active = time.monotonic()
+        self.turn_lock = threading.Lock()  # One turn at a time per session
+
+
+class SessionManager:
+    """Creates, looks up and expires sessions; all of them share one Ollama transport"""
+
+    def __init__(self, transport: OllamaTransport, runtime, max_sessions: int = SERVER_MAX_SESSIONS,
+                 ttl: float = SERVER_SESSION_TTL, response_cache: ResponseCache = None):
+        self.transport = transport
+        self.runtime = runtime
+        self.response_cache = response_cache  # Shared, so one kiosk's answer serves them all
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self) -> Session:
+        with self._lock:
+            self._expire()
+            if len(self._sessions) >= self.max_sessions:
+                return None
+            client = GemmaClient(transport=self.transport, runtime=self.runtime,
+                                 response_cache=self.response_cache)
+            session = Session(uuid.uuid4().hex, client)
+            self._sessions[session.id] = session
+            return session
+
+    def get(self, session_id: str) -> Session:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session:
+                session.last_active = time.monotonic()
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        for session_id in [s.id for s in self._sessions.values() if s.last_active < cutoff]:
+            del self._sessions[session_id]
+
+
+class Recognizer:
+    """Transcribes uploaded PCM with Vosk; the model is loaded once and shared"""
+
+    def __init__(self, model_path: Path):
+        import vosk
+        self._vosk = vosk
+        print("Loading Vosk model...")
+        self.model = vosk.Model(str(model_path))
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        rec = self._vosk.KaldiRecognizer(self.model, sample_rate)
+        step = sample_rate // 4 * 2  # 250 ms of 16-bit audio
+        for start in range(0, len(pcm), step):
+            rec.AcceptWaveform(pcm[start:start + step])
+        return json.loads(rec.FinalResult()).get("text", "").lower()
+
+
+class VoiceServer(ThreadingHTTPServer):
+    """HTTP front end that serves many sessions from one Ollama model
+
+    Turns are admitted through a bounded FairScheduler (503 when full) and
+    generation is shared round-robin between sessions; uploaded audio is
+    transcribed at most transcription_workers at a time. Each turn streams
+    back newline-delimited JSON events: the transcript, every sentence as
+    it is generated and, unless disabled, its synthesized audio as base64
+    16-bit PCM.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, sessions: SessionManager, scheduler: FairScheduler,
+                 tts=None, recognizer: Recognizer = None, max_body_bytes: int = SERVER_MAX_BODY_BYTES,
+                 transcription_workers: int = SERVER_TRANSCRIPTION_WORKERS):
+        super().__init__(address, TurnRequestHandler)
+        self.sessions = sessions
+        self.scheduler = scheduler
+        self.tts = tts
+        self.recognizer = recognizer
+        self.max_body_bytes = max_body_bytes
+        self.transcription_slots = threading.BoundedSemaphore(transcription_workers)
+
+    def stats(self) -> dict:
+        stats = {"sessions": len(self.sessions)}
+        stats.update(self.scheduler.stats())
+        if self.sessions.response_cache is not None:
+            stats.update(self.sessions.response_cache.stats())
+        return stats
+
+
+class TurnRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._send_json(200, self.server.stats())
+        elif path == "/metrics" and get_metrics().enabled:
+            body = get_metrics().to_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        parts = urlparse(self.path).path.strip("/").split("/")
+        length = self._content_length()
+        if length is None:
+            self.close_connection = True
+            self._send_json(400, {"error": "invalid Content-Length"})
+        elif length > self.server.max_body_bytes:
+            # The body is left unread, so the connection cannot be reused
+            self.close_connection = True
+            self._send_json(413, {"error": f"request body over {self.server.max_body_bytes} bytes"})
+        elif parts == ["sessions"]:
+            self._read_body()
+            session = self.server.sessions.create()
+            if session is None:
+                self._send_json(503, {"error": "too many sessions"}, retry_after=5)
+            else:
+                self._send_json(201, {"session_id": session.id})
+        elif len(parts) == 3 and parts[0] == "sessions" and parts[2] == "turn":
+            self._handle_turn(parts[1])
+        else:
+            self._read_body()
+            self._send_json(404, {"error": "not found"})
+
+    def do_DELETE(self):
+        parts = urlparse(self.path).path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "sessions" and self.server.sessions.delete(parts[1]):
+            self._send_json(200, {"deleted": parts[1]})
+        else:
+            self._send_json(404, {"error": "unknown session"})
+
+    def _handle_turn(self, session_id: str):
+        body = self._read_body()
+        session = self.server.sessions.get(session_id)
+        if session is None:
+            self._send_json(404, {"error": "unknown session"})
+            return
+        if not session.turn_lock.acquire(blocking=False):
+            self._send_json(409, {"error": "a turn is already running for this session"})
+            return
+
+        try:
+            query = parse_qs(urlparse(self.path).query)
+            want_audio = query.get("audio", ["1"])[0] != "0" and self.server.tts is not None
+            try:
+                text = self._read_prompt(body, query)
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            except ServerBusy as e:
+                self._send_json(503, {"error": str(e)}, retry_after=1)
+                return
+
+            token = CancellationToken()
+            sentences = queue.Queue()
+            # A repeated question replays the chunks its cached reply was spoken as
+            cached = session.client.cached_chunks(text) if want_audio else None
+
+            def generate():
+                try:
+                    for sentence in cached or session.client.stream_sentences(text, token):
+                        sentences.put(sentence)
+                finally:
+                    sentences.put(None)
+
+            def dropped(job):
+                # A job cancelled before it ran (disconnect or shutdown) must still end the stream
+                if job.cancelled():
+                    sentences.put(None)
+
+            try:
+                job = self.server.scheduler.submit(session.id, generate)
+            except QueueFullError:
+                self._send_json(503, {"error": "server busy"}, retry_after=1)
+                return
+            job.add_done_callback(dropped)
+
+            self._start_stream()
+            self._write_lock = threading.Lock()
+            completed = False
+            try:
+                self._send_event({"type": "transcript", "text": text})
+                planned = self._stream_reply(sentences, want_audio, replay=cached is not None)
+                self._send_event({"type": "done"})
+                self._end_stream()
+                completed = True
+                if planned:
+                    session.client.cache_chunks(text, planned)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                if not completed:
+                    # The device went away: drop its queued job or stop generating for it
+                    job.cancel()
+                    token.cancel("client disconnected")
+        finally:
+            session.turn_lock.release()
+
+    def _read_prompt(self, body: bytes, query: dict) -> str:
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("application/json"):
+            payload = json.loads(body or b"{}")
+            if not isinstance(payload, dict) or not isinstance(payload.get("text", ""), str):
+                raise ValueError('send a JSON object with a "text" string')
+            text = payload.get("text", "")
+        elif content_type.startswith(("audio/", "application/octet-stream")):
+            if self.server.recognizer is None:
+                raise ValueError("audio input is not enabled on this server")
+            text = self._transcribe(body, self._audio_rate(query, content_type))
+        else:
+            raise ValueError("send application/json with a text field or 16-bit mono PCM audio")
+        text = text.strip().lower()
+        if not text:
+            raise ValueError("no speech recognized")
+        return text
+
+    def _transcribe(self, pcm: bytes, rate: int) -> str:
+        # Decoding is CPU-bound and runs on this request's thread, so only a few run at once
+        if not self.server.transcription_slots.acquire(timeout=SERVER_TRANSCRIPTION_WAIT):
+            raise ServerBusy("server busy transcribing other uploads")
+        try:
+            return self.server.recognizer.transcribe(pcm, rate)
+        finally:
+            self.server.transcription_slots.release()
+
+    def _audio_rate(self, query: dict, content_type: str) -> int:
+        value = query.get("rate", [str(self._content_rate(content_type))])[0]
+        low, high = SERVER_AUDIO_RATES
+        if not value.isdigit() or not low <= int(value) <= high:
+            raise ValueError(f"rate must be a sample rate from {low} to {high} Hz")
+        return int(value)
+
+    @staticmethod
+    def _content_rate(content_type: str) -> int:
+        # e.g. "audio/L16; rate=16000"
+        for param in content_type.split(";")[1:]:
+            key, _, value = param.strip().partition("=")
+            if key == "rate" and value.isdigit():
+                return int(value)
+        return 16000
+
+    def _stream_reply(self, sentences: queue.Queue, want_audio: bool, replay: bool = False) -> list:
+        """Send the reply's text and audio events; returns the TTS chunks planned for a new reply
+
+        With replay, sentences are the chunks of a cached reply and are spoken as they are.
+        """
+        # Wait here, on the request's own thread, until this session's
+        # generation has started; only then is TTS set up, so turns still
+        # queued in the scheduler never hold one of the runtime's workers
+        first = sentences.get()
+        if first is None:
+            return []
+
+        def texts():
+            for sentence in itertools.chain([first], iter(sentences.get, None)):
+                self._send_event({"type": "text", "text": sentence})
+                yield sentence
+
+        if not want_audio:
+            for _ in texts():
+                pass
+            return []
+
+        planned = []
+
+        def recorded():
+            for chunk in self.server.tts.plan_chunks(texts()):
+                planned.append(chunk)
+                yield chunk
+
+        chunks = texts() if replay else recorded()
+        for audio_data, samplerate in self.server.tts.iter_speech(chunks, plan=False):
+            pcm = (np.clip(audio_data, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+            self._send_event({
+                "type": "audio",
+                "sample_rate": samplerate,
+                "format": "pcm_s16le",
+                "data": base64.b64encode(pcm).decode("ascii")
+            })
+        return planned
+
+    def _content_length(self):
+        """The request's Content-Length, or None if it is not a valid one"""
+        value = self.headers.get("Content-Length", "0").strip()
+        return int(value) if value.isdigit() else None
+
+    def _read_body(self) -> bytes:
+        length = self._content_length()
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, status: int, data: dict, retry_after: int = None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if retry_after is not None:
+            self.send_header("Retry-After", str(retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_event(self, event: dict):
+        # Text events are sent from the TTS reader thread, audio from this one
+        body = (json.dumps(event) + "\n").encode()
+        with self._write_lock:
+            self.wfile.write(f"{len(body):X}\r\n".encode() + body + b"\r\n")
+            self.wfile.flush()
+
+    def _end_stream(self):
+        with self._write_lock:
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Gemma conversations to remote devices")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--ollama-url", default=OLLAMA_BASE_URL)
+    parser.add_argument("--workers", type=int, default=SERVER_GENERATION_WORKERS,
+                        help="generations sent to Ollama at once")
+    parser.add_argument("--max-pending", type=int, default=SERVER_MAX_PENDING)
+    parser.add_argument("--no-tts", action="store_true", help="stream text only")
+    parser.add_argument("--vosk-model", default=str(VOSK_MODEL_PATH),
+                        help="Vosk model for PCM input (skipped if missing)")
+    parser.add_argument("--response-cache", action="store_true", default=RESPONSE_CACHE_ENABLED,
+                        help="answer repeated questions from a shared reply cache")
+    parser.add_argument("--metrics", action="store_true", help="serve Prometheus metrics on GET /metrics")
+    args = parser.parse_args()
+
+    if args.metrics:
+        enable_metrics()
+
+    runtime = get_runtime()
+    transport = OllamaTransport(base_url=args.ollama_url, pool_size=max(args.workers, 1) + 1)
+    sessions = SessionManager(transport, runtime,
+                              response_cache=ResponseCache() if args.response_cache else None)
+    scheduler = FairScheduler(workers=args.workers, max_pending=args.max_pending, name="generation")
+
+    tts = None
+    if not args.no_tts:
+        from utils.tts_handler import TTSHandler
+        tts = TTSHandler(runtime=runtime, playback=False)
+
+    recognizer = None
+    if Path(args.vosk_model).exists():
+        recognizer = Recognizer(Path(args.vosk_model))
+    else:
+        print("No Vosk model found; audio input disabled")
+
+    GemmaClient(transport=transport, runtime=runtime).warmup()
+    server = VoiceServer((args.host, args.port), sessions, scheduler, tts, recognizer)
+    print(f"Serving on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        scheduler.shutdown()
+        transport.close()
+        runtime.stop()
+
+if __name__ == "__main__":
+    main()
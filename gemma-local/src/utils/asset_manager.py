@@ -0,0 +1,210 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+import requests
+from config.settings import (
+    ASSET_CACHE_DIR,
+    ASSET_CHUNK_SIZE,
+    ASSET_DOWNLOAD_WORKERS,
+    ASSET_RETRIES,
+    ASSET_CONNECT_TIMEOUT,
+    ASSET_READ_TIMEOUT
+)
+
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class AssetError(Exception):
+    """Raised when an asset cannot be downloaded, verified or installed"""
+
+
+class Asset:
+    """A downloadable file or zip archive and where it is installed
+
+    target defaults to cache_dir/filename. With extract set the download
+    is a zip and target is the directory it unpacks to.
+    """
+
+    def __init__(self, name: str, url: str, target=None, sha256: str = None, extract: bool = False):
+        self.name = name
+        self.url = url
+        self.filename = url.rstrip("/").rsplit("/", 1)[-1].split("?")[0]
+        self.target = Path(target) if target is not None else None
+        self.sha256 = sha256.lower() if sha256 else None
+        self.extract = extract
+
+
+class AssetManager:
+    """Downloads model files into a cache directory and installs them atomically
+
+    Partial downloads are kept as .part files and resumed with HTTP Range
+    requests, both across retries and across runs. The SHA-256 is checked
+    against the pinned hash when there is one, or else against one the
+    server advertises (Hugging Face sends it as X-Linked-Etag). Files are
+    only moved into place once complete and verified, so an interrupted
+    download never leaves a half-installed model behind.
+    """
+
+    def __init__(self, cache_dir=ASSET_CACHE_DIR, chunk_size: int = ASSET_CHUNK_SIZE,
+                 workers: int = ASSET_DOWNLOAD_WORKERS, retries: int = ASSET_RETRIES,
+                 session: requests.Session = None, progress: bool = True):
+        self.cache_dir = Path(cache_dir)
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.retries = retries
+        self.session = session or requests.Session()
+        self.progress = progress
+        self.timeout = (ASSET_CONNECT_TIMEOUT, ASSET_READ_TIMEOUT)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def path(self, asset: Asset) -> Path:
+        """Where the asset is (or will be) installed"""
+        return asset.target or self.cache_dir / asset.filename
+
+    def part_path(self, asset: Asset) -> Path:
+        """Where a partial download is kept between attempts and runs"""
+        # Assets often share a basename (model.onnx, model.zip), so the URL
+        # and target are part of the name; both are stable, so resuming works
+        key = hashlib.sha256(f"{asset.url}\0{self.path(asset)}".encode("utf-8")).hexdigest()[:16]
+        return self.cache_dir / "downloads" / f"{asset.filename}.{key}.part"
+
+    def is_installed(self, asset: Asset) -> bool:
+        return self.path(asset).exists()
+
+    def fetch(self, asset: Asset) -> Path:
+        """Install the asset unless it already is, and return its path"""
+        with self._lock(asset):
+            target = self.path(asset)
+            if target.exists():
+                return target
+            part = self._download(asset)
+            self._install(asset, part, target)
+            return target
+
+    def fetch_all(self, assets: Iterable[Asset]) -> Dict[str, Path]:
+        """Fetch several assets concurrently; raises the first failure after all have finished"""
+        assets = list(assets)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(assets)))) as pool:
+            futures = {asset.name: pool.submit(self.fetch, asset) for asset in assets}
+        errors = [f"{name}: {future.exception()}" for name, future in futures.items() if future.exception()]
+        if errors:
+            raise AssetError("; ".join(errors))
+        return {name: future.result() for name, future in futures.items()}
+
+    def _lock(self, asset: Asset) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(str(self.path(asset)), threading.Lock())
+
+    def _download(self, asset: Asset) -> Path:
+        """Download to a .part file, resuming if possible, and verify it"""
+        part = self.part_path(asset)
+        part.parent.mkdir(parents=True, exist_ok=True)
+
+        last_error = None
+        for attempt in range(self.retries + 1):
+            try:
+                expected_hash = self._transfer(asset, part)
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                last_error = e
+                print(f"Download of {asset.name} interrupted ({e}), resuming...")
+        else:
+            raise AssetError(f"Could not download {asset.name}: {last_error}")
+
+        digest = self._hash_file(part)
+        expected = asset.sha256 or expected_hash
+        if expected and digest != expected:
+            part.unlink(missing_ok=True)
+            raise AssetError(f"Checksum mismatch for {asset.name}: expected {expected}, got {digest}")
+        return part
+
+    def _transfer(self, asset: Asset, part: Path) -> Optional[str]:
+        """Append the rest of the file to part; returns a server-advertised SHA-256 if any"""
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with self.session.get(asset.url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if offset and response.status_code == 416:
+                # Nothing left to send: the previous run got the whole file
+                return self._advertised_hash(response)
+            if offset and response.status_code != 206:
+                offset = 0  # Range not supported; start over
+            response.raise_for_status()
+
+            length = response.headers.get("Content-Length")
+            total = offset + int(length) if length is not None else None
+            mode = "ab" if offset else "wb"
+            with open(part, mode, buffering=self.chunk_size) as f, self._progress_bar(asset, total, offset) as bar:
+                for data in response.iter_content(chunk_size=self.chunk_size):
+                    f.write(data)
+                    bar.update(len(data))
+
+            if total is not None and part.stat().st_size != total:
+                raise requests.exceptions.ChunkedEncodingError(
+                    f"got {part.stat().st_size} of {total} bytes"
+                )
+            return self._advertised_hash(response)
+
+    @staticmethod
+    def _advertised_hash(response) -> Optional[str]:
+        # Hugging Face puts it on the redirect to its CDN
+        for hop in [response, *response.history]:
+            for header in ("X-Linked-Etag", "X-Checksum-Sha256"):
+                value = hop.headers.get(header, "").strip('"').lower()
+                if SHA256_PATTERN.match(value):
+                    return value
+        return None
+
+    def _hash_file(self, path: Path) -> str:
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(self.chunk_size), b""):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    def _install(self, asset: Asset, part: Path, target: Path):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if not asset.extract:
+            os.replace(part, target)
+            return
+
+        # Unpack next to the target, then move it into place in one rename
+        staging = target.parent / f".{target.name}.extracting"
+        shutil.rmtree(staging, ignore_errors=True)
+        try:
+            with zipfile.ZipFile(part) as archive:
+                archive.extractall(staging)
+            entries = list(staging.iterdir())
+            # Archives usually hold one top-level folder named like the target
+            source = entries[0] if len(entries) == 1 and entries[0].is_dir() else staging
+            os.replace(source, target)
+        except (zipfile.BadZipFile, OSError) as e:
+            part.unlink(missing_ok=True)
+            raise AssetError(f"Could not install {asset.name}: {e}")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        part.unlink(missing_ok=True)
+
+    def _progress_bar(self, asset: Asset, total: Optional[int], initial: int):
+        if not self.progress:
+            return _NullProgress()
+        from tqdm import tqdm
+        return tqdm(desc=asset.name, total=total, initial=initial, unit='iB', unit_scale=True,
+                    unit_divisor=1024)
+
+
+class _NullProgress:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def update(self, count):
+        pass
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+class AsyncRuntime:
+    """One long-lived asyncio event loop running on a background thread
+
+    Synchronous code submits coroutines from any thread and gets a
+    concurrent.futures.Future back, so TTS synthesis and LLM generation can
+    overlap without building a new loop per call.
+    """
+
+    def __init__(self, name: str = "gemma-async", max_workers: int = 8):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-worker")
+        self._loop = None
+        self._thread = None
+        self._started = threading.Event()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "AsyncRuntime":
+        if self._thread is not None:
+            return self
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(self._executor)
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.call_soon(self._started.set)
+        try:
+            self._loop.run_forever()
+        finally:
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.close()
+
+    def submit(self, coro) -> Future:
+        """Schedule a coroutine on the runtime loop from any thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def submit_blocking(self, func, *args) -> Future:
+        """Run a blocking function on the runtime's worker pool"""
+        return self._executor.submit(func, *args)
+
+    def run(self, coro, timeout: float = None):
+        """Run a coroutine on the runtime loop and wait for its result"""
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("AsyncRuntime.run() called from the runtime thread")
+        return self.submit(coro).result(timeout)
+
+    def stop(self, timeout: float = 5):
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._thread = None
+
+
+_shared_runtime = None
+_shared_lock = threading.Lock()
+
+def get_runtime() -> AsyncRuntime:
+    """Return the process-wide runtime, starting it on first use"""
+    global _shared_runtime
+    with _shared_lock:
+        if _shared_runtime is None or not _shared_runtime.is_running:
+            _shared_runtime = AsyncRuntime().start()
+        return _shared_runtime
+
+
+async def iterate_async(iterable):
+    """Iterate a list, a blocking iterator or an async iterator without blocking the loop"""
+    if hasattr(iterable, "__aiter__"):
+        async for item in iterable:
+            yield item
+    elif isinstance(iterable, (list, tuple)):
+        for item in iterable:
+            yield item
+    else:
+        # Each next() may block (e.g. on a streaming HTTP response), so it runs
+        # on the loop's executor
+        loop = asyncio.get_running_loop()
+        iterator = iter(iterable)
+        done = object()
+        while True:
+            item = await loop.run_in_executor(None, next, iterator, done)
+            if item is done:
+                break
+            yield item
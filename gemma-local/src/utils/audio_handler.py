@@ -1,83 +1,114 @@
 import json
-import vosk
-import pyaudio
 from pathlib import Path
-import requests
-from tqdm import tqdm
-import zipfile
-import shutil
-import os
+import queue
+import threading
+from typing import List
+import numpy as np
+from config.settings import (
+    VAD_ENABLED,
+    WAKE_PHRASE,
+    AUDIO_BUFFER_SECONDS,
+    TRANSCRIPT_QUEUE_SIZE,
+    RECOGNITION_BLOCK_MS,
+    VOSK_MODEL_SHA256
+)
+from utils.asset_manager import Asset, AssetManager
+from utils.endpointer import Endpointer
+from utils.metrics import get_metrics
+from utils.ring_buffer import AudioRingBuffer
+from utils.vad import BargeInDetector, VoiceActivityGate
+
+DEFAULT_MODEL_PATH = Path(__file__).parent.parent / "models" / "vosk-model-small-en-us-0.15"
+
+def open_audio():
+    """Initialize PyAudio (imported here so startup can do it in parallel with other work)"""
+    import pyaudio
+    return pyaudio.PyAudio()
 
 class AudioHandler:
     VOSK_MODEL_URL = "https://alphacephei.com/vosk/models/vosk-model-small-en-us-0.15.zip"
+    WAKE_MODE = "wake"
+    CONVERSATION_MODE = "conversation"
     
-    def __init__(self):
+    def __init__(self, audio=None, model_path: Path = None, model=None):
+        """audio replaces the PyAudio instance (e.g. with a WAV replay for benchmarks,
+        or False to only transcribe recordings); model is a Vosk model already
+        returned by load_model"""
         self._ready = False
-        self._listening = False
+        self._active = False  # listen_continuous keeps its stream open while set
+        self._listening = True  # Audio is discarded while paused
+        self._mode = self.WAKE_MODE
+        self._active_mode = self._mode
+        self._ring = None
+        self._transcripts = None
+        self.input_overflows = 0
+        self.transcripts_dropped = 0
+        self.queue_high_water = 0
+        self._on_barge_in = None
+        self._echo_level = None
+
+        metrics = get_metrics()
+        self._block_timer = metrics.histogram("stt_block_seconds", "Vosk time per recognition block")
+        self._endpoint_silence = metrics.histogram("stt_endpoint_silence_seconds",
+                                                   "Trailing silence heard before an utterance was finalized")
+        self._transcript_counter = metrics.counter("stt_transcripts_total", "Utterances recognized")
+        self._overflow_counter = metrics.counter("audio_input_overflows_total", "Input device overflows")
+        self._buffer_overflow_counter = metrics.counter("audio_buffer_overflow_samples_total",
+                                                        "Captured samples dropped because recognition fell behind")
+        self._dropped_counter = metrics.counter("stt_transcripts_dropped_total",
+                                                "Transcripts dropped because the handler was busy")
+        self._barge_in_counter = metrics.counter("stt_barge_ins_total", "Turns interrupted by the user talking")
         
         # Initialize PyAudio
-        self.audio = pyaudio.PyAudio()
+        self.audio = open_audio() if audio is None else audio
+
+        # The gate always tracks silence for endpointing; with VAD_ENABLED
+        # only speech-bearing audio is sent to Vosk
+        self.vad = VoiceActivityGate(sample_rate=16000)
+        self.barge_in = BargeInDetector(sample_rate=16000)
+        self.vad_gating = VAD_ENABLED
+        self.endpointer = Endpointer()
         
         # Setup Vosk
-        model_path = Path(__file__).parent.parent / "models" / "vosk-model-small-en-us-0.15"
-        if not model_path.exists():
-            print("Downloading Vosk model...")
-            self._download_and_extract_model(model_path)
-            
         try:
-            print("Loading Vosk model...")
-            self.model = vosk.Model(str(model_path))
+            import vosk
+            self.model = model or self.load_model(model_path)
             self.rec = vosk.KaldiRecognizer(self.model, 16000)
+            # While idle only the wake phrase is decoded; everything else is [unk]
+            self.wake_rec = vosk.KaldiRecognizer(
+                self.model, 16000, json.dumps([WAKE_PHRASE, "[unk]"])
+            )
             self._ready = True
-            print("Vosk model loaded successfully!")
         except Exception as e:
             print(f"Error loading Vosk model: {e}")
             raise
 
-    def _download_and_extract_model(self, model_path):
-        try:
-            # Create models directory if it doesn't exist
-            model_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Download with progress bar
-            response = requests.get(self.VOSK_MODEL_URL, stream=True)
-            total_size = int(response.headers.get('content-length', 0))
-            
-            zip_path = model_path.parent / "model.zip"
-            with open(zip_path, 'wb') as f, tqdm(
-                desc="Downloading",
-                total=total_size,
-                unit='iB',
-                unit_scale=True,
-                unit_divisor=1024,
-            ) as pbar:
-                for data in response.iter_content(chunk_size=1024):
-                    size = f.write(data)
-                    pbar.update(size)
-            
-            # Extract with progress bar
-            print("Extracting model files...")
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                # Get total size for progress bar
-                total_size = sum(file.file_size for file in zip_ref.filelist)
-                extracted_size = 0
-                
-                for file in tqdm(zip_ref.filelist, desc="Extracting"):
-                    zip_ref.extract(file, model_path.parent)
-                    extracted_size += file.file_size
-            
-            # Cleanup
-            print("Cleaning up temporary files...")
-            zip_path.unlink()
-            print("Model setup complete!")
-            
-        except Exception as e:
-            print(f"Error downloading/extracting model: {e}")
-            if model_path.exists():
-                shutil.rmtree(model_path)
-            if zip_path.exists():
-                zip_path.unlink()
-            raise
+    @classmethod
+    def load_model(cls, model_path: Path = None):
+        """Download the Vosk model if needed and load it"""
+        import vosk
+        model_path = cls.ensure_model(model_path)
+        print("Loading Vosk model...")
+        model = vosk.Model(str(model_path))
+        print("Vosk model loaded successfully!")
+        return model
+
+    @classmethod
+    def ensure_model(cls, model_path: Path = None) -> Path:
+        """Download the Vosk model if needed and return its path"""
+        model_path = Path(model_path or DEFAULT_MODEL_PATH)
+        if not model_path.exists():
+            print("Downloading Vosk model...")
+            cls._download_and_extract_model(model_path)
+        return model_path
+
+    @classmethod
+    def _download_and_extract_model(cls, model_path):
+        """Fetch the Vosk model zip (resumable, verified) and unpack it to model_path"""
+        AssetManager().fetch(Asset(
+            "vosk-model", cls.VOSK_MODEL_URL, target=model_path, sha256=VOSK_MODEL_SHA256, extract=True
+        ))
+        print("Model setup complete!")
 
     @property
     def is_ready(self):
@@ -89,30 +120,79 @@ class AudioHandler:
     def resume_listening(self):
         self._listening = True
 
+    @property
+    def mode(self):
+        return self._mode
+
+    def set_wake_mode(self):
+        """Listen only for the wake phrase using the small grammar recognizer"""
+        self._mode = self.WAKE_MODE
+
+    def set_conversation_mode(self):
+        """Run full large-vocabulary recognition"""
+        self._mode = self.CONVERSATION_MODE
+
+    def enable_barge_in(self, callback, echo_level=None):
+        """Watch the microphone while paused in conversation mode
+
+        When the user talks over the assistant, callback is called on the
+        recognition thread; if it returns True (it interrupted something)
+        listening resumes at once, starting with the words that triggered
+        it. echo_level returns the level being played (0 to 1) so that
+        playback picked up by the microphone is not mistaken for the user.
+        """
+        self._echo_level = echo_level
+        self._on_barge_in = callback
+
+    def stop_listening(self):
+        """Make listen_continuous return"""
+        self._active = False
+        self._listening = False
+
     def listen_continuous(self, callback):
+        """Capture, recognize and dispatch on separate threads until stop_listening()
+
+        The input stream's callback only copies microphone frames into a
+        ring buffer, a recognition worker runs Vosk on them, and callback is
+        invoked for each transcript on the calling thread, so a slow turn
+        never stalls capture.
+        """
         if not self._ready:
             return
 
-        self._listening = True
+        import pyaudio
+        self._active = True
+        ring = AudioRingBuffer(16000 * AUDIO_BUFFER_SECONDS)
+        transcripts = queue.Queue(maxsize=TRANSCRIPT_QUEUE_SIZE)
+        self._ring = ring
+        self._transcripts = transcripts
         stream = None
+        recognition = None
         try:
-            stream = self.audio.open(format=pyaudio.paInt16, channels=1, rate=16000, 
-                                   input=True, frames_per_buffer=8000)
-            
-            while self._listening:
+            # Callback mode: PortAudio reports overflows as a status flag
+            # instead of a blocking read raising and discarding the frames it had
+            stream = self.audio.open(format=pyaudio.paInt16, channels=1, rate=16000, input=True,
+                                     frames_per_buffer=16000 * RECOGNITION_BLOCK_MS // 1000,
+                                     stream_callback=self._capture_callback(ring))
+            recognition = threading.Thread(target=self._recognition_loop, args=(ring, transcripts),
+                                           name="audio-recognition", daemon=True)
+            recognition.start()
+
+            while self._active:
                 try:
-                    data = stream.read(4000, exception_on_overflow=False)
-                    if self.rec.AcceptWaveform(data):
-                        result = json.loads(self.rec.Result())
-                        if result.get("text"):
-                            callback(result["text"].lower())
-                except Exception as e:
-                    print(f"Error in audio processing: {e}")
-                    if not self._listening:  # Break if we're shutting down
-                        break
+                    text = transcripts.get(timeout=0.5)
+                except queue.Empty:
                     continue
+                try:
+                    callback(text)
+                except Exception as e:
+                    print(f"Error handling speech: {e}")
 
         finally:
+            self._active = False
+            if recognition is not None:
+                recognition.join(timeout=1)
+            print(f"Audio pipeline: {self.audio_stats()}")
             if stream:
                 try:
                     stream.stop_stream()
@@ -120,11 +200,186 @@ class AudioHandler:
                 except:
                     pass
 
+    def _capture_callback(self, ring: AudioRingBuffer):
+        """Input stream callback that moves microphone frames into the ring buffer and nothing else"""
+        import pyaudio
+
+        def capture(in_data, frame_count, time_info, status):
+            try:
+                if status & pyaudio.paInputOverflow:
+                    # Frames were lost before this buffer; the ones delivered are kept
+                    self.input_overflows += 1
+                    self._overflow_counter.inc()
+                dropped = ring.overflow_samples
+                ring.push(np.frombuffer(in_data, dtype=np.int16))
+                if ring.overflow_samples != dropped:
+                    self._buffer_overflow_counter.inc(ring.overflow_samples - dropped)
+            except Exception as e:
+                print(f"Error capturing audio: {e}")
+            return None, pyaudio.paContinue
+
+        return capture
+
+    def _recognition_loop(self, ring: AudioRingBuffer, transcripts: queue.Queue):
+        # The stream stays open while paused (e.g. during playback) and the
+        # audio is dropped, so resuming does not have to reopen the device
+        paused = False
+        block_samples = 16000 * RECOGNITION_BLOCK_MS // 1000
+        while self._active:
+            try:
+                block = ring.pop(block_samples, timeout=0.5)
+                if block is None:
+                    continue
+                data = block.tobytes()
+                if not self._listening:
+                    if not paused:
+                        self._reset_recognition()
+                        self.barge_in.reset()
+                        paused = True
+                    if not self._check_barge_in(block):
+                        continue
+                    data = self.barge_in.take_audio()
+                paused = False
+
+                if self._active_mode != self._mode:
+                    self._reset_recognition()
+                with self._block_timer.time():
+                    result = self._recognize(data)
+                if result and result.get("text"):
+                    self._transcript_counter.inc()
+                    self._endpoint_silence.observe(self.vad.trailing_silence_ms / 1000)
+                    self._dispatch(transcripts, result["text"].lower())
+            except Exception as e:
+                print(f"Error in audio processing: {e}")
+
+    def _check_barge_in(self, block: np.ndarray) -> bool:
+        """While paused, resume listening if the user talks over the current turn"""
+        if self._on_barge_in is None or self._mode != self.CONVERSATION_MODE:
+            return False
+        echo = self._echo_level() * 32768 if self._echo_level else 0.0
+        if not self.barge_in.process(block, echo, self.vad.noise_floor * self.vad.noise_ratio):
+            return False
+        if not self._on_barge_in():
+            self.barge_in.reset()
+            return False
+        self._barge_in_counter.inc()
+        self._listening = True
+        return True
+
+    def _dispatch(self, transcripts: queue.Queue, text: str):
+        try:
+            transcripts.put_nowait(text)
+        except queue.Full:
+            self.transcripts_dropped += 1
+            self._dropped_counter.inc()
+            print(f"Dropping transcript, handler is busy: {text}")
+            return
+        self.queue_high_water = max(self.queue_high_water, transcripts.qsize())
+
+    def audio_stats(self) -> dict:
+        """Overflow and queue-depth counters for the capture pipeline"""
+        stats = {
+            "input_overflows": self.input_overflows,
+            "transcripts_dropped": self.transcripts_dropped,
+            "queue_high_water": self.queue_high_water
+        }
+        if self._ring is not None:
+            stats.update({
+                "buffer_overflow_samples": self._ring.overflow_samples,
+                "buffer_high_water_samples": self._ring.high_water
+            })
+        if self._transcripts is not None:
+            stats["queue_depth"] = self._transcripts.qsize()
+        stats.update(self.vad.stats())
+        stats.update(self.endpointer.stats())
+        return stats
+
+    def _reset_recognition(self):
+        """Apply the requested mode and drop any utterance in progress"""
+        self._active_mode = self._mode
+        self.rec.Reset()
+        self.wake_rec.Reset()
+        self.vad.reset()
+        self.endpointer.reset()
+
+    def _recognize(self, data: bytes):
+        """Feed a block to Vosk and return a final result dict once an utterance is complete"""
+        if self._active_mode == self.WAKE_MODE:
+            return self._detect_wake(data)
+        return self._transcribe(data)
+
+    def _transcribe(self, data: bytes):
+        """Full large-vocabulary recognition with early endpointing"""
+        block_ms = len(data) / 2 / 16
+        speech = self.vad.process(data)
+        audio = speech if self.vad_gating else data
+
+        if audio and self.rec.AcceptWaveform(audio):
+            if not self.vad_gating:
+                self.endpointer.recognizer_finalized(self.vad.trailing_silence_ms)
+            else:
+                self.endpointer.reset()
+            return json.loads(self.rec.Result())
+
+        # With gating, silence never reaches Vosk and the partial cannot change
+        partial = (json.loads(self.rec.PartialResult()).get("partial", "")
+                   if audio else self.endpointer.partial)
+        if self.endpointer.update(partial, block_ms, self.vad.trailing_silence_ms):
+            self.endpointer.finalized(self.vad.trailing_silence_ms)
+            return json.loads(self.rec.FinalResult())
+        return None
+
+    def _detect_wake(self, data: bytes):
+        """Fire as soon as the wake phrase shows up in a partial result"""
+        speech = self.vad.process(data)
+        if self.vad_gating:
+            data = speech
+            ended = self.vad.take_utterance_end()
+        else:
+            ended = False
+
+        texts = []
+        if data:
+            if self.wake_rec.AcceptWaveform(data):
+                texts.append(json.loads(self.wake_rec.Result()).get("text", ""))
+            else:
+                texts.append(json.loads(self.wake_rec.PartialResult()).get("partial", ""))
+        if ended:
+            texts.append(json.loads(self.wake_rec.FinalResult()).get("text", ""))
+
+        if any(WAKE_PHRASE in text for text in texts):
+            self.wake_rec.Reset()
+            return {"text": WAKE_PHRASE}
+        return None
+
+    def transcribe_samples(self, samples: np.ndarray) -> List[str]:
+        """Recognize a whole 16 kHz int16 recording, as conversation mode would hear it live
+
+        The audio is fed in RECOGNITION_BLOCK_MS blocks through the same VAD
+        and endpointing as the microphone, only as fast as Vosk can take it.
+        Returns the utterances in order. Not for use while listening.
+        """
+        self._mode = self.CONVERSATION_MODE
+        self._reset_recognition()
+        block_samples = 16000 * RECOGNITION_BLOCK_MS // 1000
+        texts = []
+        for start in range(0, len(samples), block_samples):
+            result = self._transcribe(samples[start:start + block_samples].tobytes())
+            if result and result.get("text"):
+                texts.append(result["text"].lower())
+        # Whatever the recording ended in the middle of
+        text = json.loads(self.rec.FinalResult()).get("text")
+        if text:
+            texts.append(text.lower())
+        self._reset_recognition()
+        return texts
+
     def listen(self):
         """Single listening instance for basic usage"""
         if not self._ready:
             return None
 
+        import pyaudio
         stream = self.audio.open(format=pyaudio.paInt16, channels=1, rate=16000, 
                                input=True, frames_per_buffer=8000)
         
@@ -132,10 +387,9 @@ class AudioHandler:
             # Listen for up to 5 seconds
             for _ in range(20):  # 5 seconds = 20 * 0.25s chunks
                 data = stream.read(4000, exception_on_overflow=False)
-                if self.rec.AcceptWaveform(data):
-                    result = json.loads(self.rec.Result())
-                    if result.get("text"):
-                        return result["text"].lower()
+                result = self._transcribe(data)
+                if result and result.get("text"):
+                    return result["text"].lower()
         finally:
             stream.stop_stream()
             stream.close()
@@ -143,6 +397,7 @@ class AudioHandler:
         return None
 
     def __del__(self):
+        self._active = False
         self._listening = False
         if hasattr(self, 'audio'):
             try:
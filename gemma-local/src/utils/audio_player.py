@@ -0,0 +1,209 @@
+import queue
+import threading
+import time
+from collections import deque
+import numpy as np
+from config.settings import (
+    PLAYBACK_SAMPLERATE,
+    PLAYBACK_BLOCK_MS,
+    PLAYBACK_BUFFER_SECONDS,
+    PLAYBACK_CROSSFADE_MS
+)
+from utils.audio_postprocess import fade_ramps, resample, to_float32
+from utils.metrics import get_metrics
+from utils.ring_buffer import RingBuffer
+
+class AudioPlayer:
+    """Persistent output stream fed from a ring buffer
+
+    Chunks can be enqueued from any thread while earlier ones are still
+    playing; they are played back-to-back without reopening the device.
+    A chunk that follows one still queued is crossfaded into its tail;
+    otherwise it fades in. Completion callbacks fire when the last sample
+    of their chunk reaches the DAC rather than after a guessed sleep.
+    """
+
+    def __init__(self, samplerate: int = None, blocksize: int = None,
+                 buffer_seconds: float = PLAYBACK_BUFFER_SECONDS, stream_factory=None,
+                 crossfade_ms: int = PLAYBACK_CROSSFADE_MS):
+        """stream_factory replaces sounddevice.OutputStream (e.g. with a null sink)
+
+        By default the stream runs at the output device's own rate, so speech
+        is resampled once by TTSHandler instead of again by the OS mixer.
+        """
+        if samplerate is None:
+            samplerate = self.device_samplerate() if stream_factory is None else PLAYBACK_SAMPLERATE
+        self.samplerate = samplerate
+        self.blocksize = blocksize or samplerate * PLAYBACK_BLOCK_MS // 1000
+        self.crossfade_samples = samplerate * crossfade_ms // 1000
+        self._fade_out, self._fade_in = fade_ramps(self.crossfade_samples)
+        self._ring = RingBuffer(int(samplerate * buffer_seconds))
+        self._markers = deque()  # (end position, on_complete), appended by producers
+        self._completions = queue.SimpleQueue()  # (due time, on_complete) for the notifier
+        self._write_lock = threading.Lock()  # Keeps the ring single-producer
+        self._space = threading.Event()
+        self._stream_factory = stream_factory
+        self._stream = None
+        self._clock_offset = 0.0
+        self._latency = 0.0
+        self._running = False
+        self._flush_requested = False
+        self._flush_generation = 0  # Bumped by flush, so a write waiting for space gives up
+        self.last_completion_time = None  # time.monotonic() at which the last marker played out
+        self.output_level = 0.0  # Recent peak RMS of the output, for echo-aware barge-in
+        # Never touched from the audio callback
+        metrics = get_metrics()
+        self._chunks = metrics.counter("playback_chunks_total", "Audio chunks queued for playback")
+        self._audio_seconds = metrics.counter("playback_audio_seconds_total", "Seconds of audio queued for playback")
+        self._queue_delay = metrics.histogram("playback_queue_delay_seconds",
+                                              "Audio already queued ahead of a new chunk")
+        self._completion_lag = metrics.histogram("playback_completion_lag_seconds",
+                                                 "Delay between a chunk finishing and its callback running")
+        self._flushes = metrics.counter("playback_flushes_total", "Times queued speech was dropped")
+
+    @staticmethod
+    def device_samplerate() -> int:
+        """Default sample rate of the output device, or PLAYBACK_SAMPLERATE if it cannot be queried"""
+        try:
+            import sounddevice as sd
+            return int(sd.query_devices(kind='output')['default_samplerate'])
+        except Exception as e:
+            print(f"Could not query the output device, playing at {PLAYBACK_SAMPLERATE} Hz: {e}")
+            return PLAYBACK_SAMPLERATE
+
+    def start(self):
+        """Open the output device and start the callback stream"""
+        if self._running:
+            return
+        stream_factory = self._stream_factory
+        if stream_factory is None:
+            import sounddevice as sd
+            stream_factory = sd.OutputStream
+        self._stream = stream_factory(
+            samplerate=self.samplerate,
+            blocksize=self.blocksize,
+            channels=1,
+            dtype='float32',
+            callback=self._callback
+        )
+        self._stream.start()
+        # Map PortAudio stream time onto time.monotonic() for completion times
+        self._clock_offset = time.monotonic() - self._stream.time
+        self._latency = self._stream.latency
+        self._running = True
+        threading.Thread(target=self._notify_completions, daemon=True).start()
+
+    def close(self):
+        self._running = False
+        self._completions.put(None)
+        if self._stream is not None:
+            try:
+                self._stream.stop()
+                self._stream.close()
+            except Exception:
+                pass
+            self._stream = None
+
+    def enqueue(self, audio_data, samplerate: int, on_complete=None) -> bool:
+        """Queue a chunk for gapless playback; False if a flush dropped (part of) it
+
+        Returns at once unless more than the whole buffer is queued, in
+        which case it waits for space, or until flush is called.
+        """
+        # TTSHandler already delivers float32 at the output rate, so this is
+        # normally free; the data is never modified in place
+        audio = resample(to_float32(audio_data), samplerate, self.samplerate)
+
+        self._chunks.inc()
+        self._audio_seconds.inc(len(audio) / self.samplerate)
+        self._queue_delay.observe(self._ring.available / self.samplerate)
+
+        generation = self._flush_generation
+        with self._write_lock:
+            audio = self._join(audio)
+            offset = 0
+            # A flush stops the write, or the rest of the chunk would refill the space it just freed
+            while offset < len(audio) and self._flush_generation == generation:
+                written = self._ring.write(audio[offset:])
+                offset += written
+                if written == 0:
+                    # Only blocks when more than the whole buffer is queued
+                    self._space.clear()
+                    if self._ring.free == 0:
+                        self._space.wait(0.05)
+            if on_complete:
+                self._markers.append((self._ring.write_position, on_complete))
+        return offset == len(audio)
+
+    def flush(self):
+        """Drop everything queued; it stops playing within one callback block
+
+        The ring is only advanced from the audio callback, so this just
+        asks the callback to skip ahead; an enqueue waiting for space stops
+        writing. Completion callbacks of the dropped chunks still fire,
+        straight away.
+        """
+        self._flushes.inc()
+        self._flush_generation += 1
+        self._space.set()
+        # Once a write in progress has stopped, so nothing it adds survives the discard
+        with self._write_lock:
+            self._flush_requested = True
+
+    def notify_when_done(self, on_complete):
+        """Call on_complete once everything queued so far has been played"""
+        with self._write_lock:
+            self._markers.append((self._ring.write_position, on_complete))
+
+    def _join(self, audio: np.ndarray) -> np.ndarray:
+        """Crossfade the start of audio into the queued tail, or fade it in; returns the rest to write"""
+        count = self.crossfade_samples
+        if count == 0 or len(audio) < 2 * count:
+            return audio
+        # The callback must stay clear of the samples being mixed
+        if self._ring.available >= count + 2 * self.blocksize:
+            self._ring.mix_tail(audio[:count], self._fade_out, self._fade_in)
+            return audio[count:]
+        head = audio[:count] * self._fade_in
+        return np.concatenate((head, audio[count:]))
+
+    def _callback(self, outdata, frames, time_info, status):
+        out = outdata[:, 0]
+        if self._flush_requested:
+            self._flush_requested = False
+            self._ring.discard()
+        count = self._ring.read_into(out)
+        if count < frames:
+            out[count:] = 0
+        self._space.set()
+        # Peak hold that decays over a few hundred ms, to cover the acoustic delay
+        level = float(np.sqrt(np.dot(out, out) / frames)) if frames else 0.0
+        self.output_level = max(level, self.output_level * 0.9)
+
+        position = self._ring.read_position
+        block_start = position - count
+        while self._markers and self._markers[0][0] <= position:
+            end, on_complete = self._markers.popleft()
+            offset = max(end - block_start, 0) / self.samplerate
+            if time_info.outputBufferDacTime:
+                due = time_info.outputBufferDacTime + self._clock_offset + offset
+            else:
+                due = time.monotonic() + self._latency + offset
+            self._completions.put((due, on_complete))
+
+    def _notify_completions(self):
+        # Callbacks run here, never on the audio thread
+        while self._running:
+            item = self._completions.get()
+            if item is None:
+                break
+            due, on_complete = item
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.last_completion_time = due
+            self._completion_lag.observe(max(time.monotonic() - due, 0.0))
+            try:
+                on_complete()
+            except Exception as e:
+                print(f"Error in playback callback: {e}")
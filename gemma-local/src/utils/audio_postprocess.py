@@ -0,0 +1,56 @@
+from typing import Optional, Tuple
+import numpy as np
+from config.settings import (
+    TTS_TRIM_THRESHOLD,
+    TTS_TRIM_KEEP_MS,
+    TTS_TRIM_FRAME_MS
+)
+
+def to_float32(audio) -> np.ndarray:
+    """Mono float32 samples, without copying audio that already is"""
+    audio = np.asarray(audio)
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1, dtype=np.float32)
+    return audio.astype(np.float32, copy=False)
+
+def trim_silence(audio: np.ndarray, samplerate: int, threshold: float = TTS_TRIM_THRESHOLD,
+                 keep_ms: int = TTS_TRIM_KEEP_MS, frame_ms: int = TTS_TRIM_FRAME_MS) -> np.ndarray:
+    """Drop leading and trailing silence, keeping keep_ms of it at each end (returns a view)"""
+    frame = max(samplerate * frame_ms // 1000, 1)
+    count = len(audio) // frame
+    if count == 0:
+        return audio
+    # Peak per frame, so a single loud sample is enough to keep a frame
+    peaks = np.abs(audio[:count * frame]).reshape(count, frame).max(axis=1)
+    loud = np.flatnonzero(peaks > threshold)
+    if len(loud) == 0:
+        return audio[:0]
+    keep = samplerate * keep_ms // 1000
+    start = max(loud[0] * frame - keep, 0)
+    # The partial frame at the end is kept if the last full frame is loud
+    end = len(audio) if loud[-1] == count - 1 else min((loud[-1] + 1) * frame + keep, len(audio))
+    return audio[start:end]
+
+def resample(audio: np.ndarray, samplerate: int, target_rate: int) -> np.ndarray:
+    """Linear-interpolation resampling to target_rate"""
+    if samplerate == target_rate or len(audio) == 0:
+        return audio
+    count = int(round(len(audio) * target_rate / samplerate))
+    positions = np.arange(count, dtype=np.float64) * (samplerate / target_rate)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+def fade_ramps(samples: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Equal-power fade-out and fade-in curves of the given length"""
+    phase = (np.arange(samples, dtype=np.float32) + 0.5) / samples * (np.pi / 2)
+    return np.cos(phase), np.sin(phase)
+
+def postprocess_speech(audio, samplerate: int, target_rate: Optional[int] = None) -> Tuple[np.ndarray, int]:
+    """Prepare synthesized audio for playback: float32 mono, trimmed, at the output rate"""
+    audio = to_float32(audio)
+    trimmed = trim_silence(audio, samplerate)
+    if target_rate and target_rate != samplerate:
+        return resample(trimmed, samplerate, target_rate), target_rate
+    if len(trimmed) < len(audio):
+        # A view would keep the untrimmed buffer alive in the cache
+        trimmed = trimmed.copy()
+    return trimmed, samplerate
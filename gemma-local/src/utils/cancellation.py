@@ -0,0 +1,63 @@
+import threading
+from typing import Callable
+
+class OperationCancelled(Exception):
+    """Raised when work is abandoned because its cancellation token was cancelled"""
+
+
+class CancellationToken:
+    """Thread-safe flag that tells the stages of one turn to stop
+
+    Stages poll cancelled (or call raise_if_cancelled) between steps, and
+    register callbacks with on_cancel for work that is blocked and has to
+    be interrupted from outside, such as closing a streaming HTTP response
+    or flushing the audio output. A token is cancelled at most once.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reason = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Cancel and run the registered callbacks; False if it already was"""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            # Set before the callbacks run so stages racing with them see it
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in cancellation callback: {e}")
+        return True
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Call callback on cancellation (now, if already cancelled); returns a function that unregisters it"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise OperationCancelled(self.reason)
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until cancelled or timeout; returns whether it was cancelled"""
+        return self._event.wait(timeout)
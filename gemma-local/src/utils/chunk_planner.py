@@ -0,0 +1,133 @@
+import re
+import threading
+from typing import Iterable, Iterator, List
+from config.settings import (
+    MAX_CHUNK_LENGTH,
+    CHUNK_OVERLAP,
+    TTS_MIN_CHUNK_LENGTH,
+    TTS_FIRST_AUDIO_TARGET,
+    TTS_DEFAULT_CHARS_PER_SECOND,
+    TTS_BACKEND_LATENCY_ALPHA
+)
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+# After , ; : or a closing bracket, or before a dash or a conjunction
+CLAUSE_BOUNDARY = re.compile(
+    r'(?<=[,;:)])\s+|\s+(?=[-–—]\s)|\s+(?=(?:and|but|or|so|because|which|while|although)\s)'
+)
+
+
+class ChunkPlanner:
+    """Decides where text is cut into TTS chunks, keeping the first one quick to synthesize"""
+
+    def __init__(self, max_length: int = MAX_CHUNK_LENGTH, slack: int = CHUNK_OVERLAP,
+                 min_length: int = TTS_MIN_CHUNK_LENGTH, first_audio_target: float = TTS_FIRST_AUDIO_TARGET,
+                 default_rate: float = TTS_DEFAULT_CHARS_PER_SECOND, alpha: float = TTS_BACKEND_LATENCY_ALPHA):
+        self.max_length = max_length
+        self.slack = slack
+        self.min_length = min(min_length, max_length)
+        self.first_audio_target = first_audio_target
+        self.default_rate = default_rate
+        self.alpha = alpha
+        self._rates = {}  # backend name -> characters synthesized per second
+        self._lock = threading.Lock()
+
+    def record(self, backend: str, chars: int, seconds: float):
+        """Learn from a chunk of chars characters that took seconds to synthesize"""
+        if chars <= 0 or seconds <= 0:
+            return
+        rate = chars / seconds
+        with self._lock:
+            previous = self._rates.get(backend)
+            self._rates[backend] = rate if previous is None else previous + self.alpha * (rate - previous)
+
+    def chars_per_second(self, backend: str = None) -> float:
+        with self._lock:
+            return self._rates.get(backend, self.default_rate)
+
+    def limit(self, backend: str = None, queued_chars: int = 0) -> int:
+        """Longest chunk wanted after queued_chars characters already planned
+
+        The first chunk should synthesize within first_audio_target seconds
+        at the backend's learned rate; later ones, synthesized while earlier
+        ones play, may be up to max_length.
+        """
+        if queued_chars:
+            return self.max_length
+        length = int(self.chars_per_second(backend) * self.first_audio_target)
+        return max(self.min_length, min(self.max_length, length))
+
+    def split(self, text: str) -> List[str]:
+        """Chunks for a complete text, independent of any learned rate
+
+        For canned lines and anything else that should come from the TTS
+        cache: with no backend the default rate is used, so the same text
+        always gives the same chunks.
+        """
+        return list(self.plan_stream([text]))
+
+    def plan_stream(self, sentences: Iterable[str], backend: str = None) -> Iterator[str]:
+        """Chunks for sentences that arrive over time (e.g. from the LLM)
+
+        Nothing is held back waiting for more text except a fragment
+        shorter than min_length, which goes out with the sentence after it
+        (a short first sentence is spoken on its own, as it gets audio
+        started soonest). Only a first sentence too long for the first
+        chunk is cut differently from split.
+        """
+        queued = 0
+        buffer = ""
+        for text in sentences:
+            for sentence in self._sentences(text):
+                buffer = f"{buffer} {sentence}" if buffer else sentence
+                if queued and len(buffer) < self.min_length:
+                    continue
+                for chunk in self._cut(buffer, backend, queued):
+                    queued += len(chunk)
+                    yield chunk
+                buffer = ""
+        if buffer:
+            yield from self._cut(buffer, backend, queued)
+
+    @staticmethod
+    def _sentences(text: str) -> List[str]:
+        return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+    def _cut(self, text: str, backend: str, queued: int) -> List[str]:
+        """Cut text into pieces that each fit the limit at their place in the queue
+
+        Cuts fall at a clause boundary, up to slack characters past the
+        limit (or further, if the first one comes later); text without one
+        is kept whole up to max_length plus slack, and only then cut
+        between words.
+        """
+        pieces = []
+        while text:
+            limit = self.limit(backend, queued)
+            if len(text) <= limit + self.slack:
+                pieces.append(text)
+                break
+            end = self._clause_break(text, limit)
+            if end is None:
+                if len(text) <= self.max_length + self.slack:
+                    # Slightly long is better than stopping mid-clause
+                    pieces.append(text)
+                    break
+                end = self._word_break(text)
+            piece, text = text[:end].strip(), text[end:].strip()
+            pieces.append(piece)
+            queued += len(piece)
+        return pieces
+
+    def _clause_break(self, text: str, limit: int):
+        """Last clause boundary within the limit plus slack, else the first one within max_length, or None"""
+        clauses = [match.start() for match in CLAUSE_BOUNDARY.finditer(text, 0, self.max_length + self.slack)
+                   if match.start() >= self.slack]
+        within = [clause for clause in clauses if clause <= limit + self.slack]
+        if within:
+            return within[-1]
+        return clauses[0] if clauses else None
+
+    def _word_break(self, text: str) -> int:
+        space = text.rfind(" ", 0, self.max_length + 1)
+        return space if space > 0 else self.max_length
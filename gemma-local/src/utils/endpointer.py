@@ -0,0 +1,86 @@
+from config.settings import (
+    ENDPOINT_TRAILING_SILENCE_MS,
+    ENDPOINT_STABLE_PARTIAL_MS,
+    ENDPOINT_MAX_SILENCE_MS,
+    ENDPOINT_BASELINE_SILENCE_MS
+)
+
+class Endpointer:
+    """Finalizes utterances early, once the partial result is stable and the speaker has paused"""
+
+    def __init__(self, trailing_silence_ms: float = ENDPOINT_TRAILING_SILENCE_MS,
+                 stable_partial_ms: float = ENDPOINT_STABLE_PARTIAL_MS,
+                 max_silence_ms: float = ENDPOINT_MAX_SILENCE_MS,
+                 baseline_ms: float = ENDPOINT_BASELINE_SILENCE_MS):
+        self.trailing_silence_ms = trailing_silence_ms
+        self.stable_partial_ms = stable_partial_ms
+        self.max_silence_ms = max_silence_ms
+        self.baseline_ms = baseline_ms
+        self.baseline_samples = 0  # Recognizer endpoints measured so far
+        self.turns = 0
+        self.total_saved_ms = 0.0
+        self.reset()
+
+    @property
+    def partial(self) -> str:
+        return self._partial
+
+    def reset(self):
+        self._partial = ""
+        self._stable_ms = 0.0
+
+    def update(self, partial: str, block_ms: float, silence_ms: float) -> bool:
+        """Record the latest partial result; True when the utterance should be finalized
+
+        That is usually well before Vosk's own, fairly long, trailing-silence
+        rule would end it.
+        """
+        if partial != self._partial:
+            self._partial = partial
+            self._stable_ms = 0.0
+        else:
+            self._stable_ms += block_ms
+
+        if not self._partial:
+            return False
+        if silence_ms >= self.max_silence_ms:
+            return True
+        return (silence_ms >= self.trailing_silence_ms and
+                self._stable_ms >= self.stable_partial_ms)
+
+    def finalized(self, silence_ms: float) -> float:
+        """Log an early finalization and return the estimated milliseconds saved
+
+        Savings are measured against the recognizer's own endpoints once
+        any are recorded. With VAD gating (the default) silence never
+        reaches Vosk, so they stay an estimate against
+        ENDPOINT_BASELINE_SILENCE_MS; the log says which.
+        """
+        saved = max(self.baseline_ms - silence_ms, 0.0)
+        self.turns += 1
+        self.total_saved_ms += saved
+        if self.baseline_samples:
+            print(f"Endpoint after {silence_ms:.0f} ms of silence, "
+                  f"~{saved:.0f} ms before the recognizer's measured endpoint")
+        else:
+            print(f"Endpoint after {silence_ms:.0f} ms of silence, "
+                  f"an estimated {saved:.0f} ms before the recognizer's "
+                  f"({self.baseline_ms:.0f} ms configured, not measured)")
+        self.reset()
+        return saved
+
+    def recognizer_finalized(self, silence_ms: float):
+        """Record the trailing silence the recognizer needed to end an utterance itself"""
+        if silence_ms > 0:
+            # Smooth the measurement so one odd utterance does not skew it
+            self.baseline_ms = 0.8 * self.baseline_ms + 0.2 * silence_ms
+            self.baseline_samples += 1
+        self.reset()
+
+    def stats(self) -> dict:
+        return {
+            "early_endpoints": self.turns,
+            "endpoint_ms_saved": round(self.total_saved_ms),
+            "recognizer_endpoint_ms": round(self.baseline_ms),
+            "recognizer_endpoint_measured": self.baseline_samples > 0
+        }
@@ -0,0 +1,92 @@
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+class QueueFullError(Exception):
+    """Raised when the scheduler already holds its maximum number of jobs"""
+
+
+class FairScheduler:
+    """Runs jobs on a few workers, taking turns between keys (e.g. sessions)
+
+    Each key has its own FIFO queue and workers serve the keys round-robin,
+    so one chatty session cannot starve the others. Admission is bounded:
+    once max_pending jobs are queued or running, submit() raises
+    QueueFullError so the caller can push back on its client.
+    """
+
+    def __init__(self, workers: int = 1, max_pending: int = 16, name: str = "scheduler"):
+        self.max_pending = max_pending
+        self._queues = OrderedDict()
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._running = 0
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, key, func, *args) -> Future:
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Scheduler is shut down")
+            if self._pending >= self.max_pending:
+                raise QueueFullError(f"{self._pending} jobs already pending")
+            self._queues.setdefault(key, deque()).append((func, args, future))
+            self._pending += 1
+            self._cond.notify()
+        return future
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "pending": self._pending,
+                "running": self._running,
+                "waiting_keys": len(self._queues)
+            }
+
+    def shutdown(self):
+        """Stop the workers after their current jobs; queued jobs are cancelled"""
+        with self._cond:
+            self._closed = True
+            queued = [future for jobs in self._queues.values() for _, _, future in jobs]
+            self._queues.clear()
+            self._pending -= len(queued)
+            self._cond.notify_all()
+        # Outside the lock: cancelling runs the futures' done callbacks
+        for future in queued:
+            future.cancel()
+
+    def _next_job(self):
+        # Take from the key at the head, then move that key to the back
+        key, jobs = next(iter(self._queues.items()))
+        job = jobs.popleft()
+        del self._queues[key]
+        if jobs:
+            self._queues[key] = jobs
+        return job
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queues and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                func, args, future = self._next_job()
+                self._running += 1
+
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(func(*args))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._pending -= 1
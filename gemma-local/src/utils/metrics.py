@@ -0,0 +1,207 @@
+import bisect
+import json
+import threading
+import time
+from config.settings import (
+    METRICS_ENABLED,
+    METRICS_PREFIX,
+    METRICS_LATENCY_BUCKETS
+)
+
+class Counter:
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    """Bucketed distribution of observed values, e.g. durations in seconds"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str = "", buckets=METRICS_LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> "Span":
+        """Context manager that observes the seconds spent inside it"""
+        return Span(self)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self._cumulative()))
+            }
+
+    def _cumulative(self):
+        total = 0
+        for count in self.counts:
+            total += count
+            yield total
+
+
+class Span:
+    def __init__(self, histogram: Histogram):
+        self._histogram = histogram
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _NoopInstrument:
+    """Stands in for every instrument while metrics are off"""
+
+    kind = "noop"
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+    def time(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP = _NoopInstrument()
+
+
+class MetricsRegistry:
+    """Named counters and histograms for the voice pipeline
+
+    Components look their instruments up once, when they are created. While
+    the registry is disabled they get a shared no-op object, so instrumented
+    code costs one empty method call. Snapshots can be rendered as
+    Prometheus text or appended to a JSON lines file.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED, prefix: str = METRICS_PREFIX):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._instruments = {}
+        self._lock = threading.Lock()
+        self._exporter = None
+        self._stop_export = threading.Event()
+
+    def counter(self, name: str, help: str = ""):
+        return self._get(Counter, name, help)
+
+    def histogram(self, name: str, help: str = "", buckets=METRICS_LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, buckets)
+
+    def _get(self, kind, name: str, *args):
+        if not self.enabled:
+            return NOOP
+        with self._lock:
+            instrument = self._instruments.get(name)
+            if instrument is None:
+                instrument = self._instruments[name] = kind(name, *args)
+            elif not isinstance(instrument, kind):
+                raise ValueError(f"Metric {name} is already a {instrument.kind}")
+            return instrument
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            instruments = list(self._instruments.values())
+        return {instrument.name: instrument.snapshot() for instrument in instruments}
+
+    def to_prometheus(self) -> str:
+        """Render all instruments in the Prometheus text exposition format"""
+        with self._lock:
+            instruments = sorted(self._instruments.values(), key=lambda i: i.name)
+        lines = []
+        for instrument in instruments:
+            name = f"{self.prefix}{instrument.name}"
+            if instrument.help:
+                lines.append(f"# HELP {name} {instrument.help}")
+            lines.append(f"# TYPE {name} {instrument.kind}")
+            if instrument.kind == "counter":
+                lines.append(f"{name} {instrument.snapshot()}")
+                continue
+            snapshot = instrument.snapshot()
+            for bound, count in snapshot["buckets"].items():
+                lines.append(f'{name}_bucket{{le="{bound}"}} {count}')
+            lines.append(f"{name}_sum {snapshot['sum']}")
+            lines.append(f"{name}_count {snapshot['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_jsonl(self, path):
+        """Append one timestamped snapshot line to path"""
+        line = json.dumps({"time": time.time(), "metrics": self.snapshot()})
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def start_export(self, path, interval: float):
+        """Append a snapshot to path every interval seconds until stop_export()"""
+        if not self.enabled or self._exporter is not None:
+            return
+
+        def export():
+            while not self._stop_export.wait(interval):
+                try:
+                    self.write_jsonl(path)
+                except Exception as e:
+                    print(f"Error exporting metrics: {e}")
+
+        self._exporter = threading.Thread(target=export, name="metrics-export", daemon=True)
+        self._exporter.start()
+
+    def stop_export(self, path=None):
+        """Stop the exporter, writing a final snapshot to path if given"""
+        self._stop_export.set()
+        if self._exporter is not None:
+            self._exporter.join(timeout=1)
+            self._exporter = None
+        if path and self.enabled:
+            self.write_jsonl(path)
+
+
+_registry = MetricsRegistry()
+
+def get_metrics() -> MetricsRegistry:
+    """Return the process-wide registry"""
+    return _registry
+
+def enable_metrics(enabled: bool = True) -> MetricsRegistry:
+    """Switch metrics on or off; only affects components created afterwards"""
+    _registry.enabled = enabled
+    return _registry
@@ -0,0 +1,109 @@
+import threading
+import time
+from typing import Optional
+import numpy as np
+
+class RingBuffer:
+    """Preallocated single-producer/single-consumer ring buffer of samples
+
+    One thread writes and one thread reads. Each side only advances its own
+    position counter, so neither side needs a lock. Positions count every
+    sample ever written or read, which lets callers mark exact sample offsets.
+    """
+
+    def __init__(self, capacity: int, dtype=np.float32):
+        self.capacity = capacity
+        self._buffer = np.zeros(capacity, dtype=dtype)
+        self._read_pos = 0
+        self._write_pos = 0
+
+    @property
+    def read_position(self) -> int:
+        return self._read_pos
+
+    @property
+    def write_position(self) -> int:
+        return self._write_pos
+
+    @property
+    def available(self) -> int:
+        """Samples waiting to be read"""
+        return self._write_pos - self._read_pos
+
+    @property
+    def free(self) -> int:
+        """Samples that can be written without overwriting unread data"""
+        return self.capacity - self.available
+
+    def write(self, data: np.ndarray) -> int:
+        """Copy as much of data as fits; returns the number of samples written"""
+        count = min(len(data), self.free)
+        if count <= 0:
+            return 0
+        start = self._write_pos % self.capacity
+        first = min(count, self.capacity - start)
+        self._buffer[start:start + first] = data[:first]
+        self._buffer[:count - first] = data[first:count]
+        self._write_pos += count
+        return count
+
+    def read_into(self, out: np.ndarray) -> int:
+        """Fill out with up to len(out) samples; returns the number read"""
+        count = min(len(out), self.available)
+        if count <= 0:
+            return 0
+        start = self._read_pos % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self._buffer[start:start + first]
+        out[first:count] = self._buffer[:count - first]
+        self._read_pos += count
+        return count
+
+    def mix_tail(self, data: np.ndarray, fade_out: np.ndarray, fade_in: np.ndarray):
+        """Crossfade data into the last len(data) samples written (writer side only)
+
+        Callers must make sure the reader is well behind those samples.
+        """
+        count = len(data)
+        index = (self._write_pos - count + np.arange(count)) % self.capacity
+        self._buffer[index] = self._buffer[index] * fade_out + data * fade_in
+
+    def discard(self):
+        """Drop all unread samples (reader side only)"""
+        self._read_pos = self._write_pos
+
+
+class AudioRingBuffer(RingBuffer):
+    """Ring buffer between a capture thread and a consumer that waits for audio
+
+    The writer never blocks: when the consumer falls behind, new audio is
+    dropped and counted instead of stalling capture.
+    """
+
+    def __init__(self, capacity: int, dtype=np.int16):
+        super().__init__(capacity, dtype)
+        self._data_ready = threading.Event()
+        self.overflow_samples = 0
+        self.high_water = 0
+
+    def push(self, data: np.ndarray):
+        written = self.write(data)
+        if written < len(data):
+            self.overflow_samples += len(data) - written
+        self.high_water = max(self.high_water, self.available)
+        self._data_ready.set()
+
+    def pop(self, count: int, timeout: float = None) -> Optional[np.ndarray]:
+        """Wait for count samples and return them, or None on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.available < count:
+            self._data_ready.clear()
+            if self.available >= count:
+                break
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            self._data_ready.wait(remaining)
+        out = np.empty(count, dtype=self._buffer.dtype)
+        self.read_into(out)
+        return out
@@ -0,0 +1,26 @@
+import re
+from typing import Iterable, Iterator
+
+# Same boundary rule as the TTS chunk planner, plus line breaks
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def iter_sentences(tokens: Iterable[str]) -> Iterator[str]:
+    """Group a stream of tokens into sentences, yielding each one as soon as it is complete"""
+    buffer = ""
+    for token in tokens:
+        buffer += token
+        # A boundary is only confirmed once the whitespace after it has arrived,
+        # so "3." followed by "5" is never split.
+        while True:
+            match = SENTENCE_BOUNDARY.search(buffer)
+            if not match:
+                break
+            sentence = buffer[:match.start()].strip()
+            buffer = buffer[match.end():]
+            if sentence:
+                yield sentence
+
+    sentence = buffer.strip()
+    if sentence:
+        yield sentence
@@ -0,0 +1,121 @@
+import threading
+import time
+from typing import Dict, List
+
+class StartupError(Exception):
+    """Raised when a required startup phase fails"""
+
+
+class StartupPhase:
+    def __init__(self, name: str, func, args: tuple, after: List[str], background: bool):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.after = list(after)
+        self.background = background
+        self.result = None
+        self.error = None
+        self.start = None
+        self.end = None
+        self.done = threading.Event()
+
+    @property
+    def seconds(self) -> float:
+        if self.start is None:
+            return 0.0
+        return (self.end or time.monotonic()) - self.start
+
+
+class StartupOrchestrator:
+    """Runs startup phases concurrently, each as soon as the phases it depends on are done
+
+    run() returns once every foreground phase has finished, so the app can
+    report "Ready!" while background phases (model warmup, pre-synthesis)
+    carry on. Every phase is timed for the startup report.
+    """
+
+    def __init__(self):
+        self._phases = {}
+        self._started = None
+        self.ready_seconds = None
+
+    def add(self, name: str, func, *args, after=(), background: bool = False) -> StartupPhase:
+        """Register func(*args) as a phase that starts once the phases in after have finished"""
+        if name in self._phases:
+            raise ValueError(f"Duplicate startup phase: {name}")
+        unknown = [dep for dep in after if dep not in self._phases]
+        if unknown:
+            raise ValueError(f"Startup phase {name} depends on unknown phases: {unknown}")
+        phase = self._phases[name] = StartupPhase(name, func, args, after, background)
+        return phase
+
+    def result(self, name: str):
+        """Result of a finished phase"""
+        phase = self._phases[name]
+        phase.done.wait()
+        if phase.error is not None:
+            raise StartupError(f"{name} failed: {phase.error}")
+        return phase.result
+
+    def run(self) -> Dict[str, object]:
+        """Start every phase and wait for the foreground ones; returns their results"""
+        self._started = time.monotonic()
+        for phase in self._phases.values():
+            threading.Thread(target=self._run_phase, args=(phase,), name=f"startup-{phase.name}",
+                             daemon=True).start()
+
+        foreground = [phase for phase in self._phases.values() if not phase.background]
+        for phase in foreground:
+            phase.done.wait()
+        self.ready_seconds = time.monotonic() - self._started
+
+        failed = [phase for phase in foreground if phase.error is not None]
+        if failed:
+            raise StartupError("; ".join(f"{phase.name}: {phase.error}" for phase in failed))
+        return {phase.name: phase.result for phase in foreground}
+
+    def wait(self, timeout: float = None) -> bool:
+        """Wait for the background phases too"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for phase in self._phases.values():
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not phase.done.wait(remaining):
+                return False
+        return True
+
+    def _run_phase(self, phase: StartupPhase):
+        try:
+            for dep in phase.after:
+                dependency = self._phases[dep]
+                dependency.done.wait()
+                if dependency.error is not None:
+                    raise StartupError(f"needs {dep}, which failed")
+            phase.start = time.monotonic()
+            phase.result = phase.func(*phase.args)
+        except Exception as e:
+            phase.error = e
+        finally:
+            phase.end = time.monotonic()
+            if phase.background and self.ready_seconds is not None:
+                status = f"failed: {phase.error}" if phase.error else f"done in {phase.seconds:.2f}s"
+                print(f"Startup: {phase.name} {status} (background)")
+            phase.done.set()
+
+    def report(self) -> str:
+        """Per-phase timings, in start order"""
+        lines = ["Startup report:"]
+        phases = sorted(self._phases.values(), key=lambda p: p.start or float("inf"))
+        for phase in phases:
+            offset = (phase.start - self._started) if phase.start is not None else 0.0
+            if phase.error is not None:
+                status = f"failed: {phase.error}"
+            elif not phase.done.is_set():
+                status = "still running" if phase.start is not None else "waiting"
+            else:
+                status = "ok"
+            kind = " (background)" if phase.background else ""
+            lines.append(f"  {phase.name:<18} +{offset:5.2f}s {phase.seconds:6.2f}s  {status}{kind}")
+        total = sum(phase.seconds for phase in phases if phase.done.is_set())
+        if self.ready_seconds is not None:
+            lines.append(f"  ready after {self.ready_seconds:.2f}s ({total:.2f}s of work done so far)")
+        return "\n".join(lines)
@@ -0,0 +1,88 @@
+import heapq
+import itertools
+import threading
+import time
+
+class TimerHandle:
+    """A scheduled callback; cancel() stops it from running if it has not yet"""
+
+    def __init__(self, deadline: float, callback, args: tuple):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerScheduler:
+    """Runs callbacks at deadlines on one thread that sleeps until the next one is due
+
+    Deadlines are on the time.monotonic() clock and kept in a heap, so the
+    thread only wakes when something is due or the schedule changes,
+    instead of polling. Callbacks should be quick (e.g. post an event);
+    a slow one delays the timers behind it.
+    """
+
+    def __init__(self, name: str = "timer-scheduler"):
+        self.name = name
+        self._heap = []
+        self._order = itertools.count()  # Tie-breaker so handles are never compared
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def start(self) -> "TimerScheduler":
+        with self._condition:
+            if self._running:
+                return self
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 1):
+        with self._condition:
+            self._running = False
+            self._heap.clear()
+            self._condition.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def call_at(self, deadline: float, callback, *args) -> TimerHandle:
+        handle = TimerHandle(deadline, callback, args)
+        with self._condition:
+            heapq.heappush(self._heap, (deadline, next(self._order), handle))
+            # Only an earlier deadline changes how long the thread should sleep
+            if self._heap[0][2] is handle:
+                self._condition.notify()
+        return handle
+
+    def call_later(self, delay: float, callback, *args) -> TimerHandle:
+        return self.call_at(time.monotonic() + delay, callback, *args)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running:
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    delay = self._heap[0][0] - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._condition.wait(delay)
+                if not self._running:
+                    return
+                _, _, handle = heapq.heappop(self._heap)
+            # Outside the lock, so callbacks can schedule or cancel timers
+            if handle.cancelled:
+                continue
+            try:
+                handle.callback(*handle.args)
+            except Exception as e:
+                print(f"Error in timer callback: {e}")
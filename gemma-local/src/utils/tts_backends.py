@@ -0,0 +1,338 @@
+import asyncio
+import io
+import threading
+import time
+import numpy as np
+import soundfile as sf
+from typing import AsyncIterator, Iterator, List, NamedTuple, Optional, Tuple
+from config.settings import (
+    BENCH_TTS_LATENCY,
+    BENCH_SPEECH_CHARS_PER_SECOND,
+    PIPER_VOICE,
+    TTS_BACKEND_LATENCY_ALPHA,
+    TTS_BACKEND_COOLDOWN,
+    TTS_BACKEND_PROBE_EVERY
+)
+from utils.async_runtime import iterate_async
+from utils.metrics import get_metrics
+
+class TTSBackendError(Exception):
+    """Raised when a backend cannot synthesize a chunk"""
+
+
+class SpeechFrame(NamedTuple):
+    audio: np.ndarray  # float32 mono samples
+    samplerate: int
+    encoded: Optional[bytes] = None  # Whole encoded clip, from backends that return a file
+
+
+class TTSBackend:
+    """A speech synthesizer behind TTSHandler
+
+    stream() yields SpeechFrames as audio becomes available, so a backend
+    that synthesizes incrementally can start playback before it is done.
+    (cache_voice, fmt) identify its output in the TTS cache.
+    """
+
+    name = "backend"
+    fmt = "pcm"
+
+    @property
+    def cache_voice(self) -> str:
+        return self.name
+
+    def load(self):
+        """Load models ahead of the first request (blocking, may be slow)"""
+
+    def stream(self, text: str) -> AsyncIterator[SpeechFrame]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class EdgeTTSBackend(TTSBackend):
+    """Microsoft Edge online voices via edge-tts, falling back to other voices on failure"""
+
+    name = "edge"
+    fmt = "mp3"  # edge-tts default output (audio-24khz-48kbitrate-mono-mp3)
+    DEFAULT_VOICE = "en-GB-RyanNeural"
+    FALLBACK_VOICES = [
+        "en-US-ChristopherNeural",
+        "en-US-EricNeural",
+        "en-US-GuyNeural",
+        "en-GB-RyanNeural"
+    ]
+
+    def __init__(self, voice: str = DEFAULT_VOICE, timeout: float = 10, communicate=None):
+        """communicate replaces edge_tts.Communicate"""
+        if communicate is None:
+            import edge_tts
+            communicate = edge_tts.Communicate
+        self.voice = voice
+        self.timeout = timeout
+        self.communicate = communicate
+        self._fallbacks = get_metrics().counter("tts_voice_fallbacks_total",
+                                                "Switches to a fallback edge-tts voice")
+
+    @property
+    def cache_voice(self) -> str:
+        return self.voice
+
+    async def _try_voice(self, text: str, voice: str) -> Optional[bytes]:
+        """Try to generate speech with a specific voice, returning the encoded audio"""
+        try:
+            communicate = self.communicate(text, voice)
+            encoded = await asyncio.wait_for(
+                self._collect_audio(communicate),
+                timeout=self.timeout
+            )
+            return encoded or None
+        except Exception:
+            return None
+
+    @staticmethod
+    async def _collect_audio(communicate) -> bytes:
+        """Gather the streamed audio frames into one in-memory buffer"""
+        buffer = bytearray()
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                buffer.extend(chunk["data"])
+        return bytes(buffer)
+
+    @staticmethod
+    def decode_audio(encoded: bytes) -> Tuple[np.ndarray, int]:
+        """Decode encoded audio straight from memory into float32 samples"""
+        return sf.read(io.BytesIO(encoded), dtype='float32')
+
+    async def stream(self, text: str) -> AsyncIterator[SpeechFrame]:
+        # The service returns MP3, which is decoded once complete
+        voice = self.voice
+        encoded = await self._try_voice(text, voice)
+        if encoded is None:
+            for fallback in self.FALLBACK_VOICES:
+                if fallback == voice:
+                    continue
+                encoded = await self._try_voice(text, fallback)
+                if encoded is not None:
+                    self.voice = fallback
+                    self._fallbacks.inc()
+                    break
+
+        if encoded is None:
+            raise TTSBackendError("All voices failed to generate speech")
+
+        data, samplerate = self.decode_audio(encoded)
+        yield SpeechFrame(data, samplerate, encoded)
+
+
+class PiperBackend(TTSBackend):
+    """Local Piper voice, loaded once and kept warm in this process
+
+    Needs the optional piper-tts package; the ONNX voice is fetched with
+    download_voice_model on first load. Audio is streamed sentence by
+    sentence as Piper produces it.
+    """
+
+    name = "piper"
+
+    def __init__(self, voice_name: str = PIPER_VOICE):
+        self.voice_name = voice_name
+        self._voice = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def cache_voice(self) -> str:
+        return f"piper:{self.voice_name}"
+
+    def load(self):
+        with self._load_lock:
+            if self._voice is not None:
+                return
+            try:
+                from piper import PiperVoice
+            except ImportError as e:
+                raise TTSBackendError("piper-tts is not installed (see requirements-piper.txt)") from e
+            from utils.voice_downloader import download_voice_model
+
+            model_path = download_voice_model(self.voice_name)
+            if model_path is None:
+                raise TTSBackendError(f"Piper voice {self.voice_name} is not available")
+            start = time.monotonic()
+            voice = PiperVoice.load(model_path)
+            # One throwaway sentence so the first real reply runs on a warm session
+            for _ in self._synthesize(voice, "Ready."):
+                pass
+            self._voice = voice
+            print(f"Piper voice {self.voice_name} loaded in {time.monotonic() - start:.1f}s")
+
+    @staticmethod
+    def _synthesize(voice, text: str) -> Iterator[Tuple[np.ndarray, int]]:
+        if hasattr(voice, "synthesize_stream_raw"):
+            # piper-tts < 1.3 yields raw 16-bit PCM per sentence
+            samplerate = voice.config.sample_rate
+            for pcm in voice.synthesize_stream_raw(text):
+                yield np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768, samplerate
+        else:
+            for chunk in voice.synthesize(text):
+                pcm = np.frombuffer(chunk.audio_int16_bytes, dtype=np.int16)
+                yield pcm.astype(np.float32) / 32768, chunk.sample_rate
+
+    async def stream(self, text: str) -> AsyncIterator[SpeechFrame]:
+        if self._voice is None:
+            await asyncio.get_running_loop().run_in_executor(None, self.load)
+        async for audio, samplerate in iterate_async(self._synthesize(self._voice, text)):
+            yield SpeechFrame(audio, samplerate)
+
+
+class FakeTTSBackend(TTSBackend):
+    """Offline stand-in for tests and benchmarks
+
+    After latency seconds it streams a quiet tone lasting
+    len(text) / chars_per_second seconds in frame_seconds frames, so
+    playback time scales with the text like real speech. With fail set
+    every request raises TTSBackendError.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency: float = BENCH_TTS_LATENCY, chars_per_second: float = BENCH_SPEECH_CHARS_PER_SECOND,
+                 sample_rate: int = 24000,
+                 frame_seconds: float = 0.5, fail: bool = False):
+        self.latency = latency
+        self.chars_per_second = chars_per_second
+        self.sample_rate = sample_rate
+        self.frame_seconds = frame_seconds
+        self.fail = fail
+        self.calls = 0
+
+    async def stream(self, text: str) -> AsyncIterator[SpeechFrame]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise TTSBackendError("fake backend failure")
+        duration = max(len(text) / self.chars_per_second, 0.1)
+        t = np.arange(int(duration * self.sample_rate)) / self.sample_rate
+        audio = (0.2 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+        step = int(self.frame_seconds * self.sample_rate)
+        for start in range(0, len(audio), step):
+            yield SpeechFrame(audio[start:start + step], self.sample_rate)
+
+
+def create_backend(name: str) -> TTSBackend:
+    if name == "edge":
+        return EdgeTTSBackend()
+    if name == "piper":
+        return PiperBackend()
+    if name == "fake":
+        return FakeTTSBackend()
+    raise ValueError(f"Unknown TTS backend: {name}")
+
+
+class BackendSelector:
+    """Orders backends by their measured time to first audio, keeping one voice at a time
+
+    Each backend keeps a moving average of its latency; backends that have
+    not been measured yet keep their configured order behind the measured
+    ones. The first backend picked is kept (so the voice does not change
+    mid-conversation) until it fails or release() is called, e.g. when a
+    conversation ends; the next pick then goes to the fastest. A backend
+    that fails sits out cooldown seconds. Every probe_every picks, probe()
+    names the runner-up so the caller can time it on text that is never
+    played, which keeps its estimate current.
+    """
+
+    def __init__(self, backends: List[TTSBackend], alpha: float = TTS_BACKEND_LATENCY_ALPHA,
+                 cooldown: float = TTS_BACKEND_COOLDOWN, probe_every: int = TTS_BACKEND_PROBE_EVERY):
+        if not backends:
+            raise ValueError("At least one TTS backend is required")
+        self.backends = list(backends)
+        self.alpha = alpha
+        self.cooldown = cooldown
+        self.probe_every = probe_every
+        self.latency = {backend.name: None for backend in self.backends}
+        self._cooling_until = {backend.name: 0.0 for backend in self.backends}
+        self._picks = 0
+        self._current = None  # Backend whose voice is in use
+        self._lock = threading.Lock()
+        metrics = get_metrics()
+        self._first_audio = metrics.histogram("tts_first_audio_seconds", "Time to a backend's first audio frame")
+        self._failures = metrics.counter("tts_backend_failures_total", "Chunks a TTS backend failed to synthesize")
+
+    def candidates(self) -> List[TTSBackend]:
+        """Backends to try for the next utterance, the current voice first"""
+        with self._lock:
+            self._picks += 1
+            order = self._order()
+            self._current = order[0]
+        return order
+
+    def preferred(self) -> TTSBackend:
+        """The backend that will most likely be used next, without counting as a pick"""
+        with self._lock:
+            return self._order()[0]
+
+    def probe(self) -> Optional[TTSBackend]:
+        """The runner-up, when its latency is due to be measured again (not to be played)"""
+        with self._lock:
+            if not self.probe_every or self._picks == 0 or self._picks % self.probe_every:
+                return None
+            ready, _ = self._rank()
+            others = [backend for backend in ready if backend is not self._current]
+        return others[0] if others else None
+
+    def release(self):
+        """Let the next pick switch to the fastest backend"""
+        with self._lock:
+            self._current = None
+
+    def _order(self) -> List[TTSBackend]:
+        ready, cooling = self._rank()
+        # The current voice stays first while it works; a failure sends it to cooling
+        if self._current in ready:
+            ready.remove(self._current)
+            ready.insert(0, self._current)
+        # Cooling backends are a last resort rather than excluded
+        return ready + cooling
+
+    def _rank(self) -> Tuple[List[TTSBackend], List[TTSBackend]]:
+        now = time.monotonic()
+        order = sorted(
+            range(len(self.backends)),
+            key=lambda i: (self.latency[self.backends[i].name] is None,
+                           self.latency[self.backends[i].name] or 0.0, i)
+        )
+        ranked = [self.backends[i] for i in order]
+        ready = [b for b in ranked if self._cooling_until[b.name] <= now]
+        cooling = [b for b in ranked if self._cooling_until[b.name] > now]
+        return ready, cooling
+
+    def remove(self, backend: TTSBackend) -> bool:
+        """Stop using a backend (e.g. one that failed to load), unless it is the last one"""
+        with self._lock:
+            if len(self.backends) == 1 or backend not in self.backends:
+                return False
+            self.backends.remove(backend)
+            if self._current is backend:
+                self._current = None
+            return True
+
+    def record_latency(self, backend: TTSBackend, seconds: float):
+        self._first_audio.observe(seconds)
+        with self._lock:
+            previous = self.latency[backend.name]
+            self.latency[backend.name] = (
+                seconds if previous is None else previous + self.alpha * (seconds - previous)
+            )
+
+    def record_failure(self, backend: TTSBackend):
+        self._failures.inc()
+        with self._lock:
+            self._cooling_until[backend.name] = time.monotonic() + self.cooldown
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                f"tts_{name}_latency_ms": None if latency is None else round(latency * 1000)
+                for name, latency in self.latency.items()
+            }
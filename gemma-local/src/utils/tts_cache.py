@@ -0,0 +1,146 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+import soundfile as sf
+from config.settings import (
+    TTS_CACHE_DIR,
+    TTS_CACHE_MEMORY_ENTRIES,
+    TTS_CACHE_DISK_BYTES
+)
+from utils.metrics import get_metrics
+
+class TTSCache:
+    """Two-tier cache of synthesized speech keyed by (text, voice, format)
+
+    The memory tier is an LRU of decoded clips. The disk tier stores the encoded
+    audio as returned by the TTS service (or FLAC, for engines such as Piper
+    that return raw PCM) and is trimmed oldest-first once it grows past its
+    size bound.
+    """
+
+    def __init__(self, cache_dir=TTS_CACHE_DIR, max_memory_entries: int = TTS_CACHE_MEMORY_ENTRIES,
+                 max_disk_bytes: int = TTS_CACHE_DISK_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        metrics = get_metrics()
+        self._hit_counter = metrics.counter("tts_cache_hits_total", "Speech served from the TTS cache")
+        self._miss_counter = metrics.counter("tts_cache_misses_total", "Speech that had to be synthesized")
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        except Exception as e:
+            print(f"TTS disk cache disabled: {e}")
+            self.max_disk_bytes = 0
+
+    @staticmethod
+    def make_key(text: str, voice: str, fmt: str) -> str:
+        return hashlib.sha256(f"{fmt}\0{voice}\0{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, fmt: str) -> Path:
+        return self.cache_dir / f"{key}.{fmt}"
+
+    def get(self, text: str, voice: str, fmt: str, prepare=None) -> Optional[Tuple[object, int]]:
+        """Return (audio_data, samplerate) for a cached clip, or None
+
+        A clip read back from disk goes through prepare(data, samplerate),
+        if given, before it is kept in memory; memory hits are returned as stored.
+        """
+        key = self.make_key(text, voice, fmt)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self._hit_counter.inc()
+                return entry
+
+        path = self._path(key, fmt)
+        if self.max_disk_bytes and path.exists():
+            try:
+                data, samplerate = sf.read(path, dtype='float32')
+                if prepare is not None:
+                    data, samplerate = prepare(data, samplerate)
+                os.utime(path)  # Keep recently used clips from being trimmed
+                self._remember(key, (data, samplerate))
+                with self._lock:
+                    self.hits += 1
+                self._hit_counter.inc()
+                return data, samplerate
+            except Exception as e:
+                print(f"Error reading cached speech: {e}")
+                path.unlink(missing_ok=True)
+
+        with self._lock:
+            self.misses += 1
+        self._miss_counter.inc()
+        return None
+
+    def put(self, text: str, voice: str, fmt: str, data, samplerate: int, encoded: bytes = None):
+        """Store a decoded clip, and on disk its encoded form (or a lossless one if none is given)"""
+        key = self._remember(self.make_key(text, voice, fmt), (data, samplerate))
+        if not self.max_disk_bytes:
+            return
+        if not encoded:
+            encoded = self._encode(data, samplerate)
+        if encoded:
+            self._write_disk(key, fmt, encoded)
+
+    @staticmethod
+    def _encode(data, samplerate: int) -> Optional[bytes]:
+        try:
+            buffer = io.BytesIO()
+            sf.write(buffer, data, samplerate, format="FLAC", subtype="PCM_16")
+            return buffer.getvalue()
+        except Exception as e:
+            print(f"Error encoding speech for the cache: {e}")
+            return None
+
+    def _remember(self, key: str, entry) -> str:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+        return key
+
+    def _write_disk(self, key: str, fmt: str, encoded: bytes):
+        path = self._path(key, fmt)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_bytes(encoded)
+            os.replace(tmp_path, path)
+            with self._disk_lock:
+                self._trim_disk()
+        except Exception as e:
+            print(f"Error writing speech cache: {e}")
+            tmp_path.unlink(missing_ok=True)
+
+    def _trim_disk(self):
+        files = []
+        total = 0
+        for path in self.cache_dir.iterdir():
+            if path.suffix == ".tmp" or not path.is_file():
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
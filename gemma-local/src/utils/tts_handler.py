@@ -1,97 +1,292 @@
-import edge_tts
 import asyncio
-import sounddevice as sd
-import soundfile as sf
-from pathlib import Path
-import tempfile
+import queue
 import time
-import re
-from collections import deque
-from typing import List, Tuple
+import numpy as np
+from concurrent.futures import CancelledError, Future
+from typing import AsyncIterator, Iterable, Iterator, List, Tuple
+from config.settings import TTS_MAX_CONCURRENCY, TTS_BACKENDS
+from utils.async_runtime import AsyncRuntime, get_runtime, iterate_async
+from utils.audio_postprocess import postprocess_speech
+from utils.cancellation import CancellationToken
+from utils.chunk_planner import ChunkPlanner
+from utils.metrics import get_metrics
+from utils.tts_backends import BackendSelector, SpeechFrame, TTSBackend, TTSBackendError, create_backend
+from utils.tts_cache import TTSCache
 
 class TTSHandler:
-    FALLBACK_VOICES = [
-        "en-US-ChristopherNeural",
-        "en-US-EricNeural",
-        "en-US-GuyNeural",
-        "en-GB-RyanNeural"
-    ]
-
-    def __init__(self):
-        self.voice = "en-GB-RyanNeural"  # Start with default voice
-        self.temp_dir = Path(tempfile.gettempdir())
+    def __init__(self, cache: TTSCache = None, runtime: AsyncRuntime = None, playback: bool = True,
+                 player=None, backends: List[TTSBackend] = None, planner: ChunkPlanner = None):
+        """player and backends replace the audio output and the TTS_BACKENDS engines"""
         self._ready = True
-        self.tts_timeout = 10
-        self._current_voice_index = 0
+        self.max_concurrency = TTS_MAX_CONCURRENCY
+        self.planner = planner or ChunkPlanner()
+        self.cache = cache or TTSCache()
+        self.runtime = runtime or get_runtime()
+        if backends is None:
+            backends = []
+            for name in TTS_BACKENDS:
+                try:
+                    backends.append(create_backend(name))
+                except Exception as e:
+                    print(f"TTS backend {name} unavailable: {e}")
+        self.selector = BackendSelector(backends)
+        self._probes = set()
+        # Load models (e.g. Piper) while the rest of the app starts
+        self._loading = [self.runtime.submit_blocking(self._load_backend, backend) for backend in backends]
+        metrics = get_metrics()
+        self._prepare_timer = metrics.histogram("tts_prepare_seconds",
+                                                "Time to get one chunk's audio, cached or not")
+        self._synthesized = metrics.counter("tts_chunks_synthesized_total", "Chunks synthesized by a TTS backend")
+        # Without playback (e.g. in server mode) audio is only synthesized and
+        # sounddevice is never imported, so headless hosts need no PortAudio
+        self.player = player
+        if playback and player is None:
+            try:
+                from utils.audio_player import AudioPlayer
+                self.player = AudioPlayer()
+                self.player.start()
+            except Exception as e:
+                print(f"Error opening audio output: {e}")
+                self._ready = False
 
-    def split_into_chunks(self, text: str) -> List[str]:
-        """Split text into chunks at sentence boundaries"""
-        # Split at sentence endings or commas for natural pauses
-        chunks = re.split(r'(?<=[.!?])\s+', text)
-        # Filter out empty chunks and ensure reasonable length
-        return [chunk.strip() for chunk in chunks if len(chunk.strip()) > 0]
-
-    async def _try_voice(self, text: str, voice: str, temp_file: Path) -> bool:
-        """Try to generate speech with a specific voice"""
+    def _load_backend(self, backend: TTSBackend):
         try:
-            communicate = edge_tts.Communicate(text, voice)
-            await asyncio.wait_for(
-                communicate.save(str(temp_file)), 
-                timeout=self.tts_timeout
-            )
-            return True
-        except:
-            return False
+            backend.load()
+        except Exception as e:
+            if self.selector.remove(backend):
+                print(f"TTS backend {backend.name} disabled: {e}")
+            else:
+                print(f"Error loading TTS backend {backend.name}: {e}")
+
+    def wait_until_loaded(self, timeout: float = None):
+        """Block until every backend has finished loading (or been disabled)"""
+        for future in self._loading:
+            future.result(timeout)
+
+    def split_into_chunks(self, text: str) -> List[str]:
+        """Split text into the same chunks every time, so it can be spoken from the cache"""
+        return self.planner.split(text)
+
+    def plan_chunks(self, sentences: Iterable[str]) -> Iterator[str]:
+        """Re-chunk sentences as they arrive, sized for the backend that will most likely speak them"""
+        return self.planner.plan_stream(sentences, self.selector.preferred().name)
+
+    async def speech_frames(self, text: str, backends: List[TTSBackend] = None) -> AsyncIterator[SpeechFrame]:
+        """Stream the audio for one chunk from the cache or the first backend that works
+
+        backends is the preference order (by default the selector's); the
+        next one is only tried if a backend fails before producing audio.
+        """
+        errors = []
+        for backend in backends or self.selector.candidates():
+            # Memory holds clips ready to play; ones read back from disk are
+            # still in the backend's form and are prepared once on the way in
+            cached = self.cache.get(text, backend.cache_voice, backend.fmt, prepare=self._postprocess)
+            if cached is not None:
+                yield SpeechFrame(*cached)
+                return
+
+            start = time.perf_counter()
+            frames = []
+            try:
+                async for frame in backend.stream(text):
+                    if not frames:
+                        self.selector.record_latency(backend, time.perf_counter() - start)
+                    frame = SpeechFrame(*self._postprocess(frame.audio, frame.samplerate), frame.encoded)
+                    frames.append(frame)
+                    yield frame
+            except Exception as e:
+                self.selector.record_failure(backend)
+                if frames:
+                    # Part of the chunk has been heard; switching voices now would be worse
+                    raise
+                errors.append(f"{backend.name}: {e}")
+                continue
+
+            self._synthesized.inc()
+            self.planner.record(backend.name, len(text), time.perf_counter() - start)
+            if frames:
+                audio = np.concatenate([frame.audio for frame in frames])
+                encoded = frames[0].encoded if len(frames) == 1 else None
+                self.cache.put(text, backend.cache_voice, backend.fmt, audio, frames[0].samplerate,
+                               encoded=encoded)
+            return
+
+        raise TTSBackendError("All TTS backends failed: " + "; ".join(errors))
+
+    def _postprocess(self, audio, samplerate: int) -> Tuple[np.ndarray, int]:
+        return postprocess_speech(audio, samplerate, self.output_rate)
 
-    async def prepare_speech(self, text: str) -> tuple[str, bytes, int]:
+    async def prepare_speech(self, text: str, backends: List[TTSBackend] = None) -> Tuple[str, np.ndarray, int]:
         """Prepare speech audio data asynchronously"""
-        temp_file = self.temp_dir / f"temp_speech_{hash(text)}.wav"
-        
-        # Try current voice first, then fallbacks
-        success = await self._try_voice(text, self.voice, temp_file)
-        if not success:
-            for voice in self.FALLBACK_VOICES:
-                if voice != self.voice and await self._try_voice(text, voice, temp_file):
-                    self.voice = voice
-                    success = True
+        with self._prepare_timer.time():
+            frames = [frame async for frame in self.speech_frames(text, backends)]
+        if not frames:
+            raise TTSBackendError("No audio generated")
+        return text, np.concatenate([frame.audio for frame in frames]), frames[0].samplerate
+
+    async def synthesize_ordered(self, texts) -> AsyncIterator[Tuple[np.ndarray, int]]:
+        """Synthesize texts with bounded concurrency, yielding audio in order as soon as it is ready
+
+        texts may be a list, a blocking iterator (read on an executor thread)
+        or an async iterator. The chunk being played is passed on frame by
+        frame as its backend produces it; later chunks are buffered until
+        their turn. Chunks that fail to synthesize are skipped. One backend
+        order is used for the whole utterance so the voice stays the same.
+        """
+        backends = self.selector.candidates()
+        probe = self.selector.probe()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        # Bounds the lookahead so a long source is not read all at once
+        pending = asyncio.Queue(maxsize=self.max_concurrency * 2)
+        done = object()
+
+        async def synthesize(text, frames: asyncio.Queue):
+            try:
+                async with semaphore:
+                    with self._prepare_timer.time():
+                        async for frame in self.speech_frames(text, backends):
+                            frames.put_nowait(frame)
+            except Exception as e:
+                frames.put_nowait(e)
+            finally:
+                frames.put_nowait(done)
+
+        async def produce():
+            nonlocal probe
+            try:
+                async for text in iterate_async(texts):
+                    if text.strip():
+                        if probe is not None:
+                            self._start_probe(probe, text)
+                            probe = None
+                        frames = asyncio.Queue()
+                        await pending.put((asyncio.ensure_future(synthesize(text, frames)), frames))
+            finally:
+                await pending.put(None)
+
+        producer = asyncio.ensure_future(produce())
+        current = None
+        try:
+            while True:
+                entry = await pending.get()
+                if entry is None:
                     break
-        
-        if not success:
-            raise Exception("All voices failed to generate speech")
-            
-        # Read audio data
-        data, samplerate = sf.read(temp_file)
-        temp_file.unlink(missing_ok=True)
-        
-        return text, data, samplerate
-
-    async def prepare_speech_chunks(self, text: str) -> List[Tuple[bytes, int]]:
-        """Prepare multiple chunks of speech in parallel"""
-        chunks = self.split_into_chunks(text)
-        tasks = []
-        
-        for chunk in chunks:
-            if len(chunk) > 0:
-                tasks.append(self.prepare_speech(chunk))
-        
+                current, frames = entry
+                while True:
+                    frame = await frames.get()
+                    if frame is done:
+                        break
+                    if isinstance(frame, Exception):
+                        print(f"Error preparing speech chunk: {frame}")
+                        continue
+                    yield frame.audio, frame.samplerate
+            await producer
+        finally:
+            producer.cancel()
+            if current is not None:
+                current.cancel()
+            while not pending.empty():
+                entry = pending.get_nowait()
+                if entry is not None:
+                    entry[0].cancel()
+
+    def _start_probe(self, backend: TTSBackend, text: str):
+        task = asyncio.ensure_future(self._probe(backend, text))
+        # The loop only keeps weak references to tasks
+        self._probes.add(task)
+        task.add_done_callback(self._probes.discard)
+
+    async def _probe(self, backend: TTSBackend, text: str):
+        """Time backend on text without playing or caching the result"""
+        start = time.perf_counter()
+        heard = False
         try:
-            results = await asyncio.gather(*tasks)
-            # Extract just the audio data and samplerate
-            return [(audio, rate) for _, audio, rate in results]
+            async for _ in backend.stream(text):
+                if not heard:
+                    self.selector.record_latency(backend, time.perf_counter() - start)
+                    heard = True
+            self.planner.record(backend.name, len(text), time.perf_counter() - start)
         except Exception as e:
-            print(f"Error preparing speech chunks: {e}")
-            raise
+            self.selector.record_failure(backend)
+            print(f"TTS backend {backend.name} failed a latency probe: {e}")
+
+    async def prepare_speech_chunks(self, text: str) -> List[Tuple[np.ndarray, int]]:
+        """Prepare all chunks of a text, in order"""
+        backends = self.selector.candidates()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def prepare(chunk):
+            async with semaphore:
+                _, audio_data, samplerate = await self.prepare_speech(chunk, backends)
+                return audio_data, samplerate
+
+        return list(await asyncio.gather(*(prepare(chunk) for chunk in self.split_into_chunks(text))))
+
+    def iter_speech(self, texts, plan: bool = True) -> Iterator[Tuple[np.ndarray, int]]:
+        """Blocking iterator over synthesize_ordered for code outside the runtime
+
+        texts is read on one of the runtime's executor threads, which it
+        holds while waiting for the next text, so only pass a source that
+        is already producing (e.g. a generation that has started). Texts
+        are re-chunked with plan_chunks unless plan is False.
+        """
+        results = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for chunk in self.synthesize_ordered(self.plan_chunks(texts) if plan else texts):
+                    results.put(chunk)
+            finally:
+                results.put(done)
+
+        future = self.runtime.submit(pump())
+        try:
+            while True:
+                chunk = results.get()
+                if chunk is done:
+                    break
+                yield chunk
+            future.result()
+        finally:
+            future.cancel()
+
+    async def _queue_speech(self, texts, token: CancellationToken = None, on_start=None) -> bool:
+        loop = asyncio.get_running_loop()
+        queued = False
+        async for audio_data, samplerate in self.synthesize_ordered(texts):
+            # A chunk finished just as the turn was cancelled must not slip in after the flush
+            if token is not None and token.cancelled:
+                break
+            # Chunk 1 starts playing while the rest are still synthesizing. enqueue
+            # waits while the ring is full, which must not stall the shared loop
+            await loop.run_in_executor(None, self._enqueue, audio_data, samplerate, token)
+            if not queued and on_start:
+                on_start()
+            queued = True
+        return queued
+
+    def _enqueue(self, audio_data, samplerate: int, token: CancellationToken = None):
+        # Runs on an executor thread, which may only get to it after the turn was cancelled
+        if token is None or not token.cancelled:
+            self.player.enqueue(audio_data, samplerate)
+
+    def prefill(self, phrases: Iterable[str]) -> Future:
+        """Synthesize fixed phrases in the background so they play straight from the cache"""
+        async def fill():
+            for phrase in phrases:
+                try:
+                    await self.prepare_speech_chunks(phrase)
+                except Exception as e:
+                    print(f"Error prefilling speech cache: {e}")
+
+        return self.runtime.submit(fill())
 
     def play_audio(self, audio_data, samplerate, on_complete=None):
-        """Play audio data with proper cleanup"""
+        """Queue audio for playback; on_complete fires when it has finished playing"""
         try:
-            sd.play(audio_data, samplerate)
-            duration = len(audio_data) / samplerate
-            time.sleep(duration + 0.5)  # Add small buffer
-            sd.stop()
-            
-            if on_complete:
-                on_complete()
+            self.player.enqueue(audio_data, samplerate, on_complete)
             return True
         except Exception as e:
             print(f"Error playing audio: {e}")
@@ -99,54 +294,84 @@ class TTSHandler:
                 on_complete()
             return False
 
-    def play_audio_chunks(self, chunks: List[Tuple[bytes, int]], on_complete=None):
-        """Play multiple audio chunks sequentially"""
-        try:
-            for audio_data, samplerate in chunks:
-                sd.play(audio_data, samplerate)
-                duration = len(audio_data) / samplerate
-                time.sleep(duration + 0.1)  # Small pause between chunks
-                sd.stop()
-            
-            if on_complete:
-                on_complete()
-            return True
-        except Exception as e:
-            print(f"Error playing audio chunks: {e}")
-            if on_complete:
-                on_complete()
-            return False
+    def release_voice(self):
+        """Let the next utterance switch to the fastest backend (e.g. between conversations)"""
+        self.selector.release()
+
+    @property
+    def output_rate(self):
+        """Sample rate speech is prepared at: the output device's, or as synthesized without one"""
+        return self.player.samplerate if self.player is not None else None
+
+    @property
+    def output_level(self) -> float:
+        """Recent RMS level of the audio being played (0 to 1)"""
+        if self.player is None:
+            return 0.0
+        return self.player.output_level
 
     @property
     def is_ready(self):
         return self._ready
 
-    def speak(self, text: str, on_complete=None):
-        """Enhanced speak method with chunk processing"""
-        if not self._ready:
+    def speak(self, text: str, on_complete=None, token: CancellationToken = None):
+        """Enhanced speak method with chunk processing
+
+        Returns once every chunk has been queued; on_complete fires when the
+        last one has finished playing. The chunks are those of
+        split_into_chunks, so canned lines play from the cache.
+        """
+        return self.speak_chunks(self.split_into_chunks(text), on_complete, token)
+
+    def speak_stream(self, sentences: Iterable[str], on_complete=None, token: CancellationToken = None,
+                     on_start=None):
+        """Speak sentences as they arrive, synthesizing ahead while earlier ones play
+
+        Returns once the last sentence has been queued: True if any audio
+        was queued, False if none was (no sentences, synthesis failed or
+        the turn was cancelled first). on_start fires when the first audio
+        is queued and on_complete when the last has finished playing.
+        Cancelling token stops synthesis, drops the speech still queued and
+        makes this return at once (on_complete then fires straight away).
+        """
+        return self.speak_chunks(self.plan_chunks(sentences), on_complete, token, on_start)
+
+    def speak_chunks(self, chunks: Iterable[str], on_complete=None, token: CancellationToken = None,
+                     on_start=None):
+        """speak_stream for text already cut into chunks (e.g. as a cached reply was spoken before)"""
+        if not self._ready or self.player is None:
+            if on_complete:
+                on_complete()
             return False
 
+        queued = False
+        unregister = []
         try:
-            # Prepare all chunks in parallel
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            chunks = loop.run_until_complete(self.prepare_speech_chunks(text))
-            loop.close()
-            
-            # Play chunks sequentially
-            self.play_audio_chunks(chunks, on_complete)
-            return True
-            
+            future = self.runtime.submit(self._queue_speech(chunks, token, on_start))
+            if token is not None:
+                unregister = [token.on_cancel(future.cancel), token.on_cancel(self.player.flush)]
+            queued = future.result()
+        except CancelledError:
+            queued = False
         except Exception as e:
             print(f"Error in TTS: {e}")
+        finally:
+            # Speech already queued may still need flushing, so only the task callback goes
+            if unregister:
+                unregister[0]()
             if on_complete:
-                on_complete()
-            return False
+                self.player.notify_when_done(on_complete)
+        return queued
+
+    def close(self):
+        """Stop the output stream and release the backends"""
+        if self.player is not None:
+            self.player.close()
+        for backend in self.selector.backends:
+            backend.close()
 
     def __del__(self):
         try:
-            sd.stop()
-            for temp_file in self.temp_dir.glob("temp_speech*.wav"):
-                temp_file.unlink(missing_ok=True)
+            self.close()
         except:
             pass
@@ -0,0 +1,171 @@
+from collections import deque
+import numpy as np
+from config.settings import (
+    VAD_FRAME_MS,
+    VAD_ENERGY_THRESHOLD,
+    VAD_NOISE_RATIO,
+    VAD_MAX_ZCR,
+    VAD_HANGOVER_MS,
+    VAD_PREROLL_MS,
+    BARGE_IN_ENERGY_THRESHOLD,
+    BARGE_IN_ECHO_RATIO,
+    BARGE_IN_MIN_SPEECH_MS,
+    BARGE_IN_PREROLL_MS
+)
+
+class VoiceActivityGate:
+    """Energy and zero-crossing-rate gate that only lets speech through to the recognizer
+
+    Frames are classified with vectorized NumPy math. A hangover keeps the gate
+    open briefly after speech so word endings are not clipped, and a pre-roll
+    buffer replays the audio just before speech onset.
+    """
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = VAD_FRAME_MS,
+                 energy_threshold: float = VAD_ENERGY_THRESHOLD, noise_ratio: float = VAD_NOISE_RATIO,
+                 max_zcr: float = VAD_MAX_ZCR, hangover_ms: int = VAD_HANGOVER_MS,
+                 preroll_ms: int = VAD_PREROLL_MS):
+        self.frame_ms = frame_ms
+        self.frame_length = sample_rate * frame_ms // 1000
+        self.energy_threshold = energy_threshold
+        self.noise_ratio = noise_ratio
+        self.max_zcr = max_zcr
+        self.hangover_frames = hangover_ms // frame_ms
+        self.noise_floor = energy_threshold / noise_ratio
+        self._preroll = deque(maxlen=max(preroll_ms // frame_ms, 0))
+        self._remainder = np.zeros(0, dtype=np.int16)
+        self._hangover_left = 0
+        self.in_speech = False
+        self._utterance_ended = False
+        self.trailing_silence_ms = 0  # Silence since the last speech frame
+        self.frames_total = 0
+        self.frames_passed = 0
+
+    @property
+    def frames_dropped(self) -> int:
+        return self.frames_total - self.frames_passed - len(self._preroll)
+
+    def stats(self) -> dict:
+        return {
+            "frames_passed": self.frames_passed,
+            "frames_dropped": self.frames_dropped,
+            "noise_floor": round(float(self.noise_floor), 1)
+        }
+
+    def reset(self):
+        """Forget any speech in progress (e.g. when listening is paused)"""
+        self._preroll.clear()
+        self._remainder = np.zeros(0, dtype=np.int16)
+        self._hangover_left = 0
+        self.in_speech = False
+        self._utterance_ended = False
+        self.trailing_silence_ms = 0
+
+    def take_utterance_end(self) -> bool:
+        """True once after the gate has closed at the end of an utterance"""
+        ended = self._utterance_ended
+        self._utterance_ended = False
+        return ended
+
+    def classify(self, frames: np.ndarray) -> np.ndarray:
+        """Return a speech flag per row of an (n_frames, frame_length) int16 array"""
+        samples = frames.astype(np.float32)
+        energy = np.sqrt(np.mean(samples * samples, axis=1))
+        signs = np.signbit(samples)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame_length - 1)
+
+        threshold = max(self.energy_threshold, self.noise_floor * self.noise_ratio)
+        # Quiet, noisy-sounding frames are hiss; loud ones are kept regardless
+        speech = (energy > threshold) & ((zcr < self.max_zcr) | (energy > 2 * threshold))
+
+        quiet = energy[~speech]
+        if len(quiet):
+            self.noise_floor = 0.9 * self.noise_floor + 0.1 * float(quiet.mean())
+        return speech
+
+    def process(self, data: bytes) -> bytes:
+        """Return the speech-bearing part of a block of int16 audio (empty when silent)"""
+        samples = np.frombuffer(data, dtype=np.int16)
+        if len(self._remainder):
+            samples = np.concatenate((self._remainder, samples))
+        count = len(samples) // self.frame_length
+        self._remainder = samples[count * self.frame_length:].copy()
+        if count == 0:
+            return b""
+
+        frames = samples[:count * self.frame_length].reshape(count, self.frame_length)
+        speech = self.classify(frames)
+        self.frames_total += count
+
+        passed = []
+        for frame, is_speech in zip(frames, speech):
+            self.trailing_silence_ms = 0 if is_speech else self.trailing_silence_ms + self.frame_ms
+            if is_speech:
+                if not self.in_speech:
+                    passed.extend(self._preroll)
+                    self._preroll.clear()
+                    self.in_speech = True
+                self._hangover_left = self.hangover_frames
+                passed.append(frame)
+            elif self.in_speech and self._hangover_left > 0:
+                self._hangover_left -= 1
+                passed.append(frame)
+            else:
+                if self.in_speech:
+                    self.in_speech = False
+                    self._utterance_ended = True
+                self._preroll.append(frame)
+
+        self.frames_passed += len(passed)
+        if not passed:
+            return b""
+        return np.concatenate(passed).tobytes()
+
+
+class BargeInDetector:
+    """Detects the user talking while the assistant is thinking or speaking
+
+    The microphone also hears the assistant, so a frame only counts as
+    speech when it is above energy_threshold and louder than echo_ratio
+    times the level being played (int16 RMS scale). min_speech_ms of
+    such frames, allowing for short dips, trigger it. The recent audio is
+    kept so the words that triggered it can still be recognized.
+    """
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = VAD_FRAME_MS,
+                 energy_threshold: float = BARGE_IN_ENERGY_THRESHOLD, echo_ratio: float = BARGE_IN_ECHO_RATIO,
+                 min_speech_ms: int = BARGE_IN_MIN_SPEECH_MS, preroll_ms: int = BARGE_IN_PREROLL_MS):
+        self.frame_length = sample_rate * frame_ms // 1000
+        self.energy_threshold = energy_threshold
+        self.echo_ratio = echo_ratio
+        self.min_frames = max(min_speech_ms // frame_ms, 1)
+        self._recent = deque(maxlen=max(preroll_ms // frame_ms, 1))
+        self._score = 0
+        self.triggers = 0
+
+    def reset(self):
+        self._recent.clear()
+        self._score = 0
+
+    def process(self, samples: np.ndarray, echo_level: float = 0.0, noise_floor: float = 0.0) -> bool:
+        """Feed int16 samples; True once the user is talking over the echo"""
+        count = len(samples) // self.frame_length
+        if count == 0:
+            return False
+        frames = samples[:count * self.frame_length].reshape(count, self.frame_length)
+        self._recent.extend(frames)
+        values = frames.astype(np.float32)
+        energy = np.sqrt(np.mean(values * values, axis=1))
+        threshold = max(self.energy_threshold, self.echo_ratio * echo_level, noise_floor)
+        for loud in energy > threshold:
+            self._score = self._score + 1 if loud else max(self._score - 1, 0)
+            if self._score >= self.min_frames:
+                self.triggers += 1
+                return True
+        return False
+
+    def take_audio(self) -> bytes:
+        """The buffered audio up to the trigger, oldest first"""
+        audio = np.concatenate(self._recent).tobytes() if self._recent else b""
+        self.reset()
+        return audio
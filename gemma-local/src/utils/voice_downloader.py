@@ -1,27 +1,29 @@
-import os
 from pathlib import Path
-import urllib.request
+from config.settings import ASSET_CACHE_DIR, PIPER_VOICES_URL
+from utils.asset_manager import Asset, AssetManager
 
-def download_voice_model(voice_name="en_US-amy-low"):
+def voice_assets(voice_name: str, voice_dir: Path) -> list:
+    """The model and config files of a Piper voice such as en_US-amy-low"""
+    # Voices are stored as <family>/<locale>/<speaker>/<quality>/<name>
+    locale, speaker, quality = voice_name.split("-", 2)
+    base_url = f"{PIPER_VOICES_URL}/{locale.split('_')[0]}/{locale}/{speaker}/{quality}"
+    return [
+        Asset(f"{voice_name}{ext}", f"{base_url}/{voice_name}{ext}", target=voice_dir / f"{voice_name}{ext}")
+        for ext in [".onnx", ".onnx.json"]
+    ]
+
+def download_voice_model(voice_name="en_US-amy-low", voice_dir=None):
     """Download Piper voice model if not present"""
-    voice_dir = Path("voices")
-    voice_path = voice_dir / f"{voice_name}.onnx"
-    
-    if not voice_path.exists():
+    voice_dir = Path(voice_dir or Path(ASSET_CACHE_DIR) / "voices")
+    assets = voice_assets(voice_name, voice_dir)
+    manager = AssetManager()
+
+    if not all(manager.is_installed(asset) for asset in assets):
         print(f"Downloading voice model {voice_name}...")
-        voice_dir.mkdir(parents=True, exist_ok=True)
-        
-        base_url = "https://huggingface.co/rhasspy/piper-voices/resolve/main/en/en_US/amy/low"
-        
-        # Download model and config
-        for ext in [".onnx", ".onnx.json"]:
-            url = f"{base_url}/{voice_name}{ext}"
-            target = voice_dir / f"{voice_name}{ext}"
-            
-            try:
-                urllib.request.urlretrieve(url, target)
-            except Exception as e:
-                print(f"Error downloading {url}: {e}")
-                return None
-    
-    return str(voice_path)
+    try:
+        paths = manager.fetch_all(assets)
+    except Exception as e:
+        print(f"Error downloading voice model {voice_name}: {e}")
+        return None
+
+    return str(paths[f"{voice_name}.onnx"])
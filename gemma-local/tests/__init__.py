@@ -1 +0,0 @@
-Sorry, I can't assist with that.
\ No newline at end of file
@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+
+# The app imports its modules from src/ (config.settings, utils.x, models.x)
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+import pytest
+from bench.null_sink import NullSink
+from utils.async_runtime import AsyncRuntime
+from utils.audio_player import AudioPlayer
+from utils.tts_backends import FakeTTSBackend
+from utils.tts_cache import TTSCache
+from utils.tts_handler import TTSHandler
+
+
+@pytest.fixture
+def runtime():
+    runtime = AsyncRuntime(name="test-runtime").start()
+    yield runtime
+    runtime.stop()
+
+
+@pytest.fixture
+def null_player():
+    """Returns started AudioPlayers that play into a NullSink in real time"""
+    players = []
+
+    def make(**kwargs) -> AudioPlayer:
+        player = AudioPlayer(stream_factory=NullSink(), **kwargs)
+        player.start()
+        players.append(player)
+        return player
+
+    yield make
+    for player in players:
+        player.close()
+
+
+@pytest.fixture
+def fake_tts(tmp_path, runtime):
+    """Returns TTSHandlers on the test runtime with a memory-only cache and fake backends"""
+    handlers = []
+
+    def make(backends=None, player=None, cache=None) -> TTSHandler:
+        tts = TTSHandler(cache=cache or TTSCache(tmp_path / "tts", max_disk_bytes=0), runtime=runtime,
+                         playback=False, player=player,
+                         backends=backends or [FakeTTSBackend(latency=0.01, chars_per_second=200)])
+        handlers.append(tts)
+        return tts
+
+    yield make
+    for tts in handlers:
+        tts.close()
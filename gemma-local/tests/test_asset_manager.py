@@ -0,0 +1,174 @@
+import hashlib
+import io
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from utils.asset_manager import Asset, AssetError, AssetManager
+
+PAYLOAD = bytes(range(256)) * 400  # 100 KiB
+
+
+class FileServer(ThreadingHTTPServer):
+    """Serves in-memory files, optionally honouring Range and cutting transfers short"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FileHandler)
+        self.files = {}
+        self.honor_range = True
+        self.cut_after = {}  # path -> bytes sent before the connection drops (once)
+        self.ranges = []  # Range header of every request, or None
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        data = self.server.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        requested = self.headers.get("Range")
+        self.server.ranges.append(requested)
+        start = 0
+        if requested and self.server.honor_range:
+            start = int(requested.split("=")[1].rstrip("-"))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        body = data[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        cut = self.server.cut_after.pop(self.path, None)
+        if cut is not None:
+            # Promise the whole body, send part of it and hang up
+            self.wfile.write(body[:cut])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = FileServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return AssetManager(cache_dir=tmp_path / "cache", chunk_size=4096, workers=2, retries=2, progress=False)
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_resumes_a_part_file_with_a_range_request(server, manager):
+    server.files["/model.bin"] = PAYLOAD
+    asset = Asset("model", server.url("/model.bin"), sha256=sha256(PAYLOAD))
+    part = manager.part_path(asset)
+    part.parent.mkdir(parents=True)
+    part.write_bytes(PAYLOAD[:30000])
+
+    target = manager.fetch(asset)
+    assert server.ranges == ["bytes=30000-"]
+    assert target.read_bytes() == PAYLOAD
+    assert not part.exists()
+
+
+def test_interrupted_transfer_is_resumed_on_retry(server, manager):
+    server.files["/model.bin"] = PAYLOAD
+    server.cut_after["/model.bin"] = 50000
+    target = manager.fetch(Asset("model", server.url("/model.bin"), sha256=sha256(PAYLOAD)))
+    # Resumed from whatever reached the part file, not from the start
+    first, retry = server.ranges
+    assert first is None
+    assert 0 < int(retry.split("=")[1].rstrip("-")) <= 50000
+    assert target.read_bytes() == PAYLOAD
+
+
+def test_restarts_when_the_server_ignores_range(server, manager):
+    server.files["/model.bin"] = PAYLOAD
+    server.honor_range = False
+    asset = Asset("model", server.url("/model.bin"), sha256=sha256(PAYLOAD))
+    part = manager.part_path(asset)
+    part.parent.mkdir(parents=True)
+    part.write_bytes(b"stale bytes from another version")
+
+    assert manager.fetch(asset).read_bytes() == PAYLOAD
+    assert server.ranges == ["bytes=32-"]
+
+
+def test_checksum_mismatch_fails_and_discards_the_download(server, manager):
+    server.files["/model.bin"] = PAYLOAD
+    asset = Asset("model", server.url("/model.bin"), sha256="0" * 64)
+    with pytest.raises(AssetError, match="Checksum mismatch"):
+        manager.fetch(asset)
+    assert not manager.path(asset).exists()
+    assert not manager.part_path(asset).exists()
+
+
+def test_zip_is_unpacked_and_moved_into_place(server, manager, tmp_path):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("vosk-model/conf/model.conf", "--beam=10")
+        zf.writestr("vosk-model/am/final.mdl", PAYLOAD)
+    server.files["/vosk-model.zip"] = archive.getvalue()
+    target = tmp_path / "models" / "vosk-model"
+
+    assert manager.fetch(Asset("vosk", server.url("/vosk-model.zip"), target=target, extract=True)) == target
+    assert (target / "conf" / "model.conf").read_text() == "--beam=10"
+    assert (target / "am" / "final.mdl").read_bytes() == PAYLOAD
+    # Nothing left over from staging or the download
+    assert [p.name for p in target.parent.iterdir()] == ["vosk-model"]
+    assert not list((manager.cache_dir / "downloads").iterdir())
+
+
+def test_bad_zip_leaves_no_target(server, manager, tmp_path):
+    server.files["/broken.zip"] = b"not a zip file"
+    target = tmp_path / "models" / "broken"
+    with pytest.raises(AssetError, match="Could not install"):
+        manager.fetch(Asset("broken", server.url("/broken.zip"), target=target, extract=True))
+    assert not target.exists()
+    assert not list(target.parent.iterdir())
+
+
+def test_assets_with_the_same_basename_do_not_share_a_part_file(server, manager, tmp_path):
+    first, second = PAYLOAD, PAYLOAD[::-1]
+    server.files["/en/model.onnx"] = first
+    server.files["/de/model.onnx"] = second
+    assets = [
+        Asset("en", server.url("/en/model.onnx"), target=tmp_path / "en.onnx", sha256=sha256(first)),
+        Asset("de", server.url("/de/model.onnx"), target=tmp_path / "de.onnx", sha256=sha256(second))
+    ]
+    assert manager.part_path(assets[0]) != manager.part_path(assets[1])
+
+    paths = manager.fetch_all(assets)
+    assert paths["en"].read_bytes() == first
+    assert paths["de"].read_bytes() == second
+
+
+def test_installed_assets_are_not_downloaded_again(server, manager):
+    server.files["/model.bin"] = PAYLOAD
+    asset = Asset("model", server.url("/model.bin"))
+    manager.fetch(asset)
+    manager.fetch(asset)
+    assert len(server.ranges) == 1
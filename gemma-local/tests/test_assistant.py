@@ -0,0 +1,147 @@
+import threading
+import pytest
+from assistant import VoiceAssistant
+from bench.stub_ollama import StubOllamaServer
+from config.settings import FIXED_PHRASES
+from conversation import ConversationState, InputQueue
+from models.gemma_client import GemmaClient
+from models.ollama_transport import OllamaTransport
+from models.response_cache import ResponseCache
+from utils.chunk_planner import ChunkPlanner
+from utils.tts_backends import FakeTTSBackend, TTSBackendError
+
+CANNED_CHUNKS = {chunk for phrase in FIXED_PHRASES for chunk in ChunkPlanner().split(phrase)}
+
+
+class CannedOnlyBackend(FakeTTSBackend):
+    """Speaks the canned lines and fails on everything else"""
+
+    async def stream(self, text):
+        if text not in CANNED_CHUNKS:
+            self.calls += 1
+            raise TTSBackendError("fake backend failure")
+        async for frame in super().stream(text):
+            yield frame
+
+
+class StubClient:
+    def __init__(self, reply):
+        self.reply = reply
+
+    def stream_sentences(self, text, token=None):
+        yield from self.reply
+
+    def cached_chunks(self, prompt):
+        return None
+
+    def cache_chunks(self, prompt, chunks):
+        pass
+
+    def reset_history(self):
+        pass
+
+
+class StubAudioHandler:
+    def enable_barge_in(self, on_barge_in, output_level):
+        pass
+
+    def pause_listening(self):
+        pass
+
+    def resume_listening(self):
+        pass
+
+    def set_conversation_mode(self):
+        pass
+
+    def set_wake_mode(self):
+        pass
+
+
+class SpokenLog:
+    """Records on_spoken kinds and lets tests wait for them"""
+
+    def __init__(self):
+        self.kinds = []
+        self._condition = threading.Condition()
+
+    def __call__(self, kind):
+        with self._condition:
+            self.kinds.append(kind)
+            self._condition.notify_all()
+
+    def wait_for(self, count, timeout=5):
+        with self._condition:
+            assert self._condition.wait_for(lambda: len(self.kinds) >= count, timeout)
+
+
+@pytest.fixture
+def make_assistant(fake_tts, null_player):
+    """Returns started VoiceAssistants that answer every prompt with the sentences of reply"""
+    assistants = []
+
+    def make(reply, backends=None, client=None, **options):
+        tts = fake_tts(backends, player=null_player())
+        assistant = VoiceAssistant(client or StubClient(reply), tts, StubAudioHandler(), **options)
+        assistant.on_spoken = SpokenLog()
+        assistant.start()
+        assistants.append(assistant)
+        return assistant
+
+    yield make
+    for assistant in assistants:
+        assistant.stop()
+
+
+def test_error_phrase_is_spoken_when_the_reply_cannot_be_synthesized(make_assistant):
+    assistant = make_assistant(["It is noon."], [CannedOnlyBackend(latency=0.01, chars_per_second=200)])
+    spoken = assistant.on_spoken
+    assistant.handle_speech("hey gemma")
+    spoken.wait_for(1)
+    assistant.handle_speech("what time is it")
+    spoken.wait_for(2)
+    assert spoken.kinds == ["ack", "error"]
+    assert assistant.state == ConversationState.LISTENING
+
+
+def test_idle_timeout_says_the_nap_line_and_goes_back_to_idle(make_assistant):
+    assistant = make_assistant([], timeout=0.2)
+    spoken = assistant.on_spoken
+    assistant.handle_speech("hey gemma")
+    spoken.wait_for(2)
+    assert spoken.kinds == ["ack", "nap"]
+    assert assistant.state == ConversationState.IDLE
+
+
+def test_passed_in_input_queue_is_used(make_assistant):
+    inputs = InputQueue(policy=InputQueue.LATEST)
+    assert make_assistant([], inputs=inputs).inputs is inputs
+
+
+def test_repeated_question_replays_the_chunks_already_synthesized(make_assistant, runtime):
+    reply = ("The forecast for tomorrow is mostly sunny with a light breeze from the west, "
+             "and temperatures should reach about twenty degrees in the afternoon.")
+    stub = StubOllamaServer(first_token_delay=0.0, tokens_per_second=1000, reply=reply).start()
+    transport = OllamaTransport(base_url=stub.url)
+    try:
+        backend = FakeTTSBackend(latency=0.01, chars_per_second=200)
+        client = GemmaClient(transport=transport, runtime=runtime, response_cache=ResponseCache())
+        assistant = make_assistant(None, [backend], client=client)
+        spoken = assistant.on_spoken
+        assistant.handle_speech("hey gemma")
+        spoken.wait_for(1)
+        assistant.handle_speech("what is the weather tomorrow")
+        spoken.wait_for(2)
+        calls = backend.calls
+
+        # A slower learned rate would now cut the first chunk elsewhere
+        for _ in range(20):
+            assistant.tts_handler.planner.record(backend.name, 40, 1.0)
+        assistant.handle_speech("what is the weather tomorrow")
+        spoken.wait_for(3)
+        assert spoken.kinds == ["ack", "reply", "reply"]
+        assert backend.calls == calls
+        assert len(stub.payloads) == 1
+    finally:
+        transport.close()
+        stub.stop()
@@ -0,0 +1,55 @@
+import sys
+from types import SimpleNamespace
+from bench.null_sink import NullSink
+from config.settings import PLAYBACK_SAMPLERATE
+from utils import tts_handler
+from utils.audio_player import AudioPlayer
+from utils.tts_backends import FakeTTSBackend
+from utils.tts_cache import TTSCache
+
+
+def fake_sounddevice(monkeypatch, query_devices):
+    monkeypatch.setitem(sys.modules, "sounddevice", SimpleNamespace(query_devices=query_devices))
+
+
+def test_stream_runs_at_the_device_rate(monkeypatch):
+    fake_sounddevice(monkeypatch, lambda kind: {"name": "speakers", "default_samplerate": 44100.0})
+    player = AudioPlayer()
+    assert player.samplerate == 44100
+    assert player.blocksize == 882  # 20 ms
+
+
+def test_unknown_device_rate_falls_back(monkeypatch):
+    def query_devices(kind):
+        raise RuntimeError("no output device")
+
+    fake_sounddevice(monkeypatch, query_devices)
+    assert AudioPlayer().samplerate == PLAYBACK_SAMPLERATE
+
+
+def test_speech_is_prepared_at_the_player_rate(runtime, fake_tts):
+    tts = fake_tts([FakeTTSBackend(latency=0.0, chars_per_second=15, sample_rate=24000)],
+                   player=AudioPlayer(samplerate=48000, stream_factory=NullSink()))
+    _, audio, samplerate = runtime.run(tts.prepare_speech("Hello there."), timeout=5)
+    assert samplerate == 48000
+    # The tone fills the clip, so trimming leaves it at twice the synthesized length
+    assert abs(len(audio) - 2 * int(len("Hello there.") / 15 * 24000)) <= 2
+
+
+def test_cached_speech_is_prepared_only_once(monkeypatch, runtime, fake_tts, tmp_path):
+    calls = []
+    postprocess = tts_handler.postprocess_speech
+    monkeypatch.setattr(tts_handler, "postprocess_speech", lambda *args: calls.append(1) or postprocess(*args))
+    backend = FakeTTSBackend(latency=0.0, chars_per_second=15, sample_rate=24000, frame_seconds=10)
+    cache = TTSCache(tmp_path / "tts", max_disk_bytes=1 << 20)
+    tts = fake_tts([backend], player=AudioPlayer(samplerate=48000, stream_factory=NullSink()), cache=cache)
+    runtime.run(tts.prepare_speech("Hello there."), timeout=5)
+    assert len(calls) == 1
+
+    # Read back from disk into an empty memory tier: prepared once, then played as stored
+    tts.cache = TTSCache(tmp_path / "tts", max_disk_bytes=1 << 20)
+    for _ in range(2):
+        _, audio, samplerate = runtime.run(tts.prepare_speech("Hello there."), timeout=5)
+        assert samplerate == 48000
+    assert len(calls) == 2
+    assert backend.calls == 1
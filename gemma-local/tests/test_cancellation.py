@@ -0,0 +1,21 @@
+from utils.cancellation import CancellationToken
+
+
+def test_callbacks_run_once_on_cancel():
+    token = CancellationToken()
+    calls = []
+    token.on_cancel(lambda: calls.append("first"))
+    unregister = token.on_cancel(lambda: calls.append("removed"))
+    unregister()
+    assert token.cancel("barge-in")
+    assert not token.cancel("again")
+    assert calls == ["first"]
+    assert token.reason == "barge-in"
+
+
+def test_on_cancel_runs_immediately_on_a_cancelled_token():
+    token = CancellationToken()
+    token.cancel()
+    calls = []
+    token.on_cancel(lambda: calls.append("late"))
+    assert calls == ["late"]
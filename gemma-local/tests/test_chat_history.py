@@ -0,0 +1,93 @@
+import time
+import pytest
+from bench.stub_ollama import StubOllamaServer
+from config.settings import MAX_TOKENS, TEMPERATURE
+from models.chat_history import ChatHistory
+from models.gemma_client import GemmaClient
+from models.ollama_transport import OllamaTransport
+
+
+def roles(history: ChatHistory) -> list:
+    return [message["role"] for message in history.messages()]
+
+
+def test_long_answer_evicts_whole_turns_only():
+    history = ChatHistory(system_prompt="sys", token_budget=40)
+    assert history.add_exchange("q" * 40, "a" * 200) == []  # The newest turn is kept even over budget
+    assert roles(history) == ["system", "user", "assistant"]
+
+    evicted = history.add_exchange("next question", "short answer")
+    assert [message["role"] for message in evicted] == ["user", "assistant"]
+    assert history.messages()[1:] == [{"role": "user", "content": "next question"},
+                                      {"role": "assistant", "content": "short answer"}]
+    assert len(history) == 2
+
+
+def test_token_count_follows_evictions():
+    history = ChatHistory(system_prompt="sys", token_budget=30)
+    for i in range(5):
+        history.add_exchange(f"question {i}", f"answer {i}")
+        assert history.token_count <= 30
+    assert history.messages()[-1]["content"] == "answer 4"
+    assert roles(history)[1:] == ["user", "assistant"] * (len(history) // 2)
+
+
+def test_message_cap_evicts_turns_oldest_first():
+    history = ChatHistory(system_prompt="sys", token_budget=10000, max_messages=4)
+    for i in range(3):
+        evicted = history.add_exchange(f"q{i}", f"a{i}")
+    assert [message["content"] for message in evicted] == ["q0", "a0"]
+    assert [message["content"] for message in history.messages()[1:]] == ["q1", "a1", "q2", "a2"]
+
+
+def test_summary_rides_with_the_system_prompt_until_cleared():
+    history = ChatHistory(system_prompt="sys")
+    history.add_exchange("hi", "hello")
+    history.summary = "They talked about the weather."
+    messages = history.messages("and tomorrow?")
+    assert messages[0] == {"role": "system",
+                           "content": "sys\n\nSummary of the earlier conversation: They talked about the weather."}
+    assert messages[-1] == {"role": "user", "content": "and tomorrow?"}
+    history.clear()
+    assert history.messages() == [{"role": "system", "content": "sys"}]
+    assert history.token_count == 0 and len(history) == 0
+
+
+@pytest.fixture
+def stub():
+    stub = StubOllamaServer(first_token_delay=0.0, tokens_per_second=1000, reply="Sunny all day.").start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def client(stub, runtime):
+    transport = OllamaTransport(base_url=stub.url)
+    yield GemmaClient(transport=transport, runtime=runtime, history=ChatHistory(system_prompt="sys",
+                                                                                token_budget=20))
+    transport.close()
+
+
+def test_sampling_settings_are_sent_as_options(stub, client):
+    assert "".join(client.stream_response("what is the weather")) == "Sunny all day."
+    path, payload = stub.payloads[-1]
+    assert path == "/api/chat"
+    assert payload["options"] == {"num_predict": MAX_TOKENS, "temperature": TEMPERATURE}
+    assert "temperature" not in payload and "max_tokens" not in payload
+
+
+def test_evicted_turns_are_folded_into_the_summary(monkeypatch, stub, client):
+    monkeypatch.setattr("models.gemma_client.CHAT_HISTORY_SUMMARIZE", True)
+    list(client.stream_response("what is the weather today in the city"))
+    assert client.history.summary == ""
+    list(client.stream_response("and tomorrow"))  # Over budget, so the first turn goes
+
+    deadline = time.monotonic() + 5
+    while not client.history.summary:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    path, payload = stub.payloads[-1]
+    assert path == "/api/generate"
+    assert "user: what is the weather today in the city\nassistant: Sunny all day." in payload["prompt"]
+    assert client.history.summary == "Sunny all day."
+    assert client.history.messages()[0]["content"].endswith("Summary of the earlier conversation: Sunny all day.")
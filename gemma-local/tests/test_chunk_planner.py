@@ -0,0 +1,56 @@
+import pytest
+from config.settings import FIXED_PHRASES, NAP_PHRASE
+from utils.chunk_planner import ChunkPlanner
+
+LONG_CLAUSES = ("The forecast for tomorrow is mostly sunny with a light breeze from the west, "
+                "and temperatures should reach about twenty degrees in the afternoon, "
+                "although clouds may roll in later in the evening.")
+
+
+@pytest.fixture
+def planner():
+    return ChunkPlanner(max_length=150, slack=20, min_length=40, first_audio_target=0.4, default_rate=100)
+
+
+def test_nap_line_keeps_whole_clauses(planner):
+    assert planner.split(NAP_PHRASE) == ["Shush!", "I'm going to take a nap now. Let me know if you need anything."]
+
+
+@pytest.mark.parametrize("phrase", FIXED_PHRASES)
+def test_split_ignores_learned_rates(planner, phrase):
+    before = planner.split(phrase)
+    planner.record("edge", 40, 1.0)
+    planner.record("piper", 2000, 1.0)
+    assert planner.split(phrase) == before
+    assert " ".join(before) == phrase
+
+
+def test_slow_backend_gets_a_shorter_first_chunk_only_at_a_clause(planner):
+    planner.record("edge", 40, 1.0)  # 16 characters in the first-audio target, so min_length applies
+    chunks = list(planner.plan_stream([LONG_CLAUSES], "edge"))
+    assert chunks[0] == "The forecast for tomorrow is mostly sunny with a light breeze from the west,"
+    assert " ".join(chunks) == LONG_CLAUSES
+
+
+def test_slightly_long_sentence_without_a_clause_is_not_cut(planner):
+    planner.record("edge", 40, 1.0)
+    sentence = "Photosynthesis converts sunlight into chemical energy inside plant cells every day."
+    assert list(planner.plan_stream([sentence], "edge")) == [sentence]
+
+
+def test_very_long_sentence_without_a_clause_is_cut_between_words(planner):
+    sentence = " ".join(["word"] * 60) + "."
+    chunks = planner.split(sentence)
+    assert len(chunks) == 2
+    assert all(len(chunk) <= planner.max_length for chunk in chunks)
+    assert " ".join(chunks) == sentence
+
+
+def test_short_fragments_are_merged_after_the_first(planner):
+    chunks = list(planner.plan_stream(["Sure.", "Okay.", "Fine.", "Here is the whole answer to your question."]))
+    assert chunks == ["Sure.", "Okay. Fine. Here is the whole answer to your question."]
+
+
+def test_trailing_fragment_is_not_lost(planner):
+    chunks = list(planner.plan_stream(["Here is the whole answer to your question.", "Bye."]))
+    assert chunks == ["Here is the whole answer to your question.", "Bye."]
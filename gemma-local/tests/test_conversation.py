@@ -0,0 +1,64 @@
+import pytest
+from conversation import ConversationMachine, ConversationState, InputQueue
+
+
+def test_stale_turn_cannot_undo_a_newer_one():
+    machine = ConversationMachine()
+    changes = []
+    machine.on_change(lambda old, new: changes.append((old, new)))
+    old_turn, new_turn = object(), object()
+    assert machine.start_turn(ConversationState.SPEAKING, old_turn)
+    assert machine.start_turn(ConversationState.SPEAKING, new_turn)
+
+    # The first line's "finished playing" arrives after the second has started
+    assert not machine.transition(ConversationState.LISTENING, turn=old_turn)
+    assert machine.state == ConversationState.SPEAKING
+    assert machine.transition(ConversationState.LISTENING, turn=new_turn)
+    assert changes[-1] == (ConversationState.SPEAKING, ConversationState.LISTENING)
+
+
+def test_transitions_outside_the_table_are_refused():
+    machine = ConversationMachine()
+    assert not machine.start_turn(ConversationState.THINKING, object())
+    assert not machine.start_turn(ConversationState.SPEAKING, object(), only_from=(ConversationState.LISTENING,))
+    assert machine.state == ConversationState.IDLE and machine.turn is None
+
+
+def test_coalesce_joins_utterances_up_to_the_cap():
+    inputs = InputQueue(maxsize=2, policy=InputQueue.COALESCE)
+    assert inputs.put("what is the weather")
+    assert inputs.put("in paris")
+    assert not inputs.put("tomorrow")
+    assert inputs.get(timeout=0) == ("speech", "what is the weather in paris")
+    assert inputs.stats() == {"input_queue_depth": 0, "input_dropped": 1, "input_coalesced": 1}
+
+
+def test_latest_keeps_only_the_newest_utterance():
+    inputs = InputQueue(maxsize=2, policy=InputQueue.LATEST)
+    for text in ("one", "two", "three"):
+        assert inputs.put(text)
+    assert inputs.get(timeout=0) == ("speech", "three")
+    assert inputs.get(timeout=0) is None
+    assert inputs.dropped == 2
+
+
+def test_queue_drops_utterances_past_its_size():
+    inputs = InputQueue(maxsize=2, policy=InputQueue.QUEUE)
+    assert inputs.put("one") and inputs.put("two")
+    assert not inputs.put("three")
+    assert [inputs.get(timeout=0) for _ in range(2)] == [("speech", "one"), ("speech", "two")]
+    assert inputs.dropped == 1
+
+
+def test_events_go_first_and_speech_waits_between_turns():
+    inputs = InputQueue(policy=InputQueue.QUEUE)
+    inputs.put("hello")
+    inputs.put_event("timeout")
+    assert inputs.get(timeout=0, speech=False) == ("event", "timeout")
+    assert inputs.get(timeout=0, speech=False) is None
+    assert inputs.get(timeout=0) == ("speech", "hello")
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        InputQueue(policy="newest")
@@ -0,0 +1,29 @@
+from utils.endpointer import Endpointer
+
+
+def test_finalizes_once_partial_is_stable_and_speaker_is_quiet():
+    endpointer = Endpointer(trailing_silence_ms=400, stable_partial_ms=300, max_silence_ms=900)
+    assert not endpointer.update("what time", 100, 0)
+    assert not endpointer.update("what time is it", 100, 100)
+    assert not endpointer.update("what time is it", 100, 400)  # Stable for 100 ms only
+    assert not endpointer.update("what time is it", 100, 500)
+    assert endpointer.update("what time is it", 100, 600)
+
+
+def test_max_silence_finalizes_even_if_partial_changes():
+    endpointer = Endpointer(trailing_silence_ms=400, stable_partial_ms=300, max_silence_ms=900)
+    assert endpointer.update("hello", 100, 900)
+    assert not Endpointer().update("", 100, 5000)
+
+
+def test_savings_are_an_estimate_until_the_recognizer_endpoint_is_measured(capsys):
+    endpointer = Endpointer(baseline_ms=1000)
+    assert endpointer.finalized(400) == 600
+    assert "not measured" in capsys.readouterr().out
+    assert not endpointer.stats()["recognizer_endpoint_measured"]
+
+    endpointer.recognizer_finalized(500)
+    assert endpointer.baseline_ms == 900
+    assert endpointer.finalized(400) == 500
+    assert "measured endpoint" in capsys.readouterr().out
+    assert endpointer.stats()["recognizer_endpoint_measured"]
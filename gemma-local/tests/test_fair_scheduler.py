@@ -0,0 +1,55 @@
+import threading
+import pytest
+from utils.fair_scheduler import FairScheduler, QueueFullError
+
+
+def blocked_scheduler(**kwargs):
+    """A one-worker scheduler whose worker is held by a job until the returned event is set"""
+    scheduler = FairScheduler(workers=1, **kwargs)
+    release, started = threading.Event(), threading.Event()
+    scheduler.submit("hold", lambda: (started.set(), release.wait(5)))
+    assert started.wait(5)
+    return scheduler, release
+
+
+def test_keys_take_turns():
+    scheduler, release = blocked_scheduler(max_pending=10)
+    order = []
+    jobs = [scheduler.submit("a", order.append, f"a{i}") for i in range(3)]
+    jobs += [scheduler.submit("b", order.append, f"b{i}") for i in range(2)]
+    release.set()
+    for job in jobs:
+        job.result(timeout=5)
+    assert order == ["a0", "b0", "a1", "b1", "a2"]
+    scheduler.shutdown()
+
+
+def test_admission_is_bounded():
+    scheduler, release = blocked_scheduler(max_pending=2)
+    scheduler.submit("a", lambda: None)
+    with pytest.raises(QueueFullError):
+        scheduler.submit("b", lambda: None)
+    assert scheduler.stats()["pending"] == 2
+    release.set()
+    scheduler.shutdown()
+
+
+def test_job_exceptions_reach_the_future():
+    scheduler = FairScheduler(workers=1)
+    job = scheduler.submit("a", lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        job.result(timeout=5)
+    scheduler.shutdown()
+
+
+def test_shutdown_cancels_queued_jobs_and_runs_their_callbacks():
+    scheduler, release = blocked_scheduler()
+    job = scheduler.submit("a", lambda: None)
+    cancelled = []
+    job.add_done_callback(lambda future: cancelled.append(future.cancelled()))
+    scheduler.shutdown()
+    assert cancelled == [True]
+    assert scheduler.stats()["pending"] == 1  # Only the job still running
+    with pytest.raises(RuntimeError):
+        scheduler.submit("a", lambda: None)
+    release.set()
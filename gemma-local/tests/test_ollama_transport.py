@@ -0,0 +1,36 @@
+import threading
+import time
+import pytest
+from bench.stub_ollama import StubOllamaServer
+from models.ollama_transport import OllamaTransport
+from utils.cancellation import CancellationToken, OperationCancelled
+
+
+def test_cancel_mid_stream_closes_the_response(monkeypatch):
+    # Two seconds between words, so the read is blocked waiting for the next one when cancelled
+    stub = StubOllamaServer(first_token_delay=0.0, tokens_per_second=0.5, reply="word " * 5).start()
+    transport = OllamaTransport(base_url=stub.url)
+    responses = []
+    post = transport.session.post
+
+    def recording_post(*args, **kwargs):
+        response = post(*args, **kwargs)
+        responses.append(response)
+        return response
+
+    monkeypatch.setattr(transport.session, "post", recording_post)
+    token = CancellationToken()
+    received = []
+    try:
+        with pytest.raises(OperationCancelled):
+            for message in transport.stream("/api/chat", {"model": "gemma", "messages": []}, token):
+                received.append(message)
+                if len(received) == 1:
+                    threading.Timer(0.1, token.cancel, args=("barge-in",)).start()
+                    started = time.monotonic()
+        assert time.monotonic() - started < 1
+        assert len(received) == 1
+        assert responses[0].raw.closed
+    finally:
+        transport.close()
+        stub.stop()
@@ -0,0 +1,79 @@
+import pytest
+from models.response_cache import ResponseCache
+
+MODEL, SYSTEM = "gemma", "You are helpful."
+
+
+def test_normalized_prompts_share_an_entry():
+    cache = ResponseCache()
+    cache.put("Where is the restroom?", MODEL, SYSTEM, "Down the hall.")
+    assert cache.get("where is the  restroom", MODEL, SYSTEM) == "Down the hall."
+    assert cache.stats()["response_cache_hits"] == 1
+
+
+def test_key_includes_model_and_system_prompt():
+    cache = ResponseCache()
+    cache.put("where is the restroom", MODEL, SYSTEM, "Down the hall.")
+    assert cache.get("where is the restroom", "other", SYSTEM) is None
+    assert cache.get("where is the restroom", MODEL, "Be brief.") is None
+
+
+@pytest.mark.parametrize("prompt", ["why is the sky blue", "tell me about the museum before noon",
+                                    "how do i get more tickets", "what time do you open"])
+def test_standalone_questions_are_cached(prompt):
+    cache = ResponseCache()
+    assert not cache.is_followup(prompt)
+    cache.put(prompt, MODEL, SYSTEM, "Answer.")
+    assert cache.get(prompt, MODEL, SYSTEM) == "Answer."
+
+
+@pytest.mark.parametrize("prompt", ["how tall is it", "who built that", "what did they say",
+                                    "and the one next door", "what about tomorrow", "tell me more"])
+def test_followups_bypass_the_cache(prompt):
+    cache = ResponseCache()
+    assert cache.is_followup(prompt)
+    cache.put(prompt, MODEL, SYSTEM, "Answer.")
+    assert cache.get(prompt, MODEL, SYSTEM) is None
+    assert len(cache) == 0
+    assert cache.stats()["response_cache_bypassed"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.put("one", MODEL, SYSTEM, "1")
+    cache.put("two", MODEL, SYSTEM, "2")
+    cache.get("one", MODEL, SYSTEM)
+    cache.put("three", MODEL, SYSTEM, "3")
+    assert cache.get("two", MODEL, SYSTEM) is None
+    assert cache.get("one", MODEL, SYSTEM) == "1"
+    assert cache.get("three", MODEL, SYSTEM) == "3"
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("models.response_cache.time.monotonic", lambda: now[0])
+    cache = ResponseCache(ttl=60)
+    cache.put("opening hours", MODEL, SYSTEM, "Nine to five.")
+    now[0] += 59
+    assert cache.get("opening hours", MODEL, SYSTEM) == "Nine to five."
+    now[0] += 2
+    assert cache.get("opening hours", MODEL, SYSTEM) is None
+    assert len(cache) == 0
+
+
+def test_empty_replies_are_not_cached():
+    cache = ResponseCache()
+    cache.put("opening hours", MODEL, SYSTEM, "  ")
+    assert len(cache) == 0
+
+
+def test_chunks_are_kept_only_for_the_whole_cached_reply():
+    cache = ResponseCache()
+    cache.put("opening hours", MODEL, SYSTEM, "We open at nine, and close at five.")
+    cache.put_chunks("opening hours", MODEL, SYSTEM, ["We open at nine,"])  # Cut short
+    assert cache.chunks("opening hours", MODEL, SYSTEM) is None
+    cache.put_chunks("opening hours", MODEL, SYSTEM, ["We open at nine,", "and close at five."])
+    assert cache.chunks("opening  hours?", MODEL, SYSTEM) == ["We open at nine,", "and close at five."]
+    assert cache.stats()["response_cache_hits"] == 0
+    cache.put_chunks("closing time", MODEL, SYSTEM, ["Five."])  # Not cached
+    assert cache.chunks("closing time", MODEL, SYSTEM) is None
@@ -0,0 +1,61 @@
+import threading
+import numpy as np
+from utils.ring_buffer import AudioRingBuffer, RingBuffer
+
+
+def test_write_and_read_wrap_around():
+    ring = RingBuffer(8)
+    assert ring.write(np.arange(6, dtype=np.float32)) == 6
+    out = np.zeros(4, dtype=np.float32)
+    assert ring.read_into(out) == 4
+    # Wraps past the end of the buffer
+    assert ring.write(np.arange(6, 12, dtype=np.float32)) == 6
+    out = np.zeros(8, dtype=np.float32)
+    assert ring.read_into(out) == 8
+    np.testing.assert_array_equal(out, np.arange(4, 12))
+    assert ring.read_position == ring.write_position == 12
+
+
+def test_write_stops_when_full():
+    ring = RingBuffer(4)
+    assert ring.write(np.ones(6, dtype=np.float32)) == 4
+    assert ring.free == 0
+    assert ring.write(np.ones(1, dtype=np.float32)) == 0
+
+
+def test_discard_drops_unread_samples():
+    ring = RingBuffer(4)
+    ring.write(np.ones(3, dtype=np.float32))
+    ring.discard()
+    assert ring.available == 0
+    assert ring.read_into(np.zeros(3, dtype=np.float32)) == 0
+
+
+def test_mix_tail_crossfades_last_samples_across_the_wrap():
+    ring = RingBuffer(4)
+    ring.write(np.zeros(3, dtype=np.float32))
+    ring.read_into(np.zeros(3, dtype=np.float32))
+    ring.write(np.ones(3, dtype=np.float32))  # Positions 3, 0, 1 of the buffer
+    ring.mix_tail(np.full(2, 3, dtype=np.float32), np.full(2, 0.5, dtype=np.float32),
+                  np.full(2, 0.5, dtype=np.float32))
+    out = np.zeros(3, dtype=np.float32)
+    ring.read_into(out)
+    np.testing.assert_array_equal(out, [1, 2, 2])
+
+
+def test_audio_ring_counts_overflow_instead_of_blocking():
+    ring = AudioRingBuffer(4)
+    ring.push(np.arange(6, dtype=np.int16))
+    assert ring.overflow_samples == 2
+    assert ring.high_water == 4
+    np.testing.assert_array_equal(ring.pop(4, timeout=0), [0, 1, 2, 3])
+
+
+def test_audio_ring_pop_waits_for_enough_samples():
+    ring = AudioRingBuffer(16)
+    assert ring.pop(4, timeout=0.01) is None
+    ring.push(np.ones(2, dtype=np.int16))
+    timer = threading.Timer(0.05, ring.push, args=(np.ones(2, dtype=np.int16),))
+    timer.start()
+    assert len(ring.pop(4, timeout=2)) == 4
+    timer.join()
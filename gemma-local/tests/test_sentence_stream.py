@@ -0,0 +1,21 @@
+from utils.sentence_stream import iter_sentences
+
+
+def test_yields_each_sentence_once_its_boundary_arrives():
+    tokens = iter(["Hello", " there.", " How", " are", " you?", " Fine"])
+    sentences = iter_sentences(tokens)
+    assert next(sentences) == "Hello there."
+    assert next(sentences) == "How are you?"
+    assert list(sentences) == ["Fine"]
+
+
+def test_number_split_across_tokens_is_not_a_boundary():
+    assert list(iter_sentences(["It costs 3.", "5 euros. Thanks!"])) == ["It costs 3.5 euros.", "Thanks!"]
+
+
+def test_line_breaks_end_sentences():
+    assert list(iter_sentences(["First line\n\n", "- second line"])) == ["First line", "- second line"]
+
+
+def test_whitespace_only_input_yields_nothing():
+    assert list(iter_sentences(["  ", "\n", " "])) == []
@@ -0,0 +1,225 @@
+import json
+import threading
+import time
+import pytest
+import requests
+from bench.stub_ollama import StubOllamaServer
+from config.settings import SERVER_MAX_BODY_BYTES
+from models.ollama_transport import OllamaTransport
+from server import SessionManager, VoiceServer
+from utils.fair_scheduler import FairScheduler
+
+
+class FakeRecognizer:
+    """Returns a fixed transcript; with a gate set, each call waits for it"""
+
+    def __init__(self, text="what time is it"):
+        self.text = text
+        self.rates = []
+        self.gate = None
+        self.started = threading.Semaphore(0)
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        self.rates.append(sample_rate)
+        self.started.release()
+        if self.gate is not None:
+            self.gate.wait(5)
+        return self.text
+
+
+class ServerFixture:
+    def __init__(self, runtime, tts, first_token_delay=0.0, workers=1, max_pending=4, tokens_per_second=500,
+                 recognizer=None, max_body_bytes=SERVER_MAX_BODY_BYTES, transcription_workers=1, **stub_options):
+        self.stub = StubOllamaServer(first_token_delay=first_token_delay, tokens_per_second=tokens_per_second,
+                                     **stub_options).start()
+        self.transport = OllamaTransport(base_url=self.stub.url)
+        self.scheduler = FairScheduler(workers=workers, max_pending=max_pending, name="test-generation")
+        self.server = VoiceServer(("127.0.0.1", 0), SessionManager(self.transport, runtime), self.scheduler, tts,
+                                  recognizer, max_body_bytes, transcription_workers)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def session(self) -> str:
+        response = requests.post(f"{self.url}/sessions", timeout=5)
+        assert response.status_code == 201
+        return response.json()["session_id"]
+
+    def turn(self, session_id, text="what time is it", audio=False, **kwargs):
+        return requests.post(f"{self.url}/sessions/{session_id}/turn?audio={int(audio)}",
+                             json={"text": text}, timeout=10, **kwargs)
+
+    def upload(self, session_id, pcm=b"\0\0" * 1600, content_type="audio/L16; rate=16000", query="audio=0"):
+        return requests.post(f"{self.url}/sessions/{session_id}/turn?{query}", data=pcm,
+                             headers={"Content-Type": content_type}, timeout=10)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.scheduler.shutdown()
+        self.transport.close()
+        self.stub.stop()
+
+
+@pytest.fixture
+def make_server(runtime, fake_tts):
+    servers = []
+
+    def make(**options) -> ServerFixture:
+        server = ServerFixture(runtime, fake_tts(), **options)
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture
+def server(make_server):
+    return make_server()
+
+
+@pytest.fixture
+def slow_server(make_server):
+    return make_server(first_token_delay=1.0, max_pending=1)
+
+
+def events(response) -> list:
+    return [json.loads(line) for line in response.iter_lines() if line]
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_turn_streams_ndjson_text_events(server):
+    response = server.turn(server.session(), stream=True)
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+    stream = events(response)
+    assert stream[0] == {"type": "transcript", "text": "what time is it"}
+    assert stream[-1] == {"type": "done"}
+    text = " ".join(event["text"] for event in stream if event["type"] == "text")
+    assert text == server.stub.reply
+
+
+def test_turn_streams_audio_after_its_text(server):
+    stream = events(server.turn(server.session(), audio=True, stream=True))
+    kinds = [event["type"] for event in stream]
+    assert "audio" in kinds
+    assert kinds.index("text") < kinds.index("audio")
+    audio = next(event for event in stream if event["type"] == "audio")
+    assert audio["format"] == "pcm_s16le" and audio["sample_rate"] == 24000
+
+
+@pytest.mark.parametrize("body", [b"[1]", b'"hi"', b'{"text": 5}', b"{not json", b'{"text": "  "}'])
+def test_bad_json_bodies_get_400(server, body):
+    response = requests.post(f"{server.url}/sessions/{server.session()}/turn", data=body,
+                             headers={"Content-Type": "application/json"}, timeout=5)
+    assert response.status_code == 400
+    assert "error" in response.json()
+
+
+def test_unsupported_content_type_and_unknown_session(server):
+    response = requests.post(f"{server.url}/sessions/{server.session()}/turn", data=b"hello",
+                             headers={"Content-Type": "text/plain"}, timeout=5)
+    assert response.status_code == 400
+    assert server.turn("missing").status_code == 404
+
+
+def test_full_admission_queue_gets_503(slow_server):
+    busy = slow_server.session()
+    first = threading.Thread(target=slow_server.turn, args=(busy,))
+    first.start()
+    wait_for(lambda: slow_server.scheduler.stats()["pending"] == 1)
+
+    response = slow_server.turn(slow_server.session())
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    # The same session cannot start a second turn while one is running
+    assert slow_server.turn(busy).status_code == 409
+    first.join()
+
+
+def test_scheduler_shutdown_ends_queued_turns(make_server):
+    server = make_server(first_token_delay=1.0)
+    first = threading.Thread(target=server.turn, args=(server.session(),))
+    first.start()
+    wait_for(lambda: server.scheduler.stats()["running"] == 1)
+
+    results = []
+    queued = threading.Thread(target=lambda: results.append(events(server.turn(server.session()))))
+    queued.start()
+    wait_for(lambda: server.scheduler.stats()["pending"] == 2)
+    server.scheduler.shutdown()
+    queued.join(timeout=5)
+    assert not queued.is_alive()
+    assert [event["type"] for event in results[0]] == ["transcript", "done"]
+    first.join()
+
+
+def test_client_disconnect_stops_generation(make_server):
+    # About 8 s of one-word sentences, one text event each
+    server = make_server(tokens_per_second=50, reply="Word. " * 400)
+    response = server.turn(server.session(), stream=True)
+    lines = response.iter_lines()
+    next(lines)  # The transcript
+    next(lines)  # The first sentence
+    started = time.monotonic()
+    response.close()
+    wait_for(lambda: server.scheduler.stats()["running"] == 0, timeout=3)
+    assert time.monotonic() - started < 3
+
+
+def test_audio_turn_is_transcribed_at_the_given_rate(make_server):
+    recognizer = FakeRecognizer()
+    server = make_server(recognizer=recognizer)
+    stream = events(server.upload(server.session(), content_type="audio/L16; rate=8000"))
+    assert stream[0] == {"type": "transcript", "text": "what time is it"}
+    assert stream[-1] == {"type": "done"}
+    assert recognizer.rates == [8000]
+
+
+@pytest.mark.parametrize("content_type, query", [("audio/L16; rate=0", "audio=0"),
+                                                 ("audio/L16", "rate=-16000"),
+                                                 ("audio/L16", "rate=1000000"),
+                                                 ("audio/L16", "rate=fast")])
+def test_out_of_range_sample_rates_get_400(make_server, content_type, query):
+    recognizer = FakeRecognizer()
+    server = make_server(recognizer=recognizer)
+    response = server.upload(server.session(), content_type=content_type, query=query)
+    assert response.status_code == 400
+    assert response.json()["error"] == "rate must be a sample rate from 8000 to 48000 Hz"
+    assert recognizer.rates == []
+
+
+def test_oversized_body_gets_413_unread(make_server):
+    recognizer = FakeRecognizer()
+    server = make_server(recognizer=recognizer, max_body_bytes=1000)
+    response = server.upload(server.session(), pcm=b"\0" * 2000)
+    assert response.status_code == 413
+    assert recognizer.rates == []
+    assert server.upload(server.session(), pcm=b"\0" * 1000).status_code == 200
+    bad = requests.post(f"{server.url}/sessions", headers={"Content-Length": "-5"}, timeout=5)
+    assert bad.status_code == 400
+
+
+def test_transcriptions_beyond_the_slots_get_503(monkeypatch, make_server):
+    monkeypatch.setattr("server.SERVER_TRANSCRIPTION_WAIT", 0.1)
+    recognizer = FakeRecognizer()
+    recognizer.gate = threading.Event()
+    server = make_server(recognizer=recognizer, transcription_workers=1)
+    results = []
+    first = threading.Thread(target=lambda: results.append(server.upload(server.session()).status_code))
+    first.start()
+    assert recognizer.started.acquire(timeout=5)
+
+    response = server.upload(server.session())
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    recognizer.gate.set()
+    first.join()
+    assert results == [200]
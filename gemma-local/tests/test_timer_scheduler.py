@@ -0,0 +1,30 @@
+import threading
+import pytest
+from utils.timer_scheduler import TimerScheduler
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = TimerScheduler().start()
+    yield scheduler
+    scheduler.stop()
+
+
+def test_timers_fire_in_deadline_order(scheduler):
+    fired = []
+    done = threading.Event()
+    scheduler.call_later(0.15, lambda: (fired.append("late"), done.set()))
+    scheduler.call_later(0.05, fired.append, "early")
+    scheduler.call_later(0.1, fired.append, "middle")
+    assert done.wait(2)
+    assert fired == ["early", "middle", "late"]
+
+
+def test_cancelled_timer_never_fires(scheduler):
+    fired = []
+    done = threading.Event()
+    scheduler.call_later(0.05, fired.append, "cancelled").cancel()
+    # Cancelling the earliest timer must not hold up the ones behind it
+    scheduler.call_later(0.1, lambda: (fired.append("kept"), done.set()))
+    assert done.wait(2)
+    assert fired == ["kept"]
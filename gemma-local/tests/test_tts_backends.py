@@ -0,0 +1,65 @@
+from utils.tts_backends import BackendSelector, FakeTTSBackend
+
+
+def fake(name: str, **kwargs) -> FakeTTSBackend:
+    backend = FakeTTSBackend(latency=0.0, **kwargs)
+    backend.name = name
+    return backend
+
+
+def test_fastest_backend_is_picked_and_kept_until_released():
+    slow, fast = fake("slow"), fake("fast")
+    selector = BackendSelector([slow, fast], probe_every=0)
+    assert selector.candidates()[0] is slow  # Configured order until measured
+    selector.record_latency(slow, 0.5)
+    selector.record_latency(fast, 0.1)
+    assert selector.candidates()[0] is slow  # Same voice for the rest of the conversation
+    selector.release()
+    assert selector.candidates()[0] is fast
+
+
+def test_voice_switches_when_it_fails():
+    first, second = fake("first"), fake("second")
+    selector = BackendSelector([first, second], probe_every=0)
+    assert selector.candidates()[0] is first
+    selector.record_failure(first)
+    assert selector.candidates() == [second, first]  # A cooling backend is the last resort
+    assert selector.candidates()[0] is second
+
+
+def test_probe_names_the_runner_up_without_reordering():
+    first, second = fake("first"), fake("second")
+    selector = BackendSelector([first, second], probe_every=2)
+    assert selector.candidates()[0] is first
+    assert selector.probe() is None
+    assert selector.candidates()[0] is first
+    assert selector.probe() is second
+
+
+def test_removed_backend_is_not_kept():
+    first, second = fake("first"), fake("second")
+    selector = BackendSelector([first, second])
+    selector.candidates()
+    assert selector.remove(first)
+    assert selector.candidates() == [second]
+    assert not selector.remove(second)  # The last backend stays
+
+
+def test_probed_backend_is_timed_but_never_heard(runtime, fake_tts):
+    voice, probed = fake("voice", sample_rate=24000), fake("probed", sample_rate=16000)
+    tts = fake_tts([voice, probed])
+    tts.wait_until_loaded()
+    tts.selector.probe_every = 1
+    text = "Hello there, this is a test of the voice."
+    chunks = list(tts.iter_speech([text]))
+    assert chunks and all(samplerate == 24000 for _, samplerate in chunks)
+    runtime.run(_drain(tts))
+    assert probed.calls == 1
+    assert tts.selector.latency["probed"] is not None
+    assert tts.cache.get(text, "voice", "pcm") is not None
+    assert tts.cache.get(text, "probed", "pcm") is None
+
+
+async def _drain(tts):
+    for task in list(tts._probes):
+        await task
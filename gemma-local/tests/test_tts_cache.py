@@ -0,0 +1,12 @@
+import numpy as np
+from utils.tts_cache import TTSCache
+
+
+def test_raw_pcm_clips_reach_the_disk_tier(tmp_path):
+    audio = (0.2 * np.sin(np.arange(2400) / 10)).astype(np.float32)
+    TTSCache(tmp_path, max_disk_bytes=1 << 20).put("Hello.", "piper-voice", "pcm", audio, 24000)
+
+    # A fresh cache (empty memory tier) still has it, as 16-bit FLAC
+    data, samplerate = TTSCache(tmp_path, max_disk_bytes=1 << 20).get("Hello.", "piper-voice", "pcm")
+    assert samplerate == 24000
+    assert np.allclose(data, audio, atol=1e-4)
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+import time
+from utils.cancellation import CancellationToken
+from utils.tts_backends import FakeTTSBackend
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_full_playback_buffer_does_not_block_the_runtime(runtime, fake_tts, null_player):
+    # About 1.1 s of speech into a 0.2 s ring, so enqueue waits for space for most of it
+    player = null_player(buffer_seconds=0.2)
+    tts = fake_tts([FakeTTSBackend(latency=0.0, chars_per_second=15)], player=player)
+    speaking = threading.Thread(target=tts.speak, args=("Hello there, you.",))
+    speaking.start()
+    wait_for(lambda: player._ring.free < 2 * player.blocksize)
+
+    started = time.monotonic()
+    runtime.run(asyncio.sleep(0), timeout=1)
+    assert time.monotonic() - started < 0.1
+    speaking.join(timeout=5)
+    assert not speaking.is_alive()
+
+
+def test_cancel_drops_a_chunk_still_waiting_for_buffer_space(fake_tts, null_player):
+    # One 3 s chunk into a 1 s ring
+    player = null_player(buffer_seconds=1)
+    tts = fake_tts([FakeTTSBackend(latency=0.0, chars_per_second=4, frame_seconds=20)], player=player)
+    token = CancellationToken()
+    speaking = threading.Thread(target=tts.speak_stream, args=(["A long reply."],), kwargs={"token": token})
+    speaking.start()
+    wait_for(lambda: player._ring.free < 2 * player.blocksize)
+
+    token.cancel("barge-in")
+    speaking.join(timeout=1)
+    assert not speaking.is_alive()
+    time.sleep(0.1)
+    # Nothing of the interrupted reply is left to play ahead of the next turn
+    assert player._ring.available == 0
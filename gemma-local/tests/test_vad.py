@@ -0,0 +1,24 @@
+import numpy as np
+from utils.vad import BargeInDetector
+
+
+def speech(level: int, seconds: float = 0.5) -> np.ndarray:
+    """A square wave with an RMS of level (int16 scale)"""
+    samples = np.full(int(16000 * seconds), level, dtype=np.int16)
+    samples[1::2] *= -1
+    return samples
+
+
+def test_barge_in_ignores_input_below_the_echo_ratio():
+    detector = BargeInDetector(energy_threshold=800, echo_ratio=0.5, min_speech_ms=200)
+    # Loud enough on its own, but no louder than the echo of 4000 being played
+    assert not detector.process(speech(1500), echo_level=4000)
+    assert detector.triggers == 0
+
+
+def test_barge_in_fires_above_the_echo_ratio():
+    detector = BargeInDetector(energy_threshold=800, echo_ratio=0.5, min_speech_ms=200)
+    assert not detector.process(speech(3000, 0.1), echo_level=4000)  # Shorter than min_speech_ms
+    assert detector.process(speech(3000, 0.1), echo_level=4000)
+    assert detector.triggers == 1
+    assert len(detector.take_audio()) > 0